@@ -1,7 +1,15 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import threading
+import time
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
+from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
+
+from services.profilage_contexte import appel_profile
 
 #  1. Charge le fichier .env
 load_dotenv()
@@ -36,8 +44,121 @@ def mask_password(url):
 
 print(f"🔗 {mask_password(DATABASE_URL)}")
 
-#  5. Configuration SQLAlchemy
-engine = create_engine(DATABASE_URL)
+#  5. Configuration du pool (partagé par l'API, le scheduler et les PDF)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 = pas de limite
+
+
+class PoolMetrics:
+    """Compteurs de checkout du pool: attente, saturation, timeouts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.saturations = 0      # checkout demandé alors que toutes les connexions étaient prises
+        self.timeouts = 0         # checkout abandonné après DB_POOL_TIMEOUT
+        self.attente_totale = 0.0
+        self.attente_max = 0.0
+        self.max_utilisees = 0
+
+    def enregistrer(self, attente: float, sature: bool, utilisees: int):
+        with self._lock:
+            self.checkouts += 1
+            self.saturations += int(sature)
+            self.attente_totale += attente
+            self.attente_max = max(self.attente_max, attente)
+            self.max_utilisees = max(self.max_utilisees, utilisees)
+
+    def enregistrer_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+            self.saturations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "saturations": self.saturations,
+                "timeouts": self.timeouts,
+                "attente_moyenne_ms": round(1000 * self.attente_totale / self.checkouts, 3) if self.checkouts else 0.0,
+                "attente_max_ms": round(1000 * self.attente_max, 3),
+                "max_connexions_utilisees": self.max_utilisees,
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool qui mesure le temps d'attente de chaque checkout"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        sature = self._max_overflow > -1 and self.checkedout() >= self.size() + self._max_overflow
+        debut = time.perf_counter()
+        try:
+            connexion = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.enregistrer_timeout()
+            raise
+        self.metrics.enregistrer(time.perf_counter() - debut, sature, self.checkedout())
+        return connexion
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def creer_engine(url: str = DATABASE_URL):
+    """
+    Fabrique unique des engines: pool et timeouts lus depuis la configuration
+
+    SQLite (tests, scripts) garde le pool par défaut de SQLAlchemy.
+    """
+    url_objet = make_url(url)
+    if url_objet.get_backend_name() == "sqlite":
+        return create_engine(url)
+
+    connect_args = {}
+    if DB_STATEMENT_TIMEOUT_MS > 0 and url_objet.get_backend_name() == "postgresql":
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+    return create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+def pool_stats(engine_cible=None) -> dict:
+    """État du pool (connexions prises/libres) + métriques de checkout"""
+    pool = (engine_cible or engine).pool
+    stats = {"classe": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "taille": pool.size(),
+            "libres": pool.checkedin(),
+            "utilisees": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(pool.metrics.stats())
+    return stats
+
+
+#  6. Configuration SQLAlchemy
+engine = creer_engine()
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 Base = declarative_base()
 
@@ -48,10 +169,78 @@ def get_db():
     finally:
         db.close()
 
-# Test
-try:
-    with engine.connect():
-        print("Connexion PostgreSQL réussie")
-except Exception as e:
-    print(f"Erreur: {str(e)[:100]}...")
-    raise
\ No newline at end of file
+#  7. Chemin de lecture async (optionnel, asyncpg)
+DB_ASYNC_READS = os.getenv("DB_ASYNC_READS", "false").lower() == "true"
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+_async_sessionmaker = None
+
+
+def _url_async(url: str) -> str:
+    """postgresql://... -> postgresql+asyncpg://..., sqlite -> sqlite+aiosqlite"""
+    url_objet = make_url(url)
+    if url_objet.get_backend_name() == "sqlite":
+        return url_objet.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    return url_objet.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+
+def get_async_sessionmaker():
+    """
+    Crée à la première utilisation l'engine async (import paresseux:
+    asyncpg n'est requis que si DB_ASYNC_READS=true)
+    """
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url = ASYNC_DATABASE_URL or _url_async(DATABASE_URL)
+        if make_url(url).get_backend_name() == "sqlite":
+            async_engine = create_async_engine(url)
+        else:
+            connect_args = {}
+            if DB_STATEMENT_TIMEOUT_MS > 0:
+                connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+            async_engine = create_async_engine(
+                url,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_recycle=DB_POOL_RECYCLE,
+                pool_pre_ping=DB_POOL_PRE_PING,
+                connect_args=connect_args,
+            )
+        _async_sessionmaker = async_sessionmaker(async_engine, expire_on_commit=False)
+    return _async_sessionmaker
+
+
+class LectureDB:
+    """
+    Session de lecture pour les endpoints async
+
+    Le code de requête reste du SQLAlchemy ORM synchrone (fonction fn(db)):
+    - mode async (DB_ASYNC_READS=true): exécuté via AsyncSession.run_sync,
+      les attentes réseau libèrent la boucle d'événements
+    - mode sync (défaut): exécuté dans le threadpool avec la Session de get_db
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    @property
+    def est_async(self) -> bool:
+        return hasattr(self.session, "run_sync")
+
+    async def run(self, fn, *args, **kwargs):
+        if self.est_async:
+            return await self.session.run_sync(fn, *args, **kwargs)
+        # appel_profile: le profil d'une requête (X-Profile) suit le travail dans le threadpool
+        return await run_in_threadpool(appel_profile, fn, self.session, *args, **kwargs)
+
+
+async def get_read_db(db: Session = Depends(get_db)):
+    """Dépendance des endpoints de lecture: async ou sync selon DB_ASYNC_READS"""
+    if DB_ASYNC_READS:
+        async with get_async_sessionmaker()() as session:
+            yield LectureDB(session)
+    else:
+        yield LectureDB(db)
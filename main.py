@@ -1,4 +1,6 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
 from contextlib import asynccontextmanager
 import os
 from datetime import datetime
@@ -8,21 +10,32 @@ from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from security.limiter import limiter
 from scheduler import start_scheduler, stop_scheduler
+from services.pdf_cache import arreter_pools
+from services.metriques import METRIQUES, METRIQUES_ACTIVES, METRIQUES_TOKEN, MiddlewareMetriques
+from services.profilage import (
+    ECHANTILLONNEUR, PROFILAGE_ACTIF, PROFILAGE_ECHANTILLONNAGE, PROFILAGE_INTERVALLE_MS,
+    MiddlewareProfilage, installer_profilage
+)
 
 # Routers
 from routers import (
     utilisateur, client, produit, stock,
     commande, ligne_commande, reservation,
-    vente, alerte_stock, auth, prediction, lot, alerte_expiration, livraison
+    vente, alerte_stock, auth, prediction, lot, alerte_expiration, livraison, profilage
 )
-from services.prediction_service import MODELE_ML
-from database import engine
+from services.prediction_service import MODELE, prechauffer
+from database import engine, pool_stats
 import sqlalchemy
+import threading
 import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-Base.metadata.create_all(bind=engine)
+# Le schéma est géré par les scripts SQL: create_all seulement sur demande
+# (dev, tests) et au démarrage, jamais à l'import.
+DB_CREATE_ALL = os.getenv("DB_CREATE_ALL", "false").lower() == "true"
+# Chargement du modèle ML / client Gemini en tâche de fond au démarrage
+ML_PRECHAUFFAGE = os.getenv("ML_PRECHAUFFAGE", "true").lower() == "true"
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -34,16 +47,28 @@ scheduler_instance = None
 async def lifespan(app: FastAPI):
     """
     Gestion du cycle de vie de l'application
-    - Démarrage: Initialiser le scheduler
-    - Arrêt: Arrêter le scheduler
+    - Démarrage: create_all (optionnel), préchauffage ML en arrière-plan, métriques,
+      échantillonnage (optionnel), scheduler
+    - Arrêt: Arrêter le scheduler et l'échantillonnage
     """
     # Startup
     global scheduler_instance
+    if DB_CREATE_ALL:
+        Base.metadata.create_all(bind=engine)
+    if ML_PRECHAUFFAGE:
+        threading.Thread(target=prechauffer, name="prechauffage-ml", daemon=True).start()
+    if METRIQUES_ACTIVES:
+        METRIQUES.activer()
+    if PROFILAGE_ACTIF and PROFILAGE_ECHANTILLONNAGE:
+        ECHANTILLONNEUR.demarrer(intervalle_ms=PROFILAGE_INTERVALLE_MS)
     scheduler_instance = start_scheduler()
     yield
     # Shutdown
     if scheduler_instance:
         stop_scheduler(scheduler_instance)
+    if ECHANTILLONNEUR.actif:
+        ECHANTILLONNEUR.arreter()
+    arreter_pools()
 
 
 app = FastAPI(
@@ -58,8 +83,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "X-Profile-Fichier"],  # Pagination par curseur, métriques, profilage
 )
 
+# Latence / requêtes SQL par route (passe-plat tant que les métriques sont inactives)
+app.add_middleware(MiddlewareMetriques)
+
+# Profil cProfile d'une requête à la demande d'un ADMIN (passe-plat si PROFILAGE_ACTIF=false)
+app.add_middleware(MiddlewareProfilage)
+
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -78,6 +110,7 @@ app.include_router(alerte_expiration.router)  # 🎯 Phase 2 - Alertes intellige
 app.include_router(livraison.router)  # 🎯 Phase 3 - Gestion des livraisons
 app.include_router(auth.router)
 app.include_router(prediction.router)
+app.include_router(profilage.router)
 
 @app.get("/")
 def root():
@@ -106,12 +139,12 @@ def health_check():
     except Exception as e:
         health_status["services"]["database"] = f"error: {str(e)}"
         health_status["status"] = "unhealthy"
+    health_status["services"]["database_pool"] = pool_stats()
     
-    # Vérifier le modèle ML
-    if MODELE_ML is not None:
-        health_status["services"]["ml_model"] = "loaded"
-    else:
-        health_status["services"]["ml_model"] = "not_loaded"
+    # Vérifier le modèle ML (sans déclencher son chargement)
+    etat_modele = MODELE.etat()
+    health_status["services"]["ml_model"] = etat_modele
+    if etat_modele in ("missing", "error"):
         health_status["status"] = "degraded"
     
     # Vérifier la configuration Gemini
@@ -122,4 +155,21 @@ def health_check():
         health_status["services"]["gemini_api"] = "not_configured"
         health_status["status"] = "degraded"
     
-    return health_status
\ No newline at end of file
+    return health_status
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(authorization: Optional[str] = Header(None)):
+    """
+    Métriques par route au format texte Prometheus (METRIQUES_ACTIVES=true)
+    """
+    if not METRIQUES.actif:
+        raise HTTPException(status_code=404, detail="Métriques désactivées")
+    if METRIQUES_TOKEN and authorization != f"Bearer {METRIQUES_TOKEN}":
+        raise HTTPException(status_code=401, detail="Jeton de métriques invalide")
+    return PlainTextResponse(METRIQUES.exporter(), media_type="text/plain; version=0.0.4")
+
+
+# Après la déclaration de toutes les routes: le profil d'une requête est activé
+# dans le thread qui exécute l'endpoint (PROFILAGE_ACTIF=false: jamais déclenché)
+installer_profilage(app)
@@ -4,11 +4,13 @@ from sqlalchemy import (
     String,
     Text,
     Numeric,
+    Date,
     DateTime,
     Boolean,
     ForeignKey,
     CheckConstraint,
-    UniqueConstraint
+    UniqueConstraint,
+    Index
 )
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.sql import func
@@ -46,6 +48,24 @@ class Utilisateur(Base):
     )
 
 
+class TokenRevoque(Base):
+    """
+    Tokens JWT révoqués (déconnexion), identifiés par leur jti.
+    Gardés jusqu'à date_expiration du token, puis purgés par le scheduler.
+    """
+    __tablename__ = "token_revoque"
+
+    id_revocation = Column(Integer, primary_key=True)
+    jti = Column(String(64), unique=True, nullable=False)
+    id_utilisateur = Column(
+        Integer,
+        ForeignKey("utilisateur.id_utilisateur", ondelete="CASCADE"),
+        nullable=False
+    )
+    date_revocation = Column(DateTime, nullable=False, index=True)
+    date_expiration = Column(DateTime, nullable=False)
+
+
 # =====================================================
 # CLIENT (SPÉCIALISATION LOGIQUE DE UTILISATEUR)
 # =====================================================
@@ -129,6 +149,7 @@ class Lot(Base):
     quantite_restante = Column(Integer, nullable=False)
     fournisseur = Column(String(150), nullable=True)
     date_creation = Column(DateTime, server_default=func.now())
+    date_prochaine_alerte = Column(DateTime, nullable=True, index=True)  # Prochain changement de seuil d'alerte
     
     id_produit = Column(
         Integer,
@@ -154,6 +175,88 @@ class Lot(Base):
     lignes_commande = relationship("LigneCommande", back_populates="lot", cascade="all, delete-orphan")
 
 
+# =====================================================
+# MOUVEMENTS DE STOCK (JOURNAL APPEND-ONLY)
+# =====================================================
+class MouvementStock(Base):
+    """
+    Journal des mouvements de stock: une ligne par variation, jamais modifiée.
+    Stock.quantite_disponible est la projection (somme) de ce journal.
+    """
+    __tablename__ = "mouvement_stock"
+
+    id_mouvement = Column(Integer, primary_key=True)
+    date_mouvement = Column(DateTime, server_default=func.now(), nullable=False)
+    type_mouvement = Column(String(20), nullable=False)  # INITIAL, RECEPTION, DEDUCTION_FEFO, AJUSTEMENT, PEREMPTION
+    quantite = Column(Integer, nullable=False)  # Variation signée
+    motif = Column(Text, nullable=True)
+
+    id_produit = Column(
+        Integer,
+        ForeignKey("produit.id_produit", ondelete="CASCADE"),
+        nullable=False
+    )
+    id_lot = Column(
+        Integer,
+        ForeignKey("lot.id_lot", ondelete="SET NULL"),
+        nullable=True
+    )
+    id_commande = Column(
+        Integer,
+        ForeignKey("commande.id_commande", ondelete="SET NULL"),
+        nullable=True
+    )
+
+    __table_args__ = (
+        CheckConstraint(
+            "type_mouvement IN ('INITIAL', 'RECEPTION', 'DEDUCTION_FEFO', 'AJUSTEMENT', 'PEREMPTION')",
+            name="ck_mouvement_stock_type"
+        ),
+        Index("idx_mouvement_stock_produit_date", "id_produit", "date_mouvement"),
+        # Pagination keyset ?tri=date
+        Index("idx_mouvement_stock_date_id", "date_mouvement", "id_mouvement"),
+    )
+
+
+class SnapshotStock(Base):
+    """
+    Niveau de stock d'un produit figé périodiquement (scheduler).
+    id_dernier_mouvement: dernier mouvement inclus dans la quantité.
+    """
+    __tablename__ = "snapshot_stock"
+
+    id_snapshot = Column(Integer, primary_key=True)
+    date_snapshot = Column(DateTime, nullable=False)
+    quantite = Column(Integer, nullable=False)
+    id_dernier_mouvement = Column(Integer, nullable=False)
+
+    id_produit = Column(
+        Integer,
+        ForeignKey("produit.id_produit", ondelete="CASCADE"),
+        nullable=False
+    )
+
+    __table_args__ = (
+        Index("idx_snapshot_stock_produit_date", "id_produit", "date_snapshot"),
+    )
+
+
+class ReconciliationStock(Base):
+    """
+    Historique des réconciliations Stock / lots.
+    id_dernier_mouvement: filigrane du passage incrémental suivant.
+    """
+    __tablename__ = "reconciliation_stock"
+
+    id_reconciliation = Column(Integer, primary_key=True)
+    date_execution = Column(DateTime, server_default=func.now(), nullable=False)
+    mode = Column(String(20), nullable=False)  # INCREMENTAL, COMPLET
+    id_dernier_mouvement = Column(Integer, nullable=False, default=0)
+    produits_verifies = Column(Integer, nullable=False, default=0)
+    ecarts = Column(Integer, nullable=False, default=0)
+    repares = Column(Integer, nullable=False, default=0)
+
+
 # =====================================================
 # COMMANDE
 # =====================================================
@@ -161,7 +264,7 @@ class Commande(Base):
     __tablename__ = "commande"
 
     id_commande = Column(Integer, primary_key=True)
-    date_commande = Column(DateTime, server_default=func.now())
+    date_commande = Column(DateTime, server_default=func.now(), nullable=False)
     montant_total = Column(Numeric(12, 2), default=0)
     statut = Column(String(20), nullable=False)
 
@@ -176,6 +279,8 @@ class Commande(Base):
             "statut IN ('EN_ATTENTE', 'ACCEPTEE', 'REFUSEE')",
             name="ck_commande_statut"
         ),
+        # Pagination keyset ?tri=date
+        Index("idx_commande_date_id", "date_commande", "id_commande"),
     )
 
     client = relationship("Client", back_populates="commandes")
@@ -235,7 +340,7 @@ class Reservation(Base):
     __tablename__ = "reservation"
 
     id_reservation = Column(Integer, primary_key=True)
-    date_reservation = Column(DateTime, server_default=func.now())
+    date_reservation = Column(DateTime, server_default=func.now(), nullable=False)
     statut = Column(String(20), nullable=False)
 
     id_client = Column(
@@ -249,6 +354,8 @@ class Reservation(Base):
             "statut IN ('EN_ATTENTE', 'ACCEPTEE', 'REFUSEE')",
             name="ck_reservation_statut"
         ),
+        # Pagination keyset ?tri=date
+        Index("idx_reservation_date_id", "date_reservation", "id_reservation"),
     )
 
     client = relationship("Client", back_populates="reservations")
@@ -298,7 +405,7 @@ class Vente(Base):
     __tablename__ = "vente"
 
     id_vente = Column(Integer, primary_key=True)
-    date_vente = Column(DateTime, server_default=func.now())
+    date_vente = Column(DateTime, server_default=func.now(), nullable=False)
     chiffre_affaires = Column(Numeric(12, 2), nullable=False)
     deleted_at = Column(DateTime, nullable=True)
 
@@ -309,9 +416,44 @@ class Vente(Base):
         nullable=False
     )
 
+    __table_args__ = (
+        # Pagination keyset ?tri=date
+        Index("idx_vente_date_id", "date_vente", "id_vente"),
+    )
+
     commande = relationship("Commande", back_populates="vente")
 
 
+# =====================================================
+# VENTE JOURNALIÈRE (AGRÉGAT PRÉCALCULÉ)
+# =====================================================
+class VenteJournaliere(Base):
+    """
+    Chiffre d'affaires agrégé par jour, rafraîchi par le scheduler.
+    Une ligne par jour rafraîchi (y compris les jours sans vente).
+    """
+    __tablename__ = "vente_journaliere"
+
+    jour = Column(Date, primary_key=True)
+    chiffre_affaires = Column(Numeric(14, 2), nullable=False, default=0)
+    nombre_ventes = Column(Integer, nullable=False, default=0)
+    date_mise_a_jour = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class VenteProduitJournaliere(Base):
+    """Quantités et CA vendus par produit et par jour, rafraîchis par le scheduler"""
+    __tablename__ = "vente_produit_journaliere"
+
+    jour = Column(Date, primary_key=True)
+    id_produit = Column(
+        Integer,
+        ForeignKey("produit.id_produit", ondelete="CASCADE"),
+        primary_key=True
+    )
+    quantite = Column(Integer, nullable=False, default=0)
+    chiffre_affaires = Column(Numeric(14, 2), nullable=False, default=0)
+
+
 # =====================================================
 # ALERTE STOCK
 # =====================================================
@@ -319,16 +461,27 @@ class AlerteStock(Base):
     __tablename__ = "alerte_stock"
 
     id_alerte = Column(Integer, primary_key=True)
-    date_alerte = Column(DateTime, server_default=func.now())
+    date_alerte = Column(DateTime, server_default=func.now(), nullable=False)
     message = Column(Text, nullable=False)
     statut = Column(String(20), nullable=False)
     seuil_declencheur = Column(Integer, nullable=False)
+    type_alerte = Column(String(20), server_default="QUANTITE")  # QUANTITE, JAUNE, ORANGE, ROUGE, EXPIRÉ
 
     id_produit = Column(
         Integer,
         ForeignKey("produit.id_produit"),
         nullable=False
     )
+    id_lot = Column(
+        Integer,
+        ForeignKey("lot.id_lot", ondelete="CASCADE"),
+        nullable=True
+    )
+
+    __table_args__ = (
+        # Pagination keyset ?tri=date
+        Index("idx_alerte_stock_date_id", "date_alerte", "id_alerte"),
+    )
 
     produit = relationship("Produit", back_populates="alertes")
 
@@ -342,7 +495,7 @@ class Livraison(Base):
     id_livraison = Column(Integer, primary_key=True, index=True)
     numero_livraison = Column(String(50), unique=True, nullable=False)
     statut = Column(String(30), nullable=False, default="EN_PREPARATION")
-    date_creation = Column(DateTime, server_default=func.now(), index=True)
+    date_creation = Column(DateTime, server_default=func.now(), nullable=False)
     date_preparation = Column(DateTime, nullable=True)
     date_expedition = Column(DateTime, nullable=True)
     date_livraison = Column(DateTime, nullable=True)
@@ -376,6 +529,8 @@ class Livraison(Base):
             "date_livraison IS NULL OR date_livraison >= COALESCE(date_expedition, date_creation)",
             name="ck_livraison_delivery_date"
         ),
+        # Pagination keyset (tri par défaut: date de création décroissante)
+        Index("idx_livraison_date_creation_id", "date_creation", "id_livraison"),
     )
 
     # Relations
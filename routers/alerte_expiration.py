@@ -3,15 +3,16 @@ Router pour gestion des alertes d'expiration des lots
 Endpoints pour scanner, consulter et gérer les alertes
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from datetime import datetime
 
-from database import get_db
+from database import get_db, get_read_db, LectureDB
 from models.model import Utilisateur
 from services.alerte_expiration_service import AlerteExpirationService
 from schema.enums import RoleEnum
 from security.dependencies import get_current_user
+from security.limiter import limite_par_role
 
 router = APIRouter(
     prefix="/alertes",
@@ -23,7 +24,9 @@ router = APIRouter(
 # 📊 SCANNER - Déclencher scan manuel
 # =====================================================
 @router.post("/scanner")
+@limite_par_role("scan")
 def scanner_alertes_manuel(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: Utilisateur = Depends(get_current_user)
 ):
@@ -67,10 +70,10 @@ def scanner_alertes_manuel(
 # 📖 LIRE - Consulter les alertes
 # =====================================================
 @router.get("/expirations")
-def get_alertes_expirations(
+async def get_alertes_expirations(
     type_alerte: str = None,  # JAUNE, ORANGE, ROUGE, EXPIRÉ
     id_produit: int = None,
-    db: Session = Depends(get_db),
+    lecture: LectureDB = Depends(get_read_db),
     current_user: Utilisateur = Depends(get_current_user)
 ):
     """
@@ -88,8 +91,8 @@ def get_alertes_expirations(
     if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_STOCK, RoleEnum.GEST_COMMERCIAL]:
         raise HTTPException(status_code=403, detail="Permissions insuffisantes")
     
-    alertes = AlerteExpirationService.get_alertes_expirations(
-        db,
+    alertes = await lecture.run(
+        AlerteExpirationService.get_alertes_expirations,
         type_alerte=type_alerte,
         id_produit=id_produit
     )
@@ -108,8 +111,8 @@ def get_alertes_expirations(
 # 📊 DASHBOARD - Vue d'ensemble
 # =====================================================
 @router.get("/dashboard")
-def get_alertes_dashboard(
-    db: Session = Depends(get_db),
+async def get_alertes_dashboard(
+    lecture: LectureDB = Depends(get_read_db),
     current_user: Utilisateur = Depends(get_current_user)
 ):
     """
@@ -127,7 +130,7 @@ def get_alertes_dashboard(
     if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_STOCK]:
         raise HTTPException(status_code=403, detail="Permissions insuffisantes")
     
-    stats = AlerteExpirationService.get_alertes_dashboard(db)
+    stats = await lecture.run(AlerteExpirationService.get_alertes_dashboard)
     
     # Ajouter recommandations
     recommandations = []
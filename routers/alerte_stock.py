@@ -9,6 +9,7 @@ from schema.alerte_stock import AlerteStockCreate, AlerteStockRead
 from security.access_control import RoleChecker
 from schema.enums import RoleEnum
 from security.dependencies import get_current_user
+from services.pagination import Pagination
 
 router = APIRouter(
     prefix="/alertes-stock",
@@ -33,10 +34,28 @@ def create_alerte(data: AlerteStockCreate, db: Session = Depends(get_db), curren
     return alerte
 
 @router.get("/", response_model=list[AlerteStockRead])
-def get_alertes(db: Session = Depends(get_db), current_user: Utilisateur = Depends(get_current_user)):
+def get_alertes(
+    statut: str = None,
+    id_produit: int = None,
+    type_alerte: str = None,
+    pagination: Pagination = Depends(),
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
     if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_STOCK]:
         raise HTTPException(status_code=403, detail="Permissions insuffisantes")
-    return db.query(AlerteStock).all()
+    query = db.query(AlerteStock)
+    if statut:
+        query = query.filter(AlerteStock.statut == statut)
+    if id_produit:
+        query = query.filter(AlerteStock.id_produit == id_produit)
+    if type_alerte:
+        query = query.filter(AlerteStock.type_alerte == type_alerte)
+    return pagination.paginer(
+        query,
+        {"id": AlerteStock.id_alerte, "date": AlerteStock.date_alerte},
+        AlerteStock.id_alerte
+    )
 
 @router.get("/{id_alerte}", response_model=AlerteStockRead)
 def get_alerte(id_alerte: int, db: Session = Depends(get_db)):
@@ -7,6 +7,9 @@ from models.model import Utilisateur
 from schema.utilisateur import LoginRequest, TokenResponse
 from security.hashing import verify_password
 from security.jwt import create_access_token
+from security.dependencies import oauth2_scheme, get_current_user
+from security.auth_cache import AUTH_CACHE, empreinte_token
+from security.revocation import revoquer_token
 from security.limiter import limiter
 from fastapi import Request
 
@@ -37,3 +40,22 @@ def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db
     })
 
     return {"access_token": token}
+
+@router.post("/logout")
+def logout(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Déconnexion: le token courant est révoqué jusqu'à son expiration
+    """
+    if not current_user.jti:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Token sans identifiant (jti): reconnectez-vous pour obtenir un token révocable"
+        )
+
+    revoquer_token(db, current_user.jti, current_user.id_utilisateur, current_user.exp)
+    AUTH_CACHE.invalider_token(empreinte_token(token))
+    return {"message": "Déconnexion réussie"}
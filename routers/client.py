@@ -5,6 +5,7 @@ from database import get_db
 from models.model import Client, Utilisateur
 from schema.client import ClientCreate, ClientRead
 from security.dependencies import get_current_user
+from services.pagination import Pagination
 from security.access_control import RoleChecker
 from schema.enums import RoleEnum
 from sqlalchemy.exc import IntegrityError
@@ -68,8 +69,16 @@ def delete_client(id_client: int, db: Session = Depends(get_db), current_user: U
     return {"message": "Client désactivé avec succès"}
 
 @router.get("/", response_model=list[ClientRead])
-def get_clients(db: Session = Depends(get_db), current_user: Utilisateur = Depends(get_current_user)):
+def get_clients(
+    pagination: Pagination = Depends(),
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
     if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_COMMERCIAL]:
         raise HTTPException(status_code=403, detail="Permissions insuffisantes")
     # Filtrer uniquement les clients actifs
-    return db.query(Client).filter(Client.actif == True).all()
+    return pagination.paginer(
+        db.query(Client).filter(Client.actif == True),
+        {"id": Client.id_client},
+        Client.id_client
+    )
@@ -1,16 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from decimal import Decimal
+from datetime import datetime
 
-from database import get_db
+from database import get_db, get_read_db, LectureDB
 from models.model import Commande, Client, LigneCommande, Lot, Stock
 from schema.commande import CommandeCreate, CommandeRead
 from schema.enums import RoleEnum, StatutCommandeEnum
 from security.dependencies import get_current_user
-from services.fefo_service import FEFOService
-from services.pdf_service import PDFService
+from security.limiter import limite_par_role
+from services.fefo_service import FEFOService, FEFOConflictError, invalider_resume_lots
+from services.fefo_index import invalider_index_fefo
+from services.pagination import Pagination
+from services.export_service import ExportService, FORMATS_EXPORT
+from services.prediction_service import invalider_predictions
+from services.alerte_expiration_service import signaler_lots_modifies
+from services.pdf_cache import servir_pdf, invalider_pdf_commandes
+from services.stock_ledger_service import StockLedgerService, mouvement
 
 router = APIRouter(
     prefix="/commandes",
@@ -54,17 +62,65 @@ def create_commande(
 
 @router.get("/", response_model=list[CommandeRead])
 def get_commandes(
+    statut: str = None,
+    id_client: int = None,
+    date_debut: datetime = None,
+    date_fin: datetime = None,
+    pagination: Pagination = Depends(),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """
-    Lister toutes les commandes
+    Lister les commandes (paginé, curseur dans l'en-tête X-Next-Cursor)
     
     **Permissions**: ADMIN, GEST_COMMERCIAL
+    
+    **Filtres optionnels**: statut, id_client, date_debut, date_fin
+    
+    **Tri**: id (défaut) ou date
+    """
+    if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_COMMERCIAL]:
+        raise HTTPException(status_code=403, detail="Permissions insuffisantes")
+    query = db.query(Commande)
+    if statut:
+        query = query.filter(Commande.statut == statut)
+    if id_client:
+        query = query.filter(Commande.id_client == id_client)
+    if date_debut:
+        query = query.filter(Commande.date_commande >= date_debut)
+    if date_fin:
+        query = query.filter(Commande.date_commande < date_fin)
+    return pagination.paginer(
+        query,
+        {"id": Commande.id_commande, "date": Commande.date_commande},
+        Commande.id_commande
+    )
+
+
+@router.get("/export")
+def export_commandes(
+    format_export: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    date_debut: datetime = None,
+    date_fin: datetime = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    📤 Exporter l'historique des commandes en flux (NDJSON ou CSV)
+    
+    **Permissions**: ADMIN, GEST_COMMERCIAL
+    
+    Une ligne par ligne de commande, avec client et produit.
     """
     if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_COMMERCIAL]:
         raise HTTPException(status_code=403, detail="Permissions insuffisantes")
-    return db.query(Commande).all()
+    
+    filename = f"commandes-{datetime.now():%Y%m%d}.{format_export}"
+    return StreamingResponse(
+        ExportService.flux(db, ExportService.requete_commandes(date_debut, date_fin), format_export),
+        media_type=FORMATS_EXPORT[format_export],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 
 @router.get("/{id_commande}", response_model=CommandeRead)
@@ -125,29 +181,26 @@ def valider_commande_fefo(
             detail="Commande sans lignes. Impossible de valider."
         )
     
-    # Traiter chaque ligne de commande avec FEFO
+    # Traiter toutes les lignes de commande avec FEFO (une requête pour tous les lots)
     fefo_details = []
+    lignes = list(commande.lignes)
     
     try:
-        for ligne in commande.lignes:
-            produit_id = ligne.id_produit
-            quantite = ligne.quantite
-            
-            # Allocation FEFO
-            allocations, success, error = FEFOService.allocate_fefo(
-                db, produit_id, quantite
-            )
-            
-            if not success:
-                # Si une ligne échoue, abort tout
-                db.rollback()
-                raise HTTPException(status_code=400, detail=error)
-            
+        allocations_par_ligne, success, error = FEFOService.allocate_and_deduct_commande(
+            db, [(ligne.id_produit, ligne.quantite) for ligne in lignes]
+        )
+        
+        if not success:
+            # Si une ligne échoue, abort tout
+            db.rollback()
+            raise HTTPException(status_code=400, detail=error)
+        
+        for ligne, allocations in zip(lignes, allocations_par_ligne):
             # Enregistrer l'allocation
             fefo_details.append({
                 "id_ligne": ligne.id_ligne_commande,
-                "id_produit": produit_id,
-                "quantite_demandee": quantite,
+                "id_produit": ligne.id_produit,
+                "quantite_demandee": ligne.quantite,
                 "lots_utilises": allocations
             })
             
@@ -156,20 +209,31 @@ def valider_commande_fefo(
             if allocations:
                 ligne.id_lot = allocations[0]["id_lot"]
         
-        # Si tout est OK, appliquer les déductions
+        # Les déductions sont déjà appliquées (UPDATE conditionnel)
         all_allocations = []
         for detail in fefo_details:
             all_allocations.extend(detail["lots_utilises"])
         
-        if not FEFOService.deduct_lots(db, all_allocations):
-            db.rollback()
-            raise HTTPException(status_code=400, detail="Erreur déduction stocks")
+        # Journal + projection du stock (remplace trg_maj_stock_commande_acceptee)
+        StockLedgerService.enregistrer(db, [
+            mouvement(
+                "DEDUCTION_FEFO", detail["id_produit"], -alloc["quantite"],
+                id_lot=alloc["id_lot"], id_commande=commande.id_commande
+            )
+            for detail in fefo_details
+            for alloc in detail["lots_utilises"]
+        ])
         
         # Mettre à jour statut commande
         commande.statut = StatutCommandeEnum.ACCEPTEE
         
         db.commit()
         db.refresh(commande)
+        invalider_predictions([detail["id_produit"] for detail in fefo_details])
+        signaler_lots_modifies(alloc["id_lot"] for alloc in all_allocations)
+        invalider_resume_lots()
+        invalider_index_fefo(detail["id_produit"] for detail in fefo_details)
+        invalider_pdf_commandes([commande.id_commande])
         
         return {
             "message": "✅ Commande validée avec succès (FEFO appliqué)",
@@ -181,6 +245,9 @@ def valider_commande_fefo(
     
     except HTTPException:
         raise
+    except FEFOConflictError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Erreur validation: {str(e)}")
@@ -222,9 +289,14 @@ def delete_commande(
             detail="Impossible de supprimer une commande avec vente associée"
         )
     
+    # Lignes supprimées en cascade: comptées par les prédictions (réservations)
+    ids_produits = {ligne.id_produit for ligne in commande.lignes}
     try:
         db.delete(commande)
         db.commit()
+        invalider_pdf_commandes([id_commande])
+        if ids_produits:
+            invalider_predictions(list(ids_produits))
         return {"message": "Commande supprimée avec succès"}
     except IntegrityError:
         db.rollback()
@@ -235,9 +307,11 @@ def delete_commande(
 
 
 @router.get("/{id_commande}/bon-pdf")
-def download_bon_commande(
+@limite_par_role("pdf")
+async def download_bon_commande(
     id_commande: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    lecture: LectureDB = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -250,26 +324,29 @@ def download_bon_commande(
     - Détails client
     - Liste des articles
     - Montant total
+    
+    Le PDF est mis en cache tant que la commande ne change pas; l'ETag permet
+    au client de revalider (If-None-Match → 304).
     """
     if current_user.role not in [RoleEnum.CLIENT, RoleEnum.ADMIN, RoleEnum.GEST_COMMERCIAL]:
         raise HTTPException(status_code=403, detail="Permissions insuffisantes")
     
-    commande = db.get(Commande, id_commande)
-    if not commande:
+    # Import local: reportlab/svglib ne sont chargés qu'à la première génération
+    from services.pdf_service import PDFService
+    try:
+        snapshot = await lecture.run(PDFService.snapshot_bon_commande, id_commande)
+    except ValueError:
         raise HTTPException(status_code=404, detail="Commande introuvable")
     
     # Vérification: CLIENT ne peut accéder qu'à ses propres commandes
     if current_user.role == RoleEnum.CLIENT:
-        if commande.id_client != current_user.id_utilisateur:
+        if snapshot["id_client"] != current_user.id_utilisateur:
             raise HTTPException(status_code=403, detail="Vous n'avez pas accès à cette commande")
     
     try:
-        pdf_buffer = PDFService.generate_bon_commande(id_commande)
-        filename = f"bon-commande-{id_commande:06d}.pdf"
-        return StreamingResponse(
-            pdf_buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        return await servir_pdf(
+            request, "commande", id_commande, snapshot,
+            filename=f"bon-commande-{id_commande:06d}.pdf"
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur génération PDF: {str(e)}")
@@ -9,6 +9,9 @@ from schema.ligne_commande import LigneCommandeCreate, LigneCommandeRead
 from security.access_control import RoleChecker
 from schema.enums import RoleEnum
 from security.dependencies import get_current_user
+from services.prediction_service import invalider_predictions
+from services.pdf_cache import invalider_pdf_commandes
+from services.pagination import Pagination
 
 router = APIRouter(
     prefix="/ligne-commandes",
@@ -33,13 +36,30 @@ def create_ligne_commande(data: LigneCommandeCreate, db: Session = Depends(get_d
     except IntegrityError:
         db.rollback()
         raise HTTPException(status_code=400, detail="Ligne de commande déjà existante pour ce produit")
+    invalider_predictions([ligne.id_produit])
+    invalider_pdf_commandes([ligne.id_commande])
     return ligne
 
 @router.get("/", response_model=list[LigneCommandeRead])
-def get_lignes_commande(db: Session = Depends(get_db), current_user: Utilisateur = Depends(get_current_user)):
+def get_lignes_commande(
+    id_commande: int = None,
+    id_produit: int = None,
+    pagination: Pagination = Depends(),
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
     if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_COMMERCIAL, RoleEnum.GEST_STOCK]:
         raise HTTPException(status_code=403, detail="Permissions insuffisantes")
-    return db.query(LigneCommande).all()
+    query = db.query(LigneCommande)
+    if id_commande:
+        query = query.filter(LigneCommande.id_commande == id_commande)
+    if id_produit:
+        query = query.filter(LigneCommande.id_produit == id_produit)
+    return pagination.paginer(
+        query,
+        {"id": LigneCommande.id_ligne_commande},
+        LigneCommande.id_ligne_commande
+    )
 
 @router.get("/{id_ligne}", response_model=LigneCommandeRead)
 def get_ligne_commande(id_ligne: int, db: Session = Depends(get_db)):
@@ -58,6 +78,8 @@ def delete_ligne_commande(id_ligne: int, db: Session = Depends(get_db), current_
     try:
         db.delete(ligne)
         db.commit()
+        invalider_predictions([ligne.id_produit])
+        invalider_pdf_commandes([ligne.id_commande])
         return {"message": "Ligne de commande supprimée avec succès"}
     except IntegrityError:
         db.rollback()
@@ -3,13 +3,15 @@ Router pour gestion des livraisons (Delivery Management)
 Endpoints pour créer, consulter, et tracker les livraisons
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from datetime import datetime
-from sqlalchemy import desc
+from sqlalchemy import func
+from datetime import datetime, timedelta
+from typing import Optional
 
-from database import get_db
+from database import get_db, get_read_db, LectureDB
 from models.model import Livraison, Commande, Utilisateur
 from schema.livraison import (
     LivraisonCreate, LivraisonRead, LivraisonUpdate, 
@@ -17,7 +19,12 @@ from schema.livraison import (
 )
 from schema.enums import RoleEnum, StatutCommandeEnum
 from security.dependencies import get_current_user
-from services.pdf_service import PDFService
+from security.limiter import limite_par_role
+from services.pagination import Pagination
+from services.pdf_cache import (
+    servir_pdf, invalider_pdf_livraisons, rendre_documents, fusionner_pdfs, flux_zip,
+    PDF_LOT_MAX_DOCUMENTS
+)
 
 router = APIRouter(
     prefix="/livraisons",
@@ -102,6 +109,7 @@ def create_livraison(
 def get_livraisons(
     statut: str = None,
     id_commande: int = None,
+    pagination: Pagination = Depends(),
     db: Session = Depends(get_db),
     current_user: Utilisateur = Depends(get_current_user)
 ):
@@ -114,7 +122,8 @@ def get_livraisons(
     - statut: EN_PREPARATION, PRETE, EN_LIVRAISON, LIVRÉE
     - id_commande: Limiter à une commande spécifique
     
-    **Retourne**: Liste des livraisons triée par date (plus récentes d'abord)
+    **Retourne**: Liste des livraisons triée par date (plus récentes d'abord),
+    paginée (curseur suivant dans l'en-tête X-Next-Cursor)
     """
     
     if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_COMMERCIAL]:
@@ -128,8 +137,92 @@ def get_livraisons(
     if id_commande:
         query = query.filter(Livraison.id_commande == id_commande)
     
-    livraisons = query.order_by(desc(Livraison.date_creation)).all()
-    return livraisons
+    return pagination.paginer(
+        query,
+        {"date": Livraison.date_creation, "id": Livraison.id_livraison},
+        Livraison.id_livraison,
+        ordre_defaut="desc"
+    )
+
+
+# =====================================================
+# 🖨️ IMPRESSION PAR LOT - Plusieurs bons en une requête
+# =====================================================
+@router.get("/bons-livraison-pdf")
+@limite_par_role("pdf_lot")
+async def download_bons_livraison(
+    request: Request,
+    statut: Optional[str] = None,
+    ids: Optional[list[int]] = Query(None, description="Ids de livraison (répéter le paramètre)"),
+    format_sortie: str = Query("pdf", alias="format", pattern="^(pdf|zip)$"),
+    lecture: LectureDB = Depends(get_read_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    """
+    🖨️ Télécharger plusieurs bons de livraison en une fois
+    
+    **Permissions**: ADMIN, GEST_COMMERCIAL
+    
+    **Sélection**: `statut` (ex: PRETE) et/ou `ids` (ex: ?ids=1&ids=2)
+    
+    **Formats**:
+    - pdf: un seul PDF fusionné (impression directe)
+    - zip: un PDF par livraison, archive streamée au fil des rendus
+    
+    Les données sont lues en 2 requêtes; les rendus manquants sont répartis
+    sur un pool de processus et mis en cache.
+    """
+    
+    if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_COMMERCIAL]:
+        raise HTTPException(status_code=403, detail="Permissions insuffisantes")
+    
+    if not statut and not ids:
+        raise HTTPException(status_code=400, detail="Préciser un statut ou une liste d'ids")
+    
+    if ids and len(ids) > PDF_LOT_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Trop de documents demandés (max {PDF_LOT_MAX_DOCUMENTS})"
+        )
+    
+    from services.pdf_service import PDFService
+    snapshots = await lecture.run(
+        PDFService.snapshots_bons_livraison,
+        ids_livraisons=ids,
+        statut=statut.upper() if statut else None,
+        limite=PDF_LOT_MAX_DOCUMENTS + 1
+    )
+    if not snapshots:
+        raise HTTPException(status_code=404, detail="Aucune livraison ne correspond à la sélection")
+    if len(snapshots) > PDF_LOT_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Trop de documents pour ce filtre (max {PDF_LOT_MAX_DOCUMENTS}), préciser la sélection"
+        )
+    
+    horodatage = datetime.now().strftime("%Y%m%d-%H%M%S")
+    pdfs = rendre_documents("livraison", "id_livraison", snapshots)
+    
+    if format_sortie == "zip":
+        fichiers = (
+            (f"bon-livraison-{snapshot['numero_livraison']}.pdf", pdf)
+            for snapshot, pdf in zip(snapshots, pdfs)
+        )
+        return StreamingResponse(
+            flux_zip(fichiers),
+            media_type="application/zip",
+            headers={"Content-Disposition": f"attachment; filename=bons-livraison-{horodatage}.zip"}
+        )
+    
+    try:
+        pdf = await run_in_threadpool(fusionner_pdfs, pdfs)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur génération PDF: {str(e)}")
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename=bons-livraison-{horodatage}.pdf"}
+    )
 
 
 @router.get("/{id_livraison}", response_model=LivraisonDetailRead)
@@ -253,6 +346,7 @@ def update_livraison_statut(
         db.add(livraison)
         db.commit()
         db.refresh(livraison)
+        invalider_pdf_livraisons([id_livraison])
         return livraison
     except Exception as e:
         db.rollback()
@@ -291,6 +385,7 @@ def update_livraison(
         db.add(livraison)
         db.commit()
         db.refresh(livraison)
+        invalider_pdf_livraisons([id_livraison])
         return livraison
     except Exception as e:
         db.rollback()
@@ -301,8 +396,8 @@ def update_livraison(
 # 📊 DASHBOARD - Vue d'ensemble
 # =====================================================
 @router.get("/dashboard/stats")
-def get_livraisons_dashboard(
-    db: Session = Depends(get_db),
+async def get_livraisons_dashboard(
+    lecture: LectureDB = Depends(get_read_db),
     current_user: Utilisateur = Depends(get_current_user)
 ):
     """
@@ -321,17 +416,26 @@ def get_livraisons_dashboard(
     
     now = datetime.now()
     
-    # Compter par statut
-    total_en_prep = db.query(Livraison).filter(Livraison.statut == "EN_PREPARATION").count()
-    total_prete = db.query(Livraison).filter(Livraison.statut == "PRETE").count()
-    total_en_livraison = db.query(Livraison).filter(Livraison.statut == "EN_LIVRAISON").count()
-    total_livree = db.query(Livraison).filter(Livraison.statut == "LIVRÉE").count()
-    
-    # Livraisons trop longues
-    livraisons_longues = db.query(Livraison).filter(
-        Livraison.statut.in_(["EN_PREPARATION", "PRETE", "EN_LIVRAISON"]),
-        (now - Livraison.date_creation).between(3 * 86400, 999999999)  # > 3 jours
-    ).all()
+    def charger(db: Session):
+        # Compter par statut (un seul GROUP BY)
+        par_statut = dict(
+            db.query(Livraison.statut, func.count(Livraison.id_livraison))
+            .group_by(Livraison.statut)
+            .all()
+        )
+        
+        # Livraisons trop longues (> 3 jours)
+        retardees = db.query(func.count(Livraison.id_livraison)).filter(
+            Livraison.statut.in_(["EN_PREPARATION", "PRETE", "EN_LIVRAISON"]),
+            Livraison.date_creation < now - timedelta(days=3)
+        ).scalar()
+        return par_statut, retardees
+    
+    par_statut, nb_retardees = await lecture.run(charger)
+    total_en_prep = par_statut.get("EN_PREPARATION", 0)
+    total_prete = par_statut.get("PRETE", 0)
+    total_en_livraison = par_statut.get("EN_LIVRAISON", 0)
+    total_livree = par_statut.get("LIVRÉE", 0)
     
     return {
         "timestamp": now.isoformat(),
@@ -343,15 +447,17 @@ def get_livraisons_dashboard(
         },
         "total_en_cours": total_en_prep + total_prete + total_en_livraison,
         "total_livrees": total_livree,
-        "livraisons_potentiellement_retardees": len(livraisons_longues),
-        "alerte_critique": len(livraisons_longues) > 0
+        "livraisons_potentiellement_retardees": nb_retardees,
+        "alerte_critique": nb_retardees > 0
     }
 
 
 @router.get("/{id_livraison}/bon-livraison-pdf")
-def download_bon_livraison(
+@limite_par_role("pdf")
+async def download_bon_livraison(
     id_livraison: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    lecture: LectureDB = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -364,27 +470,28 @@ def download_bon_livraison(
     - Adresse et transporteur
     - Liste des produits
     - État et dates d'avancement
+    
+    Mis en cache et servi avec ETag (If-None-Match → 304).
     """
     if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_COMMERCIAL, RoleEnum.CLIENT]:
         raise HTTPException(status_code=403, detail="Permissions insuffisantes")
     
-    livraison = db.query(Livraison).filter(Livraison.id_livraison == id_livraison).first()
-    if not livraison:
+    # Import local: reportlab/svglib ne sont chargés qu'à la première génération
+    from services.pdf_service import PDFService
+    try:
+        snapshot = await lecture.run(PDFService.snapshot_bon_livraison, id_livraison)
+    except ValueError:
         raise HTTPException(status_code=404, detail="Livraison introuvable")
     
     # Vérification: CLIENT ne peut accéder qu'à ses propres livraisons
     if current_user.role == RoleEnum.CLIENT:
-        commande = livraison.commande
-        if commande.id_client != current_user.id_utilisateur:
+        if snapshot["id_client"] != current_user.id_utilisateur:
             raise HTTPException(status_code=403, detail="Vous n'avez pas accès à cette livraison")
     
     try:
-        pdf_buffer = PDFService.generate_bon_livraison(id_livraison)
-        filename = f"bon-livraison-{livraison.numero_livraison}.pdf"
-        return StreamingResponse(
-            pdf_buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        return await servir_pdf(
+            request, "livraison", id_livraison, snapshot,
+            filename=f"bon-livraison-{snapshot['numero_livraison']}.pdf"
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur génération PDF: {str(e)}")
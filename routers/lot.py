@@ -4,14 +4,21 @@ Endpoints pour créer, consulter, mettre à jour les lots
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
-from database import get_db
+from database import get_db, get_read_db, LectureDB
 from models.model import Lot, Produit, Stock, Utilisateur
 from schema.lot import LotCreate, LotRead, LotUpdate, LotDetailRead, LotFEFOInfo
 from security.dependencies import get_current_user
-from services.fefo_service import FEFOService
+from services.fefo_service import FEFOService, invalider_resume_lots
+from services.fefo_index import invalider_index_fefo
+from services.pagination import Pagination
+from services.export_service import ExportService, FORMATS_EXPORT
+from services.alerte_expiration_service import signaler_lots_modifies
+from services.stock_ledger_service import StockLedgerService, mouvement
+from services.prediction_service import invalider_predictions
 from schema.enums import RoleEnum
 from datetime import datetime
 
@@ -73,8 +80,17 @@ def create_lot(
     
     try:
         db.add(lot)
+        db.flush()
+        StockLedgerService.enregistrer(db, [mouvement(
+            "RECEPTION", lot.id_produit, lot.quantite_restante,
+            id_lot=lot.id_lot, motif=f"Réception lot {lot.numero_lot}"
+        )])
         db.commit()
         db.refresh(lot)
+        signaler_lots_modifies([lot.id_lot])
+        invalider_resume_lots()
+        invalider_index_fefo([lot.id_produit])
+        invalider_predictions([lot.id_produit])
         return lot
     except IntegrityError as e:
         db.rollback()
@@ -90,10 +106,11 @@ def create_lot(
 # 📖 READ - Consulter les lots
 # =====================================================
 @router.get("/", response_model=list[LotDetailRead])
-def get_lots(
+async def get_lots(
     id_produit: int = Query(None, description="Filtrer par ID produit"),
     actifs_seulement: bool = Query(True, description="Seulement lots actifs (non expirés)"),
-    db: Session = Depends(get_db),
+    pagination: Pagination = Depends(),
+    lecture: LectureDB = Depends(get_read_db),
     current_user: Utilisateur = Depends(get_current_user)
 ):
     """
@@ -105,25 +122,33 @@ def get_lots(
     - id_produit: Limiter à un produit spécifique
     - actifs_seulement: true = seulement lots non expirés (défaut: true)
     
-    **Retourne**: Liste des lots triée par date expiration (FEFO)
+    **Retourne**: Liste des lots triée par date expiration (FEFO), paginée
+    (curseur suivant dans l'en-tête X-Next-Cursor)
     """
     
     if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_STOCK, RoleEnum.GEST_COMMERCIAL]:
         raise HTTPException(status_code=403, detail="Permissions insuffisantes")
     
-    query = db.query(Lot)
-    
-    if id_produit:
-        query = query.filter(Lot.id_produit == id_produit)
-    
-    if actifs_seulement:
-        now = datetime.now()
-        query = query.filter(
-            (Lot.date_expiration > now) &
-            (Lot.quantite_restante > 0)
+    def charger(db: Session):
+        query = db.query(Lot)
+        
+        if id_produit:
+            query = query.filter(Lot.id_produit == id_produit)
+        
+        if actifs_seulement:
+            now = datetime.now()
+            query = query.filter(
+                (Lot.date_expiration > now) &
+                (Lot.quantite_restante > 0)
+            )
+        
+        return pagination.paginer(
+            query,
+            {"expiration": Lot.date_expiration, "id": Lot.id_lot},
+            Lot.id_lot
         )
     
-    lots = query.order_by(Lot.date_expiration.asc()).all()
+    lots = await lecture.run(charger)
     
     # Enrichir avec info d'alerte
     result = []
@@ -142,6 +167,30 @@ def get_lots(
     return result
 
 
+@router.get("/export")
+def export_lots(
+    format_export: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    id_produit: int = Query(None, description="Filtrer par ID produit"),
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    """
+    📤 Exporter tous les lots en flux (NDJSON ou CSV), y compris épuisés
+    
+    **Permissions**: ADMIN, GEST_STOCK, GEST_COMMERCIAL
+    """
+    
+    if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_STOCK, RoleEnum.GEST_COMMERCIAL]:
+        raise HTTPException(status_code=403, detail="Permissions insuffisantes")
+    
+    filename = f"lots-{datetime.now():%Y%m%d}.{format_export}"
+    return StreamingResponse(
+        ExportService.flux(db, ExportService.requete_lots(id_produit), format_export),
+        media_type=FORMATS_EXPORT[format_export],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
 @router.get("/{id_lot}", response_model=LotDetailRead)
 def get_lot(
     id_lot: int,
@@ -177,8 +226,8 @@ def get_lot(
 # 📊 DASHBOARD - Alertes et statut
 # =====================================================
 @router.get("/dashboard/resumé", response_model=dict, tags=["Dashboard"])
-def get_lots_resume(
-    db: Session = Depends(get_db),
+async def get_lots_resume(
+    lecture: LectureDB = Depends(get_read_db),
     current_user: Utilisateur = Depends(get_current_user)
 ):
     """
@@ -192,41 +241,7 @@ def get_lots_resume(
     if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_STOCK]:
         raise HTTPException(status_code=403, detail="Permissions insuffisantes")
     
-    now = datetime.now()
-    
-    # Récupérer tous les lots
-    all_lots = db.query(Lot).all()
-    
-    # Statistiques
-    total_lots = len(all_lots)
-    lots_expirés = [l for l in all_lots if l.date_expiration <= now]
-    lots_rouges = [l for l in all_lots if 0 <= (l.date_expiration - now).days <= 30]
-    lots_oranges = [l for l in all_lots if 30 < (l.date_expiration - now).days <= 60]
-    lots_jaunes = [l for l in all_lots if 60 < (l.date_expiration - now).days <= 90]
-    
-    quantite_totale_stock = sum(l.quantite_restante for l in all_lots if l.date_expiration > now)
-    quantite_expirée = sum(l.quantite_restante for l in lots_expirés)
-    quantite_risque = sum(l.quantite_restante for l in lots_rouges + lots_oranges)
-    
-    return {
-        "total_lots": total_lots,
-        "statistiques": {
-            "vert": len([l for l in all_lots if FEFOService.get_lot_alert_status(l) == "VERT"]),
-            "jaune": len(lots_jaunes),
-            "orange": len(lots_oranges),
-            "rouge": len(lots_rouges),
-            "expiré": len(lots_expirés)
-        },
-        "quantites": {
-            "stock_sain": quantite_totale_stock,
-            "stock_risque": quantite_risque,  # Orange + Rouge
-            "stock_expiré": quantite_expirée
-        },
-        "alertes": {
-            "critique": quantite_expirée > 0,  # ⚠️ Stock expiré = CRITIQUE
-            "attention": quantite_risque > 0   # ⚠️ Stock expire bientôt
-        }
-    }
+    return await lecture.run(FEFOService.get_lots_resume)
 
 
 # =====================================================
@@ -265,14 +280,26 @@ def update_lot(
         )
     
     # Mise à jour
+    ancienne_quantite = lot.quantite_restante
     update_data = data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(lot, field, value)
     
     try:
         db.add(lot)
+        db.flush()
+        # Correction d'inventaire: journalisée comme ajustement
+        StockLedgerService.enregistrer(db, [mouvement(
+            "AJUSTEMENT", lot.id_produit, lot.quantite_restante - ancienne_quantite,
+            id_lot=lot.id_lot, motif=f"Ajustement lot {lot.numero_lot}"
+        )])
         db.commit()
         db.refresh(lot)
+        signaler_lots_modifies([lot.id_lot])
+        invalider_resume_lots()
+        invalider_index_fefo([lot.id_produit])
+        if lot.quantite_restante != ancienne_quantite:
+            invalider_predictions([lot.id_produit])
         return lot
     except IntegrityError:
         db.rollback()
@@ -313,8 +340,15 @@ def delete_lot(
         )
     
     try:
+        StockLedgerService.enregistrer(db, [mouvement(
+            "AJUSTEMENT", lot.id_produit, -lot.quantite_restante,
+            motif=f"Suppression lot {lot.numero_lot}"
+        )])
         db.delete(lot)
         db.commit()
+        invalider_resume_lots()
+        invalider_index_fefo([lot.id_produit])
+        invalider_predictions([lot.id_produit])
         return {"message": "Lot supprimé avec succès"}
     except Exception as e:
         db.rollback()
@@ -344,9 +378,8 @@ def get_fefo_allocation(
     if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_STOCK, RoleEnum.GEST_COMMERCIAL]:
         raise HTTPException(status_code=403, detail="Permissions insuffisantes")
     
-    # Vérifier produit existe
-    produit = db.get(Produit, id_produit)
-    if not produit:
+    # Vérifier produit existe (lots et produit lus ensemble, ou servis par l'index FEFO)
+    if not FEFOService.entree_fefo(db, id_produit).produit_existe:
         raise HTTPException(status_code=404, detail="Produit non trouvé")
     
     # Allocation FEFO
@@ -355,17 +388,98 @@ def get_fefo_allocation(
     if not success:
         raise HTTPException(status_code=400, detail=error)
     
-    # Convertir allocations en LotFEFOInfo
+    # Convertir allocations en LotFEFOInfo (les allocations portent déjà les infos du lot)
+    now = datetime.now()
     result = []
     for alloc in allocations:
-        lot = db.get(Lot, alloc["id_lot"])
+        date_expiration = datetime.fromisoformat(alloc["date_expiration"])
         result.append(LotFEFOInfo(
-            id_lot=lot.id_lot,
-            numero_lot=lot.numero_lot,
+            id_lot=alloc["id_lot"],
+            numero_lot=alloc["numero_lot"],
             quantite_disponible=alloc["quantite"],
-            date_expiration=lot.date_expiration,
-            jours_avant_expiration=FEFOService.get_jours_avant_expiration(lot),
+            date_expiration=date_expiration,
+            jours_avant_expiration=(date_expiration - now).days,
             sera_utilise=True
         ))
     
     return result
+
+
+@router.get("/fefo/{id_produit}/disponibilite", response_model=dict)
+def get_fefo_disponibilite(
+    id_produit: int,
+    quantite: int = Query(..., gt=0, description="Quantité souhaitée"),
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    """
+    ✅ La quantité peut-elle être servie en FEFO (sans stock expiré bloquant) ?
+    
+    **Permissions**: tout utilisateur connecté (vitrine, saisie de commande)
+    
+    Indicatif: la validation de la commande revérifie les lots en base.
+    """
+    
+    entree = FEFOService.entree_fefo(db, id_produit)
+    if not entree.produit_existe:
+        raise HTTPException(status_code=404, detail="Produit non trouvé")
+    
+    now = datetime.now()
+    return {
+        "id_produit": id_produit,
+        "quantite_demandee": quantite,
+        "quantite_disponible": entree.quantite_disponible(now),
+        "quantite_expiree": entree.quantite_expiree(now),
+        "peut_servir": entree.peut_servir(quantite, now)
+    }
+
+
+@router.post("/peremption/radier", response_model=dict)
+def radier_lots_expires(
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    """
+    🗑️ Radier les lots périmés (quantité restante → 0)
+    
+    **Permissions**: ADMIN, GEST_STOCK
+    
+    Chaque lot radié est journalisé comme mouvement PEREMPTION et déduit du stock.
+    """
+    
+    if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_STOCK]:
+        raise HTTPException(status_code=403, detail="Permissions insuffisantes")
+    
+    mouvements = StockLedgerService.radier_lots_expires(db)
+    db.commit()
+    if mouvements:
+        signaler_lots_modifies(m["id_lot"] for m in mouvements)
+        invalider_resume_lots()
+        invalider_index_fefo(m["id_produit"] for m in mouvements)
+        invalider_predictions({m["id_produit"] for m in mouvements})
+    
+    return {
+        "message": f"✅ {len(mouvements)} lot(s) périmé(s) radié(s)",
+        "lots_radies": len(mouvements),
+        "quantite_radiee": -sum(m["quantite"] for m in mouvements),
+        "details": [
+            {"id_lot": m["id_lot"], "id_produit": m["id_produit"], "quantite": -m["quantite"]}
+            for m in mouvements
+        ]
+    }
+
+
+@router.get("/fefo/concurrence", response_model=dict)
+def get_fefo_concurrence_stats(
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    """
+    📈 Compteurs de conflits lors des déductions FEFO concurrentes
+    
+    **Permissions**: ADMIN
+    """
+    
+    if current_user.role != RoleEnum.ADMIN:
+        raise HTTPException(status_code=403, detail="Permissions insuffisantes")
+    
+    return FEFOService.concurrency_stats()
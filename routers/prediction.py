@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from database import get_db
-from services.prediction_service import PredictionService
+from services.prediction_service import PredictionService, PREDICTION_CACHE, RECOMMENDATION_STORE
 from security.access_control import RoleChecker
+from security.limiter import limite_par_role
 from schema.enums import RoleEnum
 
 router = APIRouter(
@@ -14,23 +16,52 @@ router = APIRouter(
     "/sales",
     dependencies=[Depends(RoleChecker([RoleEnum.ADMIN, RoleEnum.GEST_COMMERCIAL]))]
 )
-async def get_sales_prediction(db: Session = Depends(get_db)):
+@limite_par_role("prediction")
+async def get_sales_prediction(
+    request: Request,
+    defer_recommendations: bool = Query(False, description="Retourner le bloc ML immédiatement, recommandations Gemini à récupérer plus tard"),
+    db: Session = Depends(get_db)
+):
     """
     Prédictions de ventes combinant:
     1. Modèle ML (RandomForest) pour les quantités
     2. Gemini pour les recommandations intelligentes
+    
+    Avec defer_recommendations=true, la réponse contient `recommendations_key`;
+    les recommandations sont ensuite disponibles via GET /predictions/recommendations/{key}
     """
     service = PredictionService(db)
-    prediction = await service.predict_sales()
+    prediction = await service.predict_sales(defer_recommendations=defer_recommendations)
     if "error" in prediction:
         raise HTTPException(status_code=500, detail=prediction["error"])
     return prediction
 
+@router.get(
+    "/recommendations/{key}",
+    dependencies=[Depends(RoleChecker([RoleEnum.ADMIN, RoleEnum.GEST_COMMERCIAL]))]
+)
+def get_recommendations(key: str):
+    """
+    Recommandations Gemini calculées en arrière-plan (voir defer_recommendations)
+    - 200: prêtes
+    - 202: en cours de calcul
+    - 404: clé inconnue ou expirée
+    """
+    entry = RECOMMENDATION_STORE.get(key)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Recommandations introuvables ou expirées")
+    if entry["status"] == "pending":
+        return JSONResponse(status_code=202, content={"key": key, "status": "pending"})
+    if entry["status"] == "error":
+        return {"key": key, "status": "error", "gemini_error": entry["error"]}
+    return {"key": key, "status": "ready", "gemini_recommendations": entry["result"]}
+
 @router.get(
     "/sales/ml-only",
     dependencies=[Depends(RoleChecker([RoleEnum.ADMIN, RoleEnum.GEST_COMMERCIAL]))]
 )
-def get_ml_predictions_only(db: Session = Depends(get_db)):
+@limite_par_role("prediction")
+def get_ml_predictions_only(request: Request, db: Session = Depends(get_db)):
     """
     Prédictions ML pures (RandomForest uniquement)
     Retourne les prédictions de ventes par produit pour les 7 jours
@@ -58,3 +89,14 @@ def get_historical_data(days: int = 90, db: Session = Depends(get_db)):
     """
     service = PredictionService(db)
     return service.get_historical_sales_data(days=days)
+
+
+@router.get(
+    "/cache/stats",
+    dependencies=[Depends(RoleChecker([RoleEnum.ADMIN]))]
+)
+def get_prediction_cache_stats():
+    """
+    Statistiques du cache de prédictions ML (hits, misses, invalidations)
+    """
+    return PREDICTION_CACHE.stats()
@@ -2,12 +2,15 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
-from database import get_db
+from database import get_db, get_read_db, LectureDB
 from models.model import Produit, Utilisateur
 from schema.produit import ProduitCreate, ProduitRead
 from security.access_control import RoleChecker
 from schema.enums import RoleEnum
 from security.dependencies import get_current_user
+from services.prediction_service import invalider_predictions
+from services.fefo_index import invalider_index_fefo
+from services.pagination import Pagination
 
 router = APIRouter(
     prefix="/produits",
@@ -26,15 +29,32 @@ def create_produit(data: ProduitCreate, db: Session = Depends(get_db), current_u
     except IntegrityError:
         db.rollback()
         raise HTTPException(status_code=400, detail="Erreur lors de la création du produit")
+    invalider_predictions([produit.id_produit])
     return produit
 
 @router.get("/", response_model=list[ProduitRead])
-def get_produits(db: Session = Depends(get_db)):
-    return db.query(Produit).all()
+async def get_produits(
+    type_produit: str = None,
+    nom: str = None,
+    pagination: Pagination = Depends(),
+    lecture: LectureDB = Depends(get_read_db)
+):
+    def charger(db: Session):
+        query = db.query(Produit)
+        if type_produit:
+            query = query.filter(Produit.type_produit == type_produit)
+        if nom:
+            query = query.filter(Produit.nom_produit.ilike(f"%{nom}%"))
+        return pagination.paginer(
+            query,
+            {"id": Produit.id_produit, "nom": Produit.nom_produit},
+            Produit.id_produit
+        )
+    return await lecture.run(charger)
 
 @router.get("/{id_produit}", response_model=ProduitRead)
-def get_produit(id_produit: int, db: Session = Depends(get_db)):
-    produit = db.get(Produit, id_produit)
+async def get_produit(id_produit: int, lecture: LectureDB = Depends(get_read_db)):
+    produit = await lecture.run(lambda db: db.get(Produit, id_produit))
     if not produit:
         raise HTTPException(status_code=404, detail="Produit non trouvé")
     return produit
@@ -57,6 +77,8 @@ def delete_produit(id_produit: int, db: Session = Depends(get_db), current_user:
     try:
         db.delete(produit)
         db.commit()
+        invalider_predictions([id_produit])
+        invalider_index_fefo([id_produit])
         return {"message": "Produit supprimé avec succès"}
     except IntegrityError:
         db.rollback()
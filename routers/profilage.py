@@ -0,0 +1,97 @@
+"""
+Router du profilage (administrateurs, PROFILAGE_ACTIF=true)
+Profils cProfile par requête et échantillonnage des piles du worker
+"""
+
+import io
+import os
+import pstats
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from security.access_control import RoleChecker
+from schema.enums import RoleEnum
+from services.profilage import (
+    ECHANTILLONNEUR, MiddlewareProfilage, chemin_profil, lister_profils
+)
+
+
+def profilage_actif():
+    if not MiddlewareProfilage.actif:
+        raise HTTPException(status_code=404, detail="Profilage désactivé")
+
+
+router = APIRouter(
+    prefix="/profilage",
+    tags=["Profilage"],
+    dependencies=[Depends(profilage_actif), Depends(RoleChecker([RoleEnum.ADMIN]))]
+)
+
+
+@router.get("/")
+def get_profilage():
+    """
+    État de l'échantillonnage et fichiers de profil disponibles (sur ce worker)
+
+    **Permissions**: ADMIN
+
+    Profil d'une requête: ajouter l'en-tête `X-Profile: 1` (ou `?profile=1`);
+    le nom du fichier est renvoyé dans l'en-tête `X-Profile-Fichier`.
+    """
+    return {"echantillonnage": ECHANTILLONNEUR.stats(), "fichiers": lister_profils()}
+
+
+@router.get("/fichiers/{fichier}")
+def get_fichier_profil(
+    fichier: str,
+    format_sortie: str = Query("texte", alias="format", pattern="^(texte|brut)$"),
+    tri: str = Query("cumulative", pattern="^(cumulative|tottime|ncalls)$"),
+    limite: int = Query(40, ge=1, le=500)
+):
+    """
+    Télécharger un fichier de profil (brut) ou le résumé pstats d'un .prof (texte)
+
+    **Permissions**: ADMIN
+    """
+    chemin = chemin_profil(fichier)
+    if chemin is None or not os.path.isfile(chemin):
+        raise HTTPException(status_code=404, detail="Fichier de profil introuvable")
+
+    if format_sortie == "brut":
+        return FileResponse(chemin, filename=fichier)
+    if fichier.endswith(".folded"):
+        return FileResponse(chemin, media_type="text/plain")
+
+    sortie = io.StringIO()
+    pstats.Stats(chemin, stream=sortie).strip_dirs().sort_stats(tri).print_stats(limite)
+    return PlainTextResponse(sortie.getvalue())
+
+
+@router.post("/echantillonnage/demarrer")
+def demarrer_echantillonnage(
+    intervalle_ms: int = Query(10, ge=1, le=1000, description="Intervalle entre deux relevés"),
+    duree: Optional[int] = Query(60, ge=1, le=3600, description="Arrêt automatique (secondes)")
+):
+    """
+    Démarrer l'échantillonnage des piles de ce worker (fichiers .folded)
+
+    **Permissions**: ADMIN
+    """
+    if not ECHANTILLONNEUR.demarrer(intervalle_ms=intervalle_ms, duree=duree):
+        raise HTTPException(status_code=409, detail="Échantillonnage déjà en cours")
+    return {"message": "Échantillonnage démarré", **ECHANTILLONNEUR.stats()}
+
+
+@router.post("/echantillonnage/arreter")
+def arreter_echantillonnage():
+    """
+    Arrêter l'échantillonnage et écrire les piles restantes
+
+    **Permissions**: ADMIN
+    """
+    if not ECHANTILLONNEUR.actif:
+        raise HTTPException(status_code=400, detail="Aucun échantillonnage en cours")
+    fichier = ECHANTILLONNEUR.arreter()
+    return {"message": "Échantillonnage arrêté", "fichier": fichier, **ECHANTILLONNEUR.stats()}
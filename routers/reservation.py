@@ -8,6 +8,7 @@ from schema.reservation import ReservationCreate, ReservationRead
 from security.access_control import RoleChecker
 from schema.enums import RoleEnum
 from security.dependencies import get_current_user
+from services.pagination import Pagination
 
 router = APIRouter(
     prefix="/reservations",
@@ -36,8 +37,22 @@ def create_reservation(data: ReservationCreate, db: Session = Depends(get_db), c
     return reservation
 
 @router.get("/", response_model=list[ReservationRead], dependencies=[Depends(RoleChecker([RoleEnum.ADMIN, RoleEnum.GEST_COMMERCIAL]))])
-def get_reservations(db: Session = Depends(get_db)):
-    return db.query(Reservation).all()
+def get_reservations(
+    statut: str = None,
+    id_client: int = None,
+    pagination: Pagination = Depends(),
+    db: Session = Depends(get_db)
+):
+    query = db.query(Reservation)
+    if statut:
+        query = query.filter(Reservation.statut == statut)
+    if id_client:
+        query = query.filter(Reservation.id_client == id_client)
+    return pagination.paginer(
+        query,
+        {"id": Reservation.id_reservation, "date": Reservation.date_reservation},
+        Reservation.id_reservation
+    )
 
 @router.get("/{id_reservation}", response_model=ReservationRead)
 def get_reservation(id_reservation: int, db: Session = Depends(get_db)):
@@ -1,13 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from typing import Optional
 
 from database import get_db
-from models.model import Stock, Produit, Utilisateur
-from schema.stock import StockCreate, StockRead
+from models.model import Stock, Produit, Utilisateur, MouvementStock, ReconciliationStock
+from schema.stock import (
+    StockCreate, StockRead, MouvementStockRead, NiveauStockRead, ReconciliationStockRead
+)
 from security.access_control import RoleChecker
 from schema.enums import RoleEnum
 from security.dependencies import get_current_user
+from services.prediction_service import invalider_predictions
+from services.pagination import Pagination
+from services.stock_ledger_service import StockLedgerService, mouvement, TYPES_MOUVEMENT
+from services.reconciliation_stock_service import ReconciliationStockService
 
 router = APIRouter(
     prefix="/stocks",
@@ -25,18 +33,128 @@ def create_stock(data: StockCreate, db: Session = Depends(get_db), current_user:
     stock = Stock(**data.model_dump())
     try:
         db.add(stock)
+        db.flush()
+        # Solde d'ouverture: le journal reste la source de la quantité disponible
+        StockLedgerService.enregistrer(db, [mouvement(
+            "INITIAL", stock.id_produit, stock.quantite_disponible, motif="Création du stock"
+        )], projeter=False)
         db.commit()
         db.refresh(stock)
     except IntegrityError:
         db.rollback()
         raise HTTPException(status_code=400, detail="Stock déjà existant pour ce produit")
+    invalider_predictions([stock.id_produit])
     return stock
 
 @router.get("/", response_model=list[StockRead])
-def get_stocks(db: Session = Depends(get_db), current_user: Utilisateur = Depends(get_current_user)):
+def get_stocks(
+    id_produit: int = None,
+    pagination: Pagination = Depends(),
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_STOCK, RoleEnum.GEST_COMMERCIAL]:
+        raise HTTPException(status_code=403, detail="Permissions insuffisantes")
+    query = db.query(Stock)
+    if id_produit:
+        query = query.filter(Stock.id_produit == id_produit)
+    return pagination.paginer(query, {"id": Stock.id_stock}, Stock.id_stock)
+
+@router.get("/mouvements", response_model=list[MouvementStockRead])
+def get_mouvements_stock(
+    id_produit: Optional[int] = None,
+    type_mouvement: Optional[str] = None,
+    date_debut: Optional[datetime] = None,
+    date_fin: Optional[datetime] = None,
+    pagination: Pagination = Depends(),
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    """
+    Journal des mouvements de stock (plus récents d'abord, paginé)
+    
+    **Permissions**: ADMIN, GEST_STOCK
+    """
+    if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_STOCK]:
+        raise HTTPException(status_code=403, detail="Permissions insuffisantes")
+    if type_mouvement and type_mouvement not in TYPES_MOUVEMENT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Type de mouvement invalide. Valeurs possibles: {', '.join(TYPES_MOUVEMENT)}"
+        )
+    query = db.query(MouvementStock)
+    if id_produit:
+        query = query.filter(MouvementStock.id_produit == id_produit)
+    if type_mouvement:
+        query = query.filter(MouvementStock.type_mouvement == type_mouvement)
+    if date_debut:
+        query = query.filter(MouvementStock.date_mouvement >= date_debut)
+    if date_fin:
+        query = query.filter(MouvementStock.date_mouvement < date_fin)
+    return pagination.paginer(
+        query,
+        {"id": MouvementStock.id_mouvement, "date": MouvementStock.date_mouvement},
+        MouvementStock.id_mouvement,
+        ordre_defaut="desc"
+    )
+
+@router.get("/niveaux", response_model=list[NiveauStockRead])
+def get_niveaux_stock_a_date(
+    date: datetime = Query(..., description="Instant demandé (ISO 8601)"),
+    id_produit: Optional[list[int]] = Query(None, description="Limiter à ces produits"),
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    """
+    Niveau de stock par produit à une date passée
+    
+    **Permissions**: ADMIN, GEST_STOCK, GEST_COMMERCIAL
+    
+    Calculé depuis le dernier snapshot antérieur + rejeu des mouvements suivants.
+    """
     if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_STOCK, RoleEnum.GEST_COMMERCIAL]:
         raise HTTPException(status_code=403, detail="Permissions insuffisantes")
-    return db.query(Stock).all()
+    niveaux = StockLedgerService.niveaux_a_date(db, date, id_produit)
+    return [{"id_produit": p, "quantite": q} for p, q in niveaux.items()]
+
+@router.post("/reconciliation")
+def reconcilier_stocks(
+    complet: bool = Query(False, description="Tous les produits (sinon: modifiés depuis le dernier passage)"),
+    reparer: bool = Query(False, description="Reprojeter le stock sur le total du journal"),
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    """
+    Comparer Stock.quantite_disponible au total du journal des mouvements (et corriger si demandé)
+    
+    **Permissions**: ADMIN
+    """
+    if current_user.role != RoleEnum.ADMIN:
+        raise HTTPException(status_code=403, detail="Permissions insuffisantes")
+    rapport = ReconciliationStockService.reconcilier(db, complet=complet, reparer=reparer)
+    if rapport["repares"]:
+        invalider_predictions([ecart["id_produit"] for ecart in rapport["ecarts"]])
+    return rapport
+
+@router.get("/reconciliation", response_model=list[ReconciliationStockRead])
+def get_reconciliations(
+    pagination: Pagination = Depends(),
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    """
+    Historique des passages de réconciliation (plus récents d'abord)
+    
+    **Permissions**: ADMIN, GEST_STOCK
+    """
+    if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_STOCK]:
+        raise HTTPException(status_code=403, detail="Permissions insuffisantes")
+    return pagination.paginer(
+        db.query(ReconciliationStock),
+        {"id": ReconciliationStock.id_reconciliation},
+        ReconciliationStock.id_reconciliation,
+        ordre_defaut="desc"
+    )
 
 @router.get("/{id_stock}", response_model=StockRead)
 def get_stock(id_stock: int, db: Session = Depends(get_db)):
@@ -55,6 +173,7 @@ def delete_stock(id_stock: int, db: Session = Depends(get_db), current_user: Uti
     try:
         db.delete(stock)
         db.commit()
+        invalider_predictions([stock.id_produit])
         return {"message": "Stock supprimé avec succès"}
     except IntegrityError:
         db.rollback()
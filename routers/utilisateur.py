@@ -7,6 +7,7 @@ from schema.utilisateur import UtilisateurCreate, UtilisateurRead
 from security.hashing import hash_password
 from security.dependencies import get_current_user, get_current_user_optional
 from security.access_control import RoleChecker
+from security.auth_cache import invalider_utilisateur
 from schema.enums import RoleEnum
 from schema.enums import RoleEnum
 from sqlalchemy.exc import IntegrityError
@@ -95,4 +96,5 @@ def delete_utilisateur(id_utilisateur: int, db: Session = Depends(get_db), curre
     # Soft delete: désactivation au lieu de suppression physique
     user.actif = False
     db.commit()
+    invalider_utilisateur(id_utilisateur)
     return {"message": "Utilisateur désactivé avec succès"}
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
@@ -10,6 +11,9 @@ from schema.vente import VenteCreate, VenteRead
 from security.access_control import RoleChecker
 from schema.enums import RoleEnum
 from security.dependencies import get_current_user
+from services.prediction_service import invalider_predictions
+from services.pagination import Pagination
+from services.export_service import ExportService, FORMATS_EXPORT
 
 router = APIRouter(
     prefix="/ventes",
@@ -32,14 +36,55 @@ def create_vente(data: VenteCreate, db: Session = Depends(get_db), current_user:
     except IntegrityError:
         db.rollback()
         raise HTTPException(status_code=400, detail="Vente déjà enregistrée pour cette commande")
+    invalider_predictions([ligne.id_produit for ligne in commande.lignes])
     return vente
 
 @router.get("/", response_model=list[VenteRead])
-def get_ventes(db: Session = Depends(get_db), current_user: Utilisateur = Depends(get_current_user)):
+def get_ventes(
+    date_debut: datetime = None,
+    date_fin: datetime = None,
+    pagination: Pagination = Depends(),
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
     if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_COMMERCIAL]:
         raise HTTPException(status_code=403, detail="Permissions insuffisantes")
     # Filtrer uniquement les ventes non supprimées
-    return db.query(Vente).filter(Vente.deleted_at == None).all()
+    query = db.query(Vente).filter(Vente.deleted_at == None)
+    if date_debut:
+        query = query.filter(Vente.date_vente >= date_debut)
+    if date_fin:
+        query = query.filter(Vente.date_vente < date_fin)
+    return pagination.paginer(
+        query,
+        {"id": Vente.id_vente, "date": Vente.date_vente},
+        Vente.id_vente
+    )
+
+@router.get("/export")
+def export_ventes(
+    format_export: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    date_debut: datetime = None,
+    date_fin: datetime = None,
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    """
+    📤 Exporter l'historique des ventes en flux (NDJSON ou CSV)
+    
+    **Permissions**: ADMIN, GEST_COMMERCIAL
+    
+    Une ligne par produit vendu, avec client. Ventes archivées exclues.
+    """
+    if current_user.role not in [RoleEnum.ADMIN, RoleEnum.GEST_COMMERCIAL]:
+        raise HTTPException(status_code=403, detail="Permissions insuffisantes")
+    
+    filename = f"ventes-{datetime.now():%Y%m%d}.{format_export}"
+    return StreamingResponse(
+        ExportService.flux(db, ExportService.requete_ventes(date_debut, date_fin), format_export),
+        media_type=FORMATS_EXPORT[format_export],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 @router.get("/{id_vente}", response_model=VenteRead)
 def get_vente(id_vente: int, db: Session = Depends(get_db)):
@@ -5,14 +5,18 @@ Utilise APScheduler pour exécuter des jobs planifiés
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime
 import logging
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 
+from database import SessionLocal
 from services.alerte_expiration_service import AlerteExpirationService
+from services.ventes_journalieres_service import VentesJournalieresService
+from services.stock_ledger_service import StockLedgerService
+from services.reconciliation_stock_service import ReconciliationStockService
+from security.revocation import purger_tokens_expires
 
 # Charger variables d'environnement
 load_dotenv()
@@ -24,15 +28,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Créer la session database
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL, echo=False)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Les jobs utilisent le pool partagé de database.py (un seul pool par process)
+
+# Fréquence du passage incrémental des alertes d'expiration
+ALERTES_INCREMENTALES_INTERVALLE = int(os.getenv("ALERTES_INCREMENTALES_INTERVALLE_SECONDES", "60"))
+
+# Réconciliation Stock / lots: fréquence du passage incrémental et réparation automatique
+RECONCILIATION_STOCK_INTERVALLE = int(os.getenv("RECONCILIATION_STOCK_INTERVALLE_MINUTES", "15"))
+RECONCILIATION_STOCK_REPARER = os.getenv("RECONCILIATION_STOCK_REPARER", "false").lower() == "true"
 
 
 def job_scanner_alertes_expiration():
     """
     🔍 Job: Scanner les alertes d'expiration tous les jours à 06:00
+    
+    Réconciliation complète: rattrape ce que le passage incrémental aurait manqué
+    (redémarrage, écritures hors API).
     """
     db = SessionLocal()
     try:
@@ -53,6 +64,25 @@ def job_scanner_alertes_expiration():
         db.close()
 
 
+def job_alertes_incrementales():
+    """
+    ⚡ Job: Réévaluer les alertes des lots modifiés ou dont un seuil est franchi
+    """
+    db = SessionLocal()
+    try:
+        stats = AlerteExpirationService.scanner_lots_modifies(db)
+        if stats:
+            logger.info(
+                f"⚡ Alertes incrémentales: {stats['lots']} lots réévalués, "
+                f"{stats['updated']} créées, {stats['deleted']} supprimées"
+            )
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur lors du passage incrémental: {str(e)}")
+    finally:
+        db.close()
+
+
 def job_nettoyer_alertes_obsoletes():
     """
     🧹 Job: Nettoyer les alertes obsolètes (expirant > J+90) tous les 7 jours
@@ -69,13 +99,84 @@ def job_nettoyer_alertes_obsoletes():
         db.close()
 
 
+def job_rafraichir_ventes_journalieres():
+    """
+    📈 Job: Rafraîchir l'agrégat des ventes journalières (jours clos) tous les jours à 00:10
+    """
+    db = SessionLocal()
+    try:
+        logger.info("📈 Rafraîchissement des ventes journalières...")
+        stats = VentesJournalieresService.rafraichir(db)
+        logger.info(f"✅ {stats['jours']} jours / {stats['lignes_produit']} lignes produit agrégés")
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur lors du rafraîchissement: {str(e)}")
+    finally:
+        db.close()
+
+
+def job_snapshots_stock():
+    """
+    📦 Job: Figer les niveaux de stock (snapshots du journal) tous les jours à 00:30
+    """
+    db = SessionLocal()
+    try:
+        count = StockLedgerService.creer_snapshots(db)
+        logger.info(f"✅ {count} snapshots de stock créés")
+        
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Erreur lors des snapshots de stock: {str(e)}")
+    finally:
+        db.close()
+
+
+def job_reconciliation_stock(complet: bool = False):
+    """
+    🔄 Job: Comparer Stock et total du journal des mouvements (incrémental, complet chaque nuit à 03:00)
+    """
+    db = SessionLocal()
+    try:
+        rapport = ReconciliationStockService.reconcilier(
+            db, complet=complet, reparer=RECONCILIATION_STOCK_REPARER
+        )
+        if complet or rapport["ecarts"]:
+            logger.info(
+                f"🔄 Réconciliation stock ({rapport['mode']}): {rapport['produits_verifies']} produits, "
+                f"{len(rapport['ecarts'])} écarts, {rapport['repares']} réparés"
+            )
+        
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Erreur lors de la réconciliation du stock: {str(e)}")
+    finally:
+        db.close()
+
+
+def job_purge_tokens_revoques():
+    """
+    🔑 Job: Supprimer les révocations de tokens expirés (toutes les heures)
+    """
+    db = SessionLocal()
+    try:
+        count = purger_tokens_expires(db)
+        if count:
+            logger.info(f"🔑 {count} révocations de tokens expirés purgées")
+        
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Erreur lors de la purge des tokens révoqués: {str(e)}")
+    finally:
+        db.close()
+
+
 def start_scheduler():
     """
     Démarrer le scheduler avec tous les jobs planifiés
     """
     scheduler = BackgroundScheduler()
     
-    # Job 1: Scanner les alertes tous les jours à 06:00 UTC
+    # Job 1: Scanner les alertes tous les jours à 06:00 UTC (réconciliation)
     scheduler.add_job(
         job_scanner_alertes_expiration,
         trigger=CronTrigger(hour=6, minute=0),
@@ -84,6 +185,17 @@ def start_scheduler():
         replace_existing=True
     )
     
+    # Job 1 bis: Alertes incrémentales (lots modifiés + seuils franchis)
+    scheduler.add_job(
+        job_alertes_incrementales,
+        trigger=IntervalTrigger(seconds=ALERTES_INCREMENTALES_INTERVALLE),
+        id='alertes_incrementales',
+        name='Alertes expiration incrémentales',
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    
     # Job 2: Nettoyer les alertes obsolètes chaque lundi à 02:00 UTC
     scheduler.add_job(
         job_nettoyer_alertes_obsoletes,
@@ -93,14 +205,67 @@ def start_scheduler():
         replace_existing=True
     )
     
+    # Job 3: Agréger les ventes de la veille tous les jours à 00:10 UTC
+    # (exécuté aussi au démarrage pour rattraper les jours manqués)
+    scheduler.add_job(
+        job_rafraichir_ventes_journalieres,
+        trigger=CronTrigger(hour=0, minute=10),
+        id='rafraichir_ventes_journalieres',
+        name='Rafraîchir ventes journalières',
+        replace_existing=True,
+        next_run_time=datetime.now()
+    )
+    
+    # Job 4: Snapshots des niveaux de stock tous les jours à 00:30 UTC
+    scheduler.add_job(
+        job_snapshots_stock,
+        trigger=CronTrigger(hour=0, minute=30),
+        id='snapshots_stock',
+        name='Snapshots stock',
+        replace_existing=True
+    )
+    
+    # Job 5: Réconciliation Stock / lots (incrémentale + complète à 03:00 UTC)
+    scheduler.add_job(
+        job_reconciliation_stock,
+        trigger=IntervalTrigger(minutes=RECONCILIATION_STOCK_INTERVALLE),
+        id='reconciliation_stock',
+        name='Réconciliation stock incrémentale',
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.add_job(
+        job_reconciliation_stock,
+        trigger=CronTrigger(hour=3, minute=0),
+        kwargs={"complet": True},
+        id='reconciliation_stock_complete',
+        name='Réconciliation stock complète',
+        replace_existing=True
+    )
+    
+    # Job 6: Purge des tokens révoqués expirés toutes les heures
+    scheduler.add_job(
+        job_purge_tokens_revoques,
+        trigger=IntervalTrigger(hours=1),
+        id='purge_tokens_revoques',
+        name='Purge tokens révoqués',
+        replace_existing=True
+    )
+    
     scheduler.start()
     
     logger.info("=" * 70)
     logger.info("📅 SCHEDULER DÉMARRÉ")
     logger.info("=" * 70)
     logger.info(f"✅ Jobs planifiés:")
-    logger.info(f"   1️⃣ Scanner alertes: Quotidien à 06:00 UTC")
+    logger.info(f"   1️⃣ Scanner alertes: Quotidien à 06:00 UTC (réconciliation)")
+    logger.info(f"   ⚡ Alertes incrémentales: Toutes les {ALERTES_INCREMENTALES_INTERVALLE}s")
     logger.info(f"   2️⃣ Nettoyage: Chaque lundi à 02:00 UTC")
+    logger.info(f"   3️⃣ Ventes journalières: Quotidien à 00:10 UTC (+ au démarrage)")
+    logger.info(f"   4️⃣ Snapshots stock: Quotidien à 00:30 UTC")
+    logger.info(f"   5️⃣ Réconciliation stock: Toutes les {RECONCILIATION_STOCK_INTERVALLE} min (+ complète à 03:00 UTC)")
+    logger.info(f"   6️⃣ Purge tokens révoqués: Toutes les heures")
     logger.info("=" * 70)
     
     return scheduler
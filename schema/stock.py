@@ -1,5 +1,6 @@
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime
+from typing import Optional
 
 class StockBase(BaseModel):
     quantite_disponible: int
@@ -12,3 +13,31 @@ class StockRead(StockBase):
     id_stock: int
     date_derniere_mise_a_jour: datetime
     model_config = ConfigDict(from_attributes=True)
+
+
+class MouvementStockRead(BaseModel):
+    id_mouvement: int
+    date_mouvement: datetime
+    type_mouvement: str
+    quantite: int
+    motif: Optional[str] = None
+    id_produit: int
+    id_lot: Optional[int] = None
+    id_commande: Optional[int] = None
+    model_config = ConfigDict(from_attributes=True)
+
+
+class NiveauStockRead(BaseModel):
+    id_produit: int
+    quantite: int
+
+
+class ReconciliationStockRead(BaseModel):
+    id_reconciliation: int
+    date_execution: datetime
+    mode: str
+    id_dernier_mouvement: int
+    produits_verifies: int
+    ecarts: int
+    repares: int
+    model_config = ConfigDict(from_attributes=True)
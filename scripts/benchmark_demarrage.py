@@ -0,0 +1,79 @@
+"""
+Mesure du temps de démarrage de l'API (import de main + lifespan)
+
+    python scripts/benchmark_demarrage.py --repetitions 5
+    python scripts/benchmark_demarrage.py --importtime   # détail par module (python -X importtime)
+
+Chaque mesure est faite dans un nouveau processus pour partir d'un cache
+d'imports vide. Le préchauffage ML est désactivé pendant la mesure du lifespan
+pour ne mesurer que ce qui bloque réellement l'ouverture du port.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+RACINE = Path(__file__).parent.parent
+
+CODE_MESURE = """
+import asyncio, time
+debut = time.perf_counter()
+import main
+import_main = time.perf_counter() - debut
+
+async def demarrer():
+    async with main.lifespan(main.app):
+        return time.perf_counter() - debut
+
+total = asyncio.run(demarrer())
+print(f"{import_main:.4f} {total:.4f}")
+"""
+
+
+def mesurer(env) -> tuple[float, float]:
+    sortie = subprocess.run(
+        [sys.executable, "-c", CODE_MESURE], cwd=RACINE, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()[-1]
+    import_main, total = sortie.split()
+    return float(import_main), float(total)
+
+
+def importtime(env, top: int):
+    resultat = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], cwd=RACINE, env=env,
+        capture_output=True, text=True, check=True
+    )
+    lignes = []
+    for ligne in resultat.stderr.splitlines():
+        if not ligne.startswith("import time:") or "cumulative" in ligne:
+            continue
+        _, cumul, module = ligne[len("import time:"):].split("|")
+        lignes.append((int(cumul), module.strip()))
+    print(f"{'Module':50} {'cumul ms':>10}")
+    for cumul, module in sorted(lignes, reverse=True)[:top]:
+        print(f"{module:50} {cumul / 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark du démarrage de l'API")
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="Afficher les imports les plus coûteux")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    env = dict(os.environ, ML_PRECHAUFFAGE="false")
+    env.setdefault("DATABASE_URL", "sqlite://")
+    env.setdefault("JWT_SECRET_KEY", "benchmark")
+
+    if args.importtime:
+        importtime(env, args.top)
+        sys.exit(0)
+
+    mesures = [mesurer(env) for _ in range(args.repetitions)]
+    imports = [m[0] for m in mesures]
+    totaux = [m[1] for m in mesures]
+    print(f"⏱️  import main : médiane {1000 * statistics.median(imports):.0f} ms (min {1000 * min(imports):.0f} ms)")
+    print(f"⏱️  + lifespan  : médiane {1000 * statistics.median(totaux):.0f} ms (min {1000 * min(totaux):.0f} ms)")
@@ -0,0 +1,112 @@
+"""
+Benchmark de charge des endpoints de lecture (polling concurrent des dashboards)
+
+Lancer le serveur deux fois, en mode sync puis async, et comparer:
+    DB_ASYNC_READS=false uvicorn main:app --workers 1 --port 8000
+    python scripts/benchmark_lectures.py --url http://localhost:8000 --concurrence 50 --duree 30
+
+    DB_ASYNC_READS=true uvicorn main:app --workers 1 --port 8000
+    python scripts/benchmark_lectures.py --url http://localhost:8000 --concurrence 50 --duree 30
+
+Affiche requêtes/s et latences (p50, p95, p99) par endpoint et au total.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+try:
+    import httpx
+except ImportError:
+    print(" httpx est requis pour le benchmark: pip install httpx")
+    sys.exit(1)
+
+ENDPOINTS = [
+    "/produits/",
+    "/lots/",
+    "/lots/dashboard/resumé",
+    "/alertes/dashboard",
+    "/alertes/expirations",
+    "/livraisons/dashboard/stats",
+]
+
+
+def percentile(valeurs, p):
+    if not valeurs:
+        return 0.0
+    valeurs = sorted(valeurs)
+    index = min(len(valeurs) - 1, int(round(p / 100 * (len(valeurs) - 1))))
+    return valeurs[index]
+
+
+async def authentifier(client: httpx.AsyncClient, email: str, password: str) -> dict:
+    response = await client.post("/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def poller(client, headers, fin, latences, erreurs, decalage):
+    i = decalage
+    while time.perf_counter() < fin:
+        endpoint = ENDPOINTS[i % len(ENDPOINTS)]
+        i += 1
+        debut = time.perf_counter()
+        try:
+            response = await client.get(endpoint, headers=headers)
+            if response.status_code >= 400:
+                erreurs[endpoint] += 1
+                continue
+        except httpx.HTTPError:
+            erreurs[endpoint] += 1
+            continue
+        latences[endpoint].append(time.perf_counter() - debut)
+
+
+async def main(args):
+    limites = httpx.Limits(max_connections=args.concurrence, max_keepalive_connections=args.concurrence)
+    async with httpx.AsyncClient(base_url=args.url, limits=limites, timeout=60) as client:
+        headers = await authentifier(client, args.email, args.password)
+
+        # Échauffement (connexions, caches)
+        for endpoint in ENDPOINTS:
+            await client.get(endpoint, headers=headers)
+
+        latences = defaultdict(list)
+        erreurs = defaultdict(int)
+        debut = time.perf_counter()
+        fin = debut + args.duree
+        await asyncio.gather(*[
+            poller(client, headers, fin, latences, erreurs, i) for i in range(args.concurrence)
+        ])
+        ecoule = time.perf_counter() - debut
+
+    print("=" * 78)
+    print(f"📊 {args.url} - {args.concurrence} clients concurrents pendant {args.duree}s")
+    print("=" * 78)
+    print(f"{'Endpoint':32} {'req':>7} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    toutes = []
+    for endpoint in ENDPOINTS:
+        valeurs = latences[endpoint]
+        toutes.extend(valeurs)
+        print(
+            f"{endpoint:32} {len(valeurs):>7} {erreurs[endpoint]:>5} "
+            f"{1000 * percentile(valeurs, 50):>9.1f} {1000 * percentile(valeurs, 95):>9.1f} "
+            f"{1000 * percentile(valeurs, 99):>9.1f}"
+        )
+    print("-" * 78)
+    print(f"✅ Total: {len(toutes)} requêtes, {len(toutes) / ecoule:.1f} req/s, "
+          f"moyenne {1000 * statistics.fmean(toutes) if toutes else 0:.1f} ms, "
+          f"{sum(erreurs.values())} erreurs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark des endpoints de lecture")
+    parser.add_argument("--url", default=os.getenv("BENCH_API_URL", "http://localhost:8000"))
+    parser.add_argument("--email", default=os.getenv("BENCH_EMAIL", "admin@test.com"))
+    parser.add_argument("--password", default=os.getenv("BENCH_PASSWORD", "admin123"))
+    parser.add_argument("--concurrence", type=int, default=50)
+    parser.add_argument("--duree", type=int, default=30, help="Durée en secondes")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,122 @@
+"""
+Cache (process-local) du contexte d'authentification
+
+Empreinte SHA-256 d'un token déjà vérifié -> (id_utilisateur, rôle) jusqu'à
+l'expiration du token (bornée par AUTH_CACHE_TTL pour que les autres workers
+voient une désactivation). Une requête authentifiée dont le token est en cache
+ne vérifie pas la signature et ne lit pas la table utilisateur.
+
+La désactivation d'un utilisateur retire ses entrées (invalider_utilisateur).
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Durée max d'une entrée en secondes (0 = cache désactivé)
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "300"))
+AUTH_CACHE_MAX_ENTREES = int(os.getenv("AUTH_CACHE_MAX_ENTREES", "10000"))
+
+
+class ContexteUtilisateur:
+    """Utilisateur authentifié, réduit à ce qu'utilisent les routers"""
+
+    __slots__ = ("id_utilisateur", "role", "jti", "exp")
+
+    def __init__(self, id_utilisateur: int, role: str, jti: Optional[str] = None, exp: Optional[float] = None):
+        self.id_utilisateur = id_utilisateur
+        self.role = role
+        # Identifiant et expiration du token (révocation)
+        self.jti = jti
+        self.exp = exp
+
+    def __repr__(self) -> str:
+        return f"ContexteUtilisateur(id_utilisateur={self.id_utilisateur}, role={self.role!r})"
+
+
+def empreinte_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class AuthCache:
+    """LRU empreinte de token -> (contexte, échéance)"""
+
+    def __init__(self, ttl: int = AUTH_CACHE_TTL, max_entrees: int = AUTH_CACHE_MAX_ENTREES):
+        self.ttl = ttl
+        self.max_entrees = max_entrees
+        self._lock = threading.Lock()
+        self._entrees: OrderedDict = OrderedDict()
+        # id_utilisateur -> empreintes, pour invalider tous les tokens d'un utilisateur
+        self._par_utilisateur: dict[int, set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, empreinte: str) -> Optional[ContexteUtilisateur]:
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entree = self._entrees.get(empreinte)
+            if entree is None:
+                self.misses += 1
+                return None
+            contexte, echeance = entree
+            if echeance <= time.time():
+                self._retirer(empreinte)
+                self.misses += 1
+                return None
+            self._entrees.move_to_end(empreinte)
+            self.hits += 1
+            return contexte
+
+    def set(self, empreinte: str, contexte: ContexteUtilisateur, exp: Optional[float]) -> None:
+        if self.ttl <= 0:
+            return
+        echeance = time.time() + self.ttl
+        if exp is not None:
+            echeance = min(echeance, float(exp))
+        with self._lock:
+            self._retirer(empreinte)
+            self._entrees[empreinte] = (contexte, echeance)
+            self._par_utilisateur.setdefault(contexte.id_utilisateur, set()).add(empreinte)
+            while len(self._entrees) > self.max_entrees:
+                self._retirer(next(iter(self._entrees)))
+
+    def _retirer(self, empreinte: str) -> None:
+        entree = self._entrees.pop(empreinte, None)
+        if entree is None:
+            return
+        id_utilisateur = entree[0].id_utilisateur
+        empreintes = self._par_utilisateur.get(id_utilisateur)
+        if empreintes is not None:
+            empreintes.discard(empreinte)
+            if not empreintes:
+                del self._par_utilisateur[id_utilisateur]
+
+    def invalider_utilisateur(self, id_utilisateur: int) -> None:
+        with self._lock:
+            for empreinte in list(self._par_utilisateur.get(id_utilisateur, ())):
+                self._retirer(empreinte)
+
+    def invalider_token(self, empreinte: str) -> None:
+        with self._lock:
+            self._retirer(empreinte)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entrees.clear()
+            self._par_utilisateur.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entrees": len(self._entrees), "hits": self.hits, "misses": self.misses}
+
+
+AUTH_CACHE = AuthCache()
+
+
+def invalider_utilisateur(id_utilisateur: int):
+    """À appeler après commit d'une désactivation / suppression d'utilisateur"""
+    AUTH_CACHE.invalider_utilisateur(id_utilisateur)
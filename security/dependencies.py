@@ -5,6 +5,8 @@ from sqlalchemy.orm import Session
 from database import get_db
 from models.model import Utilisateur
 from security.jwt import decode_access_token
+from security.auth_cache import AUTH_CACHE, ContexteUtilisateur, empreinte_token
+from security.revocation import REVOCATIONS
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
@@ -12,7 +14,22 @@ oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-):
+) -> ContexteUtilisateur:
+    # Révocations des autres workers (une requête au plus toutes les REVOCATION_SYNC_SECONDES)
+    REVOCATIONS.synchroniser_si_necessaire(db)
+
+    # Token déjà vérifié et utilisateur actif: ni signature ni requête
+    empreinte = empreinte_token(token)
+    contexte = AUTH_CACHE.get(empreinte)
+    if contexte is not None:
+        if REVOCATIONS.est_revoque(contexte.jti):
+            AUTH_CACHE.invalider_token(empreinte)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token révoqué"
+            )
+        return contexte
+
     payload = decode_access_token(token)
 
     if not payload:
@@ -21,6 +38,12 @@ def get_current_user(
             detail="Token invalide ou expiré"
         )
 
+    if REVOCATIONS.est_revoque(payload.get("jti")):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token révoqué"
+        )
+
     user_id = payload.get("sub")
 
     user = db.get(Utilisateur, int(user_id))
@@ -31,7 +54,15 @@ def get_current_user(
             detail="Utilisateur introuvable"
         )
 
-    return user
+    if not user.actif:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Utilisateur désactivé"
+        )
+
+    contexte = ContexteUtilisateur(user.id_utilisateur, user.role, payload.get("jti"), payload.get("exp"))
+    AUTH_CACHE.set(empreinte, contexte, payload.get("exp"))
+    return contexte
 
 def get_current_user_optional(
     token: str = Depends(oauth2_scheme_optional),
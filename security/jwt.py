@@ -1,4 +1,5 @@
 import os
+import uuid
 from datetime import datetime, timedelta,timezone
 from jose import jwt, JWTError
 from dotenv import load_dotenv
@@ -16,7 +17,8 @@ def create_access_token(data: dict):
     expire = datetime.now(timezone.utc) + timedelta(
         minutes=ACCESS_TOKEN_EXPIRE_MINUTES
     )
-    to_encode.update({"exp": expire})
+    # jti: identifiant du token, pour la révocation (déconnexion)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_access_token(token: str):
@@ -1,4 +1,95 @@
+"""
+Limitation de débit (slowapi / limits)
+
+- Stockage partagé entre workers via RATE_LIMIT_STORAGE_URI (redis://, ou tout
+  serveur compatible Redis: Valkey, KeyDB, Dragonfly...); memory:// par défaut
+  (compteurs par worker, développement et tests)
+- Fenêtre glissante (moving-window) par défaut
+- Quotas par classe d'endpoint et par rôle: le compteur est partagé par tous les
+  endpoints d'une classe et tenu par utilisateur (par IP sans token valide)
+"""
+
+import os
+
+from fastapi import Request
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-limiter = Limiter(key_func=get_remote_address)
+from security.auth_cache import AUTH_CACHE, empreinte_token
+from security.jwt import decode_access_token
+
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "moving-window")
+# Limite par IP appliquée en mémoire si le stockage partagé ne répond plus
+RATE_LIMIT_SECOURS = os.getenv("RATE_LIMIT_SECOURS", "60/minute")
+
+# Quotas par classe: "ROLE=limite|ROLE=limite|*=limite" (* = rôle non listé ou anonyme)
+QUOTAS_DEFAUT = {
+    "prediction": "ADMIN=30/minute|GEST_COMMERCIAL=20/minute|*=5/minute",
+    "pdf": "ADMIN=120/minute|GEST_COMMERCIAL=60/minute|GEST_STOCK=60/minute|CLIENT=20/minute|*=10/minute",
+    "pdf_lot": "ADMIN=10/minute|GEST_COMMERCIAL=6/minute|GEST_STOCK=6/minute|*=2/minute",
+    "scan": "ADMIN=6/minute|GEST_STOCK=6/minute|*=2/minute",
+}
+
+
+def _lire_quotas(valeur: str) -> dict[str, str]:
+    quotas = {}
+    for element in valeur.split("|"):
+        role, _, limite = element.partition("=")
+        if limite.strip():
+            quotas[role.strip()] = limite.strip()
+    return quotas
+
+
+# Surcharge par variable d'environnement: RATE_LIMIT_PREDICTION, RATE_LIMIT_PDF, ...
+QUOTAS = {
+    classe: _lire_quotas(os.getenv(f"RATE_LIMIT_{classe.upper()}", defaut))
+    for classe, defaut in QUOTAS_DEFAUT.items()
+}
+
+
+def cle_utilisateur(request: Request) -> str:
+    """
+    "ROLE:id_utilisateur" pour un token valide, "anonyme:IP" sinon
+
+    Le contexte est pris dans le cache d'authentification (déjà rempli par
+    get_current_user), le token n'est décodé qu'à défaut.
+    """
+    autorisation = request.headers.get("authorization", "")
+    schema, _, token = autorisation.partition(" ")
+    if schema.lower() == "bearer" and token:
+        contexte = AUTH_CACHE.get(empreinte_token(token))
+        if contexte is not None:
+            return f"{contexte.role}:{contexte.id_utilisateur}"
+        payload = decode_access_token(token)
+        if payload and payload.get("sub") and payload.get("role"):
+            return f"{payload['role']}:{payload['sub']}"
+    return f"anonyme:{get_remote_address(request)}"
+
+
+def quota(classe: str):
+    """Fournisseur de limite slowapi: la limite dépend du rôle porté par la clé"""
+    def limite(key: str) -> str:
+        quotas = QUOTAS[classe]
+        role = key.partition(":")[0]
+        return quotas.get(role, quotas["*"])
+    return limite
+
+
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy=RATE_LIMIT_STRATEGY,
+    key_prefix="mokpokpo",
+    # Stockage partagé indisponible: limite de secours en mémoire plutôt que des 500
+    in_memory_fallback=[RATE_LIMIT_SECOURS] if RATE_LIMIT_STORAGE_URI != "memory://" else [],
+)
+
+
+def limite_par_role(classe: str):
+    """
+    Décorateur: quota de la classe selon le rôle de l'utilisateur
+
+    L'endpoint décoré doit recevoir `request: Request`.
+    """
+    return limiter.shared_limit(quota(classe), scope=classe, key_func=cle_utilisateur)
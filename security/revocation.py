@@ -0,0 +1,166 @@
+"""
+Révocation des tokens JWT (déconnexion)
+
+Les jti révoqués sont stockés dans la table token_revoque. Chaque worker en
+garde une copie en mémoire:
+- un filtre de Bloom: "absent" est certain, le cas courant (token non révoqué)
+  se décide sans autre structure
+- un ensemble exact jti -> expiration pour confirmer un "peut-être présent"
+
+La copie est resynchronisée au plus toutes les REVOCATION_SYNC_SECONDES, de
+façon incrémentale (lignes plus récentes que le dernier passage). Le worker
+qui révoque un token l'ajoute immédiatement à sa copie.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.orm import Session
+
+from models.model import TokenRevoque
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_SYNC_SECONDES = int(os.getenv("REVOCATION_SYNC_SECONDES", "5"))
+REVOCATION_BLOOM_BITS = int(os.getenv("REVOCATION_BLOOM_BITS", str(1 << 20)))
+REVOCATION_BLOOM_HACHAGES = 7
+# Relecture des révocations récentes à chaque synchronisation (transactions validées
+# après une synchronisation avec un id inférieur au filigrane)
+REVOCATION_RELECTURE_SECONDES = 60
+
+
+class FiltreBloom:
+    """Filtre de Bloom sur un bytearray (double hachage à partir d'un SHA-256)"""
+
+    def __init__(self, bits: int = REVOCATION_BLOOM_BITS, hachages: int = REVOCATION_BLOOM_HACHAGES):
+        self.bits = bits
+        self.hachages = hachages
+        self._tableau = bytearray((bits + 7) // 8)
+
+    def _positions(self, valeur: str):
+        condensat = hashlib.sha256(valeur.encode()).digest()
+        h1 = int.from_bytes(condensat[:8], "big")
+        h2 = int.from_bytes(condensat[8:16], "big") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hachages)]
+
+    def ajouter(self, valeur: str) -> None:
+        for position in self._positions(valeur):
+            self._tableau[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, valeur: str) -> bool:
+        return all(self._tableau[position >> 3] & (1 << (position & 7)) for position in self._positions(valeur))
+
+
+class ListeRevocation:
+    """Copie locale des jti révoqués non expirés"""
+
+    def __init__(self, intervalle_sync: int = REVOCATION_SYNC_SECONDES):
+        self.intervalle_sync = intervalle_sync
+        self._lock = threading.Lock()
+        self._bloom = FiltreBloom()
+        self._revoques: dict[str, datetime] = {}
+        self._filigrane = 0
+        self._derniere_sync: Optional[datetime] = None
+        self._prochaine_sync = 0.0
+
+    def est_revoque(self, jti: Optional[str]) -> bool:
+        if not jti or jti not in self._bloom:
+            return False
+        expiration = self._revoques.get(jti)
+        return expiration is not None and expiration > datetime.now()
+
+    def ajouter(self, jti: str, date_expiration: datetime) -> None:
+        with self._lock:
+            self._revoques[jti] = date_expiration
+            self._bloom.ajouter(jti)
+
+    def synchroniser_si_necessaire(self, db: Session) -> None:
+        """Synchronisation incrémentale si l'intervalle est écoulé (aucune requête sinon)"""
+        if time.monotonic() < self._prochaine_sync:
+            return
+        with self._lock:
+            if time.monotonic() < self._prochaine_sync:
+                return
+            self._prochaine_sync = time.monotonic() + self.intervalle_sync
+        try:
+            self.synchroniser(db)
+        except Exception as e:
+            # Base indisponible: on garde la copie locale et on réessaie au prochain intervalle
+            logger.error(f"❌ Synchronisation des révocations impossible: {str(e)}")
+
+    def synchroniser(self, db: Session) -> int:
+        """
+        Charge les révocations postérieures au dernier passage
+
+        Returns:
+            Nombre de lignes lues
+        """
+        now = datetime.now()
+        query = select(
+            TokenRevoque.id_revocation, TokenRevoque.jti, TokenRevoque.date_expiration
+        ).where(TokenRevoque.date_expiration > now)
+        if self._derniere_sync is not None:
+            query = query.where(or_(
+                TokenRevoque.id_revocation > self._filigrane,
+                TokenRevoque.date_revocation >= self._derniere_sync - timedelta(seconds=REVOCATION_RELECTURE_SECONDES)
+            ))
+        rows = db.execute(query).all()
+
+        with self._lock:
+            for row in rows:
+                self._revoques[row.jti] = row.date_expiration
+                self._bloom.ajouter(row.jti)
+                self._filigrane = max(self._filigrane, row.id_revocation)
+            self._derniere_sync = now
+
+            # Les tokens expirés n'ont plus besoin d'être révoqués: filtre reconstruit sans eux
+            expires = [jti for jti, expiration in self._revoques.items() if expiration <= now]
+            if expires:
+                for jti in expires:
+                    del self._revoques[jti]
+                self._bloom = FiltreBloom()
+                for jti in self._revoques:
+                    self._bloom.ajouter(jti)
+        return len(rows)
+
+    def reinitialiser(self) -> None:
+        with self._lock:
+            self._bloom = FiltreBloom()
+            self._revoques.clear()
+            self._filigrane = 0
+            self._derniere_sync = None
+            self._prochaine_sync = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"revoques": len(self._revoques), "filigrane": self._filigrane}
+
+
+REVOCATIONS = ListeRevocation()
+
+
+def revoquer_token(db: Session, jti: str, id_utilisateur: int, exp: float) -> None:
+    """Enregistre la révocation (commit) et l'applique immédiatement à ce worker"""
+    date_expiration = datetime.fromtimestamp(exp)
+    if not db.scalar(select(TokenRevoque.id_revocation).where(TokenRevoque.jti == jti)):
+        db.add(TokenRevoque(
+            jti=jti,
+            id_utilisateur=id_utilisateur,
+            date_revocation=datetime.now(),
+            date_expiration=date_expiration
+        ))
+        db.commit()
+    REVOCATIONS.ajouter(jti, date_expiration)
+
+
+def purger_tokens_expires(db: Session) -> int:
+    """Supprime les révocations de tokens expirés (commit)"""
+    result = db.execute(delete(TokenRevoque).where(TokenRevoque.date_expiration <= datetime.now()))
+    db.commit()
+    return result.rowcount
@@ -3,10 +3,46 @@ Service pour gestion des alertes d'expiration des lots
 Scan les lots et génère des alertes selon les seuils de proximité d'expiration
 """
 
+import threading
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import and_, case, delete, exists, func, insert, literal, or_, select, update
 from models.model import Lot, AlerteStock, Produit
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional
+
+
+class FileLotsModifies:
+    """
+    File (process-local) des lots dont les alertes doivent être réévaluées
+    
+    Alimentée après commit par les écritures de lots (création, mise à jour,
+    déduction FEFO), vidée par le job incrémental du scheduler.
+    """
+
+    def __init__(self):
+        self._ids: set[int] = set()
+        self._lock = threading.Lock()
+
+    def ajouter(self, ids_lots: Iterable[int]):
+        with self._lock:
+            self._ids.update(i for i in ids_lots if i is not None)
+
+    def vider(self) -> set[int]:
+        with self._lock:
+            ids, self._ids = self._ids, set()
+        return ids
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._ids)
+
+
+LOTS_A_REEVALUER = FileLotsModifies()
+
+
+def signaler_lots_modifies(ids_lots: Iterable[int]):
+    """Demande la réévaluation des alertes de ces lots au prochain passage incrémental"""
+    LOTS_A_REEVALUER.ajouter(ids_lots)
 
 
 class AlerteExpirationService:
@@ -18,19 +54,91 @@ class AlerteExpirationService:
     SEUIL_ROUGE = 30      # J-30: Alerte rouge
     SEUIL_EXPIRE = 0      # J≤0: Alerte expiré (CRITIQUE)
 
+    TYPES_EXPIRATION = ["JAUNE", "ORANGE", "ROUGE", "EXPIRÉ"]
+
     @staticmethod
-    def scanner_lots_expiration(db: Session) -> Dict[str, int]:
+    def _expression_type_alerte(now: datetime):
         """
-        Scan tous les lots et génère les alertes d'expiration
+        CASE SQL donnant le type d'alerte d'un lot (NULL si vert)
         
-        Stratégie:
-        1. Récupérer tous les lots avec quantité restante > 0
-        2. Pour chaque lot, calculer jours avant expiration
-        3. Créer/mettre à jour alerte selon seuil
-        4. Supprimer anciennes alertes si lot revient au vert
+        Équivaut à (date_expiration - now).days comparé aux seuils:
+        jours <= 30  <=>  date_expiration < now + 31 jours
+        """
+        return case(
+            (Lot.date_expiration < now, "EXPIRÉ"),
+            (Lot.date_expiration < now + timedelta(days=AlerteExpirationService.SEUIL_ROUGE + 1), "ROUGE"),
+            (Lot.date_expiration < now + timedelta(days=AlerteExpirationService.SEUIL_ORANGE + 1), "ORANGE"),
+            (Lot.date_expiration < now + timedelta(days=AlerteExpirationService.SEUIL_JAUNE + 1), "JAUNE"),
+            else_=None
+        )
+
+    @staticmethod
+    def prochaine_transition(date_expiration: datetime, now: datetime) -> Optional[datetime]:
+        """
+        Date à laquelle le lot change de type d'alerte (None s'il est déjà expiré)
+        
+        Bascules: J-90 (JAUNE), J-60 (ORANGE), J-30 (ROUGE), expiration (EXPIRÉ)
+        """
+        for jours in (
+            AlerteExpirationService.SEUIL_JAUNE + 1,
+            AlerteExpirationService.SEUIL_ORANGE + 1,
+            AlerteExpirationService.SEUIL_ROUGE + 1,
+            AlerteExpirationService.SEUIL_EXPIRE
+        ):
+            bascule = date_expiration - timedelta(days=jours)
+            if bascule >= now:
+                return bascule
+        return None
+
+    @staticmethod
+    def _planifier_transitions(db: Session, now: datetime, ids_lots: Optional[set[int]]):
+        """
+        Recalcule date_prochaine_alerte des lots scannés (un SELECT + un UPDATE)
+        
+        Scan complet: seulement les lots jamais planifiés ou dont la date est échue.
+        """
+        query = db.query(Lot.id_lot, Lot.date_expiration)
+        if ids_lots is not None:
+            query = query.filter(Lot.id_lot.in_(ids_lots))
+        else:
+            query = query.filter(or_(
+                and_(Lot.date_prochaine_alerte.is_(None), Lot.date_expiration > now),
+                Lot.date_prochaine_alerte <= now
+            ))
+        
+        transitions = {
+            id_lot: AlerteExpirationService.prochaine_transition(date_expiration, now)
+            for id_lot, date_expiration in query.all()
+        }
+        if not transitions:
+            return
+        
+        db.execute(
+            update(Lot)
+            .where(Lot.id_lot.in_(transitions.keys()))
+            .values(date_prochaine_alerte=case(transitions, value=Lot.id_lot))
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def scanner_lots_expiration(
+        db: Session,
+        ids_lots: Optional[Iterable[int]] = None
+    ) -> Dict[str, int]:
+        """
+        Scan les lots et génère les alertes d'expiration
+        
+        Stratégie (ensembliste, nombre de requêtes constant):
+        1. Compter les lots avec quantité restante > 0 par type (GROUP BY sur un CASE)
+        2. Supprimer en un DELETE les alertes dont le type ne correspond plus au lot
+           (lot revenu au vert, vidé, ou changé de seuil)
+        3. Créer en un INSERT ... SELECT les alertes manquantes
+        4. Planifier la prochaine bascule de seuil des lots (date_prochaine_alerte)
         
         Args:
             db: Session SQLAlchemy
+            ids_lots: Limiter le scan à ces lots (mode incrémental). None = tous
+                les lots (réconciliation quotidienne)
             
         Returns:
             Dictionnaire avec compte d'alertes par type
@@ -44,58 +152,77 @@ class AlerteExpirationService:
             "updated": 0,
             "deleted": 0
         }
+        cles_stats = {"JAUNE": "jaune", "ORANGE": "orange", "ROUGE": "rouge", "EXPIRÉ": "expire"}
         
-        # Récupérer tous les lots avec stock
-        lots = db.query(Lot).filter(Lot.quantite_restante > 0).all()
+        if ids_lots is not None:
+            ids_lots = set(ids_lots)
+            if not ids_lots:
+                return stats
         
-        for lot in lots:
-            jours = (lot.date_expiration - now).days
-            
-            # Déterminer le type d'alerte
-            type_alerte = None
-            if jours < 0:
-                type_alerte = "EXPIRÉ"
-                stats["expire"] += 1
-            elif jours <= AlerteExpirationService.SEUIL_ROUGE:
-                type_alerte = "ROUGE"
-                stats["rouge"] += 1
-            elif jours <= AlerteExpirationService.SEUIL_ORANGE:
-                type_alerte = "ORANGE"
-                stats["orange"] += 1
-            elif jours <= AlerteExpirationService.SEUIL_JAUNE:
-                type_alerte = "JAUNE"
-                stats["jaune"] += 1
-            
-            # Créer/mettre à jour l'alerte
-            if type_alerte:
-                # Vérifier si alerte existe déjà
-                alerte_existante = db.query(AlerteStock).filter(
-                    AlerteStock.id_lot == lot.id_lot,
-                    AlerteStock.type_alerte == type_alerte
-                ).first()
-                
-                if not alerte_existante:
-                    # Supprimer les anciennes alertes pour ce lot
-                    db.query(AlerteStock).filter(
-                        AlerteStock.id_lot == lot.id_lot,
-                        AlerteStock.type_alerte.in_(["JAUNE", "ORANGE", "ROUGE", "EXPIRÉ"])
-                    ).delete()
-                    stats["deleted"] += db.query(AlerteStock).filter(
-                        AlerteStock.id_lot == lot.id_lot
-                    ).count()
-                    
-                    # Créer nouvelle alerte
-                    nouvelle_alerte = AlerteStock(
-                        id_produit=lot.id_produit,
-                        id_lot=lot.id_lot,
-                        type_alerte=type_alerte,
-                        date_creation=now
-                    )
-                    db.add(nouvelle_alerte)
-                    stats["updated"] += 1
+        type_lot = AlerteExpirationService._expression_type_alerte(now)
+        lots_en_alerte = and_(
+            Lot.quantite_restante > 0,
+            Lot.date_expiration < now + timedelta(days=AlerteExpirationService.SEUIL_JAUNE + 1)
+        )
+        alertes_expiration = AlerteStock.type_alerte.in_(AlerteExpirationService.TYPES_EXPIRATION)
+        if ids_lots is not None:
+            lots_en_alerte = and_(lots_en_alerte, Lot.id_lot.in_(ids_lots))
+            alertes_expiration = and_(alertes_expiration, AlerteStock.id_lot.in_(ids_lots))
         
-        # Commit
         try:
+            # 1. Répartition des lots par type
+            for type_alerte, nombre in db.query(type_lot, func.count(Lot.id_lot)).filter(
+                lots_en_alerte
+            ).group_by(type_lot).all():
+                stats[cles_stats[type_alerte]] = nombre
+            
+            # 2. Alertes périmées: plus aucun lot en stock avec ce type
+            result = db.execute(
+                delete(AlerteStock).where(
+                    alertes_expiration,
+                    ~exists().where(
+                        Lot.id_lot == AlerteStock.id_lot,
+                        Lot.quantite_restante > 0,
+                        type_lot == AlerteStock.type_alerte
+                    )
+                ).execution_options(synchronize_session=False)
+            )
+            stats["deleted"] = result.rowcount
+            
+            # 3. Nouvelles alertes: lots en alerte sans alerte du même type
+            alerte_existante = aliased(AlerteStock)
+            seuil = case(
+                (type_lot == "EXPIRÉ", AlerteExpirationService.SEUIL_EXPIRE),
+                (type_lot == "ROUGE", AlerteExpirationService.SEUIL_ROUGE),
+                (type_lot == "ORANGE", AlerteExpirationService.SEUIL_ORANGE),
+                else_=AlerteExpirationService.SEUIL_JAUNE
+            )
+            nouvelles = select(
+                Lot.id_produit,
+                Lot.id_lot,
+                type_lot,
+                literal("Lot ") + Lot.numero_lot + literal(" : alerte expiration ") + type_lot,
+                literal("ENVOYEE"),
+                seuil,
+                literal(now)
+            ).where(
+                lots_en_alerte,
+                ~exists().where(
+                    alerte_existante.id_lot == Lot.id_lot,
+                    alerte_existante.type_alerte == type_lot
+                )
+            )
+            result = db.execute(
+                insert(AlerteStock).from_select(
+                    ["id_produit", "id_lot", "type_alerte", "message", "statut", "seuil_declencheur", "date_alerte"],
+                    nouvelles
+                )
+            )
+            stats["updated"] = result.rowcount
+            
+            # 4. Prochaine bascule de seuil
+            AlerteExpirationService._planifier_transitions(db, now, ids_lots)
+            
             db.commit()
         except Exception as e:
             db.rollback()
@@ -103,6 +230,34 @@ class AlerteExpirationService:
         
         return stats
 
+    @staticmethod
+    def scanner_lots_modifies(db: Session) -> Optional[Dict[str, int]]:
+        """
+        Passage incrémental: réévalue les lots signalés et ceux dont une
+        bascule de seuil est échue (date_prochaine_alerte <= maintenant)
+        
+        Returns:
+            Stats du scan (plus "lots" = nombre de lots réévalués), None si rien à faire
+        """
+        ids_lots = LOTS_A_REEVALUER.vider()
+        try:
+            ids_lots.update(
+                id_lot for (id_lot,) in db.query(Lot.id_lot).filter(
+                    Lot.date_prochaine_alerte <= datetime.now()
+                ).all()
+            )
+            if not ids_lots:
+                return None
+            
+            stats = AlerteExpirationService.scanner_lots_expiration(db, ids_lots)
+        except Exception:
+            # Ne pas perdre les lots signalés: ils seront repris au prochain passage
+            LOTS_A_REEVALUER.ajouter(ids_lots)
+            raise
+        
+        stats["lots"] = len(ids_lots)
+        return stats
+
     @staticmethod
     def get_alertes_expirations(
         db: Session,
@@ -112,6 +267,8 @@ class AlerteExpirationService:
         """
         Récupère les alertes d'expiration
         
+        Une seule requête (alerte ⨝ lot ⨝ produit), triée par criticité en SQL.
+        
         Args:
             db: Session SQLAlchemy
             type_alerte: Filtrer par type (JAUNE, ORANGE, ROUGE, EXPIRÉ)
@@ -120,8 +277,28 @@ class AlerteExpirationService:
         Returns:
             Liste des alertes avec détails lot + produit
         """
-        query = db.query(AlerteStock).filter(
-            AlerteStock.type_alerte.in_(["JAUNE", "ORANGE", "ROUGE", "EXPIRÉ"])
+        ordre = case(
+            {"EXPIRÉ": 0, "ROUGE": 1, "ORANGE": 2, "JAUNE": 3},
+            value=AlerteStock.type_alerte,
+            else_=4
+        )
+        query = db.query(
+            AlerteStock.id_alerte,
+            AlerteStock.type_alerte,
+            AlerteStock.date_alerte,
+            Lot.id_lot,
+            Lot.numero_lot,
+            Lot.fournisseur,
+            Lot.quantite_restante,
+            Lot.date_expiration,
+            Produit.id_produit,
+            Produit.nom_produit
+        ).join(
+            Lot, AlerteStock.id_lot == Lot.id_lot
+        ).join(
+            Produit, AlerteStock.id_produit == Produit.id_produit
+        ).filter(
+            AlerteStock.type_alerte.in_(AlerteExpirationService.TYPES_EXPIRATION)
         )
         
         if type_alerte:
@@ -130,34 +307,24 @@ class AlerteExpirationService:
         if id_produit:
             query = query.filter(AlerteStock.id_produit == id_produit)
         
-        alertes = query.all()
-        
-        # Enrichir avec infos lot + produit
+        now = datetime.now()
         result = []
-        for alerte in alertes:
-            lot = db.get(Lot, alerte.id_lot) if alerte.id_lot else None
-            produit = db.get(Produit, alerte.id_produit)
-            
-            if lot:
-                jours = (lot.date_expiration - datetime.now()).days
-                result.append({
-                    "id_alerte": alerte.id_alerte,
-                    "type_alerte": alerte.type_alerte,
-                    "id_lot": lot.id_lot,
-                    "numero_lot": lot.numero_lot,
-                    "id_produit": produit.id_produit,
-                    "nom_produit": produit.nom_produit,
-                    "fournisseur": lot.fournisseur,
-                    "quantite_restante": lot.quantite_restante,
-                    "date_expiration": lot.date_expiration.isoformat(),
-                    "jours_avant_expiration": jours,
-                    "date_alerte": alerte.date_creation.isoformat() if alerte.date_creation else None,
-                    "criticite": AlerteExpirationService._get_criticite(jours)
-                })
-        
-        # Trier par criticité (expiré d'abord)
-        ordre = {"EXPIRÉ": 0, "ROUGE": 1, "ORANGE": 2, "JAUNE": 3}
-        result.sort(key=lambda x: ordre.get(x["type_alerte"], 4))
+        for row in query.order_by(ordre, AlerteStock.id_alerte).all():
+            jours = (row.date_expiration - now).days
+            result.append({
+                "id_alerte": row.id_alerte,
+                "type_alerte": row.type_alerte,
+                "id_lot": row.id_lot,
+                "numero_lot": row.numero_lot,
+                "id_produit": row.id_produit,
+                "nom_produit": row.nom_produit,
+                "fournisseur": row.fournisseur,
+                "quantite_restante": row.quantite_restante,
+                "date_expiration": row.date_expiration.isoformat(),
+                "jours_avant_expiration": jours,
+                "date_alerte": row.date_alerte.isoformat() if row.date_alerte else None,
+                "criticite": AlerteExpirationService._get_criticite(jours)
+            })
         
         return result
 
@@ -166,12 +333,12 @@ class AlerteExpirationService:
         """
         Récupère les statistiques des alertes pour le dashboard
         
+        Deux requêtes quel que soit le nombre d'alertes: un COUNT et un
+        GROUP BY (produit, type) sur alerte ⨝ lot ⨝ produit.
+        
         Returns:
             Dictionnaire avec résumé des alertes par type + sévérité
         """
-        now = datetime.now()
-        
-        # Compter les alertes par type
         stats = {
             "total_alertes": 0,
             "par_type": {
@@ -186,41 +353,49 @@ class AlerteExpirationService:
             "produits_critiques": []
         }
         
-        alertes = db.query(AlerteStock).filter(
-            AlerteStock.type_alerte.in_(["JAUNE", "ORANGE", "ROUGE", "EXPIRÉ"])
-        ).all()
+        stats["total_alertes"] = db.query(func.count(AlerteStock.id_alerte)).filter(
+            AlerteStock.type_alerte.in_(AlerteExpirationService.TYPES_EXPIRATION)
+        ).scalar()
         
-        stats["total_alertes"] = len(alertes)
+        groupes = db.query(
+            Produit.id_produit,
+            Produit.nom_produit,
+            AlerteStock.type_alerte,
+            func.count(AlerteStock.id_alerte).label("nombre"),
+            func.coalesce(func.sum(Lot.quantite_restante), 0).label("quantite")
+        ).join(
+            Lot, AlerteStock.id_lot == Lot.id_lot
+        ).join(
+            Produit, AlerteStock.id_produit == Produit.id_produit
+        ).filter(
+            AlerteStock.type_alerte.in_(AlerteExpirationService.TYPES_EXPIRATION)
+        ).group_by(
+            Produit.id_produit, Produit.nom_produit, AlerteStock.type_alerte
+        ).all()
         
-        for alerte in alertes:
-            lot = db.get(Lot, alerte.id_lot) if alerte.id_lot else None
-            produit = db.get(Produit, alerte.id_produit)
-            
-            if not lot:
-                continue
-            
+        for groupe in groupes:
             # Compter par type
-            type_lower = alerte.type_alerte.lower()
+            type_lower = groupe.type_alerte.lower()
+            stats["par_type"][type_lower] += groupe.quantite
             if type_lower == "expiré":
-                stats["par_type"]["expiré"] += lot.quantite_restante
-                stats["quantite_expirée"] += lot.quantite_restante
+                stats["quantite_expirée"] += groupe.quantite
             else:
-                stats["par_type"][type_lower] += lot.quantite_restante
-                stats["quantite_en_risque"] += lot.quantite_restante
+                stats["quantite_en_risque"] += groupe.quantite
             
             # Compter par produit
-            produit_nom = produit.nom_produit
-            if produit_nom not in stats["par_produit"]:
-                stats["par_produit"][produit_nom] = {
-                    "id_produit": produit.id_produit,
-                    "count": 0,
-                    "quantite": 0,
-                    "types": set()
-                }
-            
-            stats["par_produit"][produit_nom]["count"] += 1
-            stats["par_produit"][produit_nom]["quantite"] += lot.quantite_restante
-            stats["par_produit"][produit_nom]["types"].add(alerte.type_alerte)
+            info = stats["par_produit"].setdefault(groupe.nom_produit, {
+                "id_produit": groupe.id_produit,
+                "count": 0,
+                "quantite": 0,
+                "types": []
+            })
+            info["count"] += groupe.nombre
+            info["quantite"] += groupe.quantite
+            if groupe.type_alerte not in info["types"]:
+                info["types"].append(groupe.type_alerte)
+        
+        for info in stats["par_produit"].values():
+            info["types"].sort()
         
         # Identifier produits critiques (EXPIRÉ ou ROUGE)
         stats["produits_critiques"] = [
@@ -229,18 +404,12 @@ class AlerteExpirationService:
                 "id_produit": info["id_produit"],
                 "alertes_count": info["count"],
                 "quantite": info["quantite"],
-                "types": sorted(info["types"])
+                "types": info["types"]
             }
             for nom, info in stats["par_produit"].items()
             if "EXPIRÉ" in info["types"] or "ROUGE" in info["types"]
         ]
         
-        # Convertir les sets en lists pour JSON
-        stats["par_produit"] = {
-            nom: {**info, "types": list(info["types"])}
-            for nom, info in stats["par_produit"].items()
-        }
-        
         return stats
 
     @staticmethod
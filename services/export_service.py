@@ -0,0 +1,162 @@
+"""
+Export en flux (NDJSON / CSV) des commandes, ventes et lots
+Les lignes sont lues par paquets depuis un curseur serveur (yield_per) et
+écrites au fil de l'eau: mémoire constante quel que soit le volume exporté.
+"""
+
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.model import Commande, Client, Utilisateur, LigneCommande, Produit, Vente, Lot
+
+# Nombre de lignes lues (et envoyées) par paquet
+EXPORT_TAILLE_PAQUET = int(os.getenv("EXPORT_TAILLE_PAQUET", "1000"))
+
+FORMATS_EXPORT = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _valeur(valeur):
+    """Sérialise une valeur SQL pour l'export (dates ISO, décimaux exacts)"""
+    if isinstance(valeur, (datetime, date)):
+        return valeur.isoformat()
+    if isinstance(valeur, Decimal):
+        return str(valeur)
+    return valeur
+
+
+class ExportService:
+    """Requêtes d'export et sérialisation en flux"""
+
+    @staticmethod
+    def requete_commandes(date_debut: Optional[datetime] = None, date_fin: Optional[datetime] = None):
+        """Une ligne par ligne de commande, avec client et produit"""
+        query = select(
+            Commande.id_commande,
+            Commande.date_commande,
+            Commande.statut,
+            Commande.montant_total,
+            Client.id_client,
+            Utilisateur.nom.label("client_nom"),
+            Utilisateur.prenom.label("client_prenom"),
+            LigneCommande.id_ligne_commande,
+            Produit.id_produit,
+            Produit.nom_produit,
+            LigneCommande.quantite,
+            LigneCommande.prix_unitaire,
+            LigneCommande.montant_ligne,
+        ).join(
+            Client, Commande.id_client == Client.id_client
+        ).join(
+            Utilisateur, Client.id_utilisateur == Utilisateur.id_utilisateur
+        ).outerjoin(
+            LigneCommande, LigneCommande.id_commande == Commande.id_commande
+        ).outerjoin(
+            Produit, LigneCommande.id_produit == Produit.id_produit
+        )
+        if date_debut:
+            query = query.where(Commande.date_commande >= date_debut)
+        if date_fin:
+            query = query.where(Commande.date_commande < date_fin)
+        return query.order_by(Commande.id_commande, LigneCommande.id_ligne_commande)
+
+    @staticmethod
+    def requete_ventes(date_debut: Optional[datetime] = None, date_fin: Optional[datetime] = None):
+        """Une ligne par produit vendu (ventes non archivées), avec client"""
+        query = select(
+            Vente.id_vente,
+            Vente.date_vente,
+            Vente.chiffre_affaires,
+            Commande.id_commande,
+            Client.id_client,
+            Utilisateur.nom.label("client_nom"),
+            Utilisateur.prenom.label("client_prenom"),
+            Produit.id_produit,
+            Produit.nom_produit,
+            LigneCommande.quantite,
+            LigneCommande.prix_unitaire,
+            LigneCommande.montant_ligne,
+        ).join(
+            Commande, Vente.id_commande == Commande.id_commande
+        ).join(
+            Client, Commande.id_client == Client.id_client
+        ).join(
+            Utilisateur, Client.id_utilisateur == Utilisateur.id_utilisateur
+        ).outerjoin(
+            LigneCommande, LigneCommande.id_commande == Commande.id_commande
+        ).outerjoin(
+            Produit, LigneCommande.id_produit == Produit.id_produit
+        ).where(
+            Vente.deleted_at == None
+        )
+        if date_debut:
+            query = query.where(Vente.date_vente >= date_debut)
+        if date_fin:
+            query = query.where(Vente.date_vente < date_fin)
+        return query.order_by(Vente.id_vente, LigneCommande.id_ligne_commande)
+
+    @staticmethod
+    def requete_lots(id_produit: Optional[int] = None):
+        """Tous les lots (y compris épuisés), avec produit"""
+        query = select(
+            Lot.id_lot,
+            Lot.numero_lot,
+            Produit.id_produit,
+            Produit.nom_produit,
+            Lot.id_stock,
+            Lot.date_fabrication,
+            Lot.date_expiration,
+            Lot.quantite_initiale,
+            Lot.quantite_restante,
+            Lot.fournisseur,
+        ).join(
+            Produit, Lot.id_produit == Produit.id_produit
+        )
+        if id_produit:
+            query = query.where(Lot.id_produit == id_produit)
+        return query.order_by(Lot.id_lot)
+
+    @staticmethod
+    def flux(db: Session, query, format_export: str) -> Iterator[str]:
+        """
+        Exécute la requête sur une session dédiée et produit le fichier par paquets
+
+        La session dédiée (même moteur que db) reste ouverte le temps du flux,
+        indépendamment de la fermeture de la session de la requête HTTP.
+        """
+        session = Session(bind=db.get_bind())
+        try:
+            result = session.execute(
+                query.execution_options(yield_per=EXPORT_TAILLE_PAQUET, stream_results=True)
+            )
+            colonnes = list(result.keys())
+
+            if format_export == "csv":
+                tampon = io.StringIO()
+                writer = csv.writer(tampon)
+                writer.writerow(colonnes)
+                for paquet in result.partitions():
+                    writer.writerows([_valeur(v) for v in row] for row in paquet)
+                    yield tampon.getvalue()
+                    tampon.seek(0)
+                    tampon.truncate(0)
+                if tampon.tell():
+                    yield tampon.getvalue()
+            else:
+                for paquet in result.partitions():
+                    yield "".join(
+                        json.dumps({c: _valeur(v) for c, v in zip(colonnes, row)}, ensure_ascii=False) + "\n"
+                        for row in paquet
+                    )
+        finally:
+            session.close()
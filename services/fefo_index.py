@@ -0,0 +1,182 @@
+"""
+Index FEFO en mémoire (process-local) des lots avec stock, par produit
+
+Pour chaque produit: les lots triés par (date_expiration, id_lot) et les
+quantités cumulées. "Peut-on servir Q unités" et la prévisualisation d'une
+allocation se résolvent par bisection (O(log n)) sans requête SQL.
+
+Cohérence:
+- les écritures de lots de ce process invalident le produit (invalider_index_fefo)
+- un compteur de version par produit empêche un chargement commencé avant une
+  invalidation d'être mis en cache
+- FEFO_INDEX_TTL borne la fraîcheur des écritures faites par d'autres workers
+
+L'index ne sert qu'aux lectures (prévisualisations, disponibilité): la
+validation d'une commande relit et déduit les lots en base (UPDATE conditionnel).
+"""
+
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import and_, select
+from sqlalchemy.orm import Session
+
+from models.model import Lot, Produit
+
+logger = logging.getLogger(__name__)
+
+# Durée de vie d'un produit indexé en secondes (0 = index désactivé)
+FEFO_INDEX_TTL = int(os.getenv("FEFO_INDEX_TTL", "0"))
+FEFO_INDEX_MAX_PRODUITS = int(os.getenv("FEFO_INDEX_MAX_PRODUITS", "5000"))
+
+
+class EntreeFEFO:
+    """Lots d'un produit triés par expiration, avec quantités cumulées"""
+
+    __slots__ = ("produit_existe", "expirations", "cumul", "lots", "expire_a")
+
+    def __init__(self, lots: Iterable, produit_existe: bool = True, expire_a: float = 0.0):
+        """
+        Args:
+            lots: Lignes (id_lot, numero_lot, date_expiration, fournisseur, quantite_restante)
+                avec du stock, expirées ou non
+        """
+        lots = sorted(lots, key=lambda lot: (lot.date_expiration, lot.id_lot))
+        self.produit_existe = produit_existe
+        self.expire_a = expire_a
+        self.expirations = [lot.date_expiration for lot in lots]
+        self.lots = [(lot.id_lot, lot.numero_lot, lot.date_expiration, lot.fournisseur) for lot in lots]
+        self.cumul = [0]
+        for lot in lots:
+            self.cumul.append(self.cumul[-1] + lot.quantite_restante)
+
+    def _premier_actif(self, now: datetime) -> int:
+        # Expiré <=> date_expiration <= now (mêmes bornes que FEFOService)
+        return bisect_right(self.expirations, now)
+
+    def quantite_expiree(self, now: datetime) -> int:
+        return self.cumul[self._premier_actif(now)]
+
+    def quantite_disponible(self, now: datetime) -> int:
+        return self.cumul[-1] - self.cumul[self._premier_actif(now)]
+
+    def peut_servir(self, quantite: int, now: datetime) -> bool:
+        """Aucun stock expiré et assez de stock actif"""
+        debut = self._premier_actif(now)
+        return debut == 0 and self.cumul[-1] >= quantite
+
+    def allouer(self, quantite: int, now: datetime) -> list[dict]:
+        """
+        Allocation FEFO de `quantite` unités sur les lots actifs
+
+        L'appelant vérifie d'abord quantite_disponible (sinon allocation partielle).
+        """
+        debut = self._premier_actif(now)
+        cible = self.cumul[debut] + quantite
+        fin = bisect_left(self.cumul, cible, lo=debut)
+        allocations = []
+        for i in range(debut, min(fin, len(self.lots))):
+            id_lot, numero_lot, date_expiration, fournisseur = self.lots[i]
+            allocations.append({
+                "id_lot": id_lot,
+                "numero_lot": numero_lot,
+                "quantite": min(self.cumul[i + 1], cible) - self.cumul[i],
+                "date_expiration": date_expiration.isoformat(),
+                "fournisseur": fournisseur
+            })
+        return allocations
+
+
+class IndexFEFO:
+    """LRU des entrées FEFO par produit, invalidé par version"""
+
+    def __init__(self, ttl: int = FEFO_INDEX_TTL, max_produits: int = FEFO_INDEX_MAX_PRODUITS):
+        self.ttl = ttl
+        self.max_produits = max_produits
+        self._lock = threading.Lock()
+        self._entrees: OrderedDict = OrderedDict()
+        self._versions: defaultdict = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def actif(self) -> bool:
+        return self.ttl > 0
+
+    @staticmethod
+    def charger(db: Session, id_produit: int, expire_a: float = 0.0) -> EntreeFEFO:
+        """Lots avec stock du produit (une requête, produit en jointure externe)"""
+        rows = db.execute(
+            select(
+                Produit.id_produit.label("produit"),
+                Lot.id_lot, Lot.numero_lot, Lot.date_expiration, Lot.fournisseur, Lot.quantite_restante
+            )
+            .outerjoin(Lot, and_(Lot.id_produit == Produit.id_produit, Lot.quantite_restante > 0))
+            .where(Produit.id_produit == id_produit)
+        ).all()
+        return EntreeFEFO(
+            [row for row in rows if row.id_lot is not None],
+            produit_existe=bool(rows),
+            expire_a=expire_a
+        )
+
+    def entree(self, db: Session, id_produit: int) -> EntreeFEFO:
+        maintenant = time.monotonic()
+        with self._lock:
+            entree = self._entrees.get(id_produit)
+            if entree is not None and entree.expire_a > maintenant:
+                self._entrees.move_to_end(id_produit)
+                self.hits += 1
+                return entree
+            self.misses += 1
+            version = self._versions[id_produit]
+
+        entree = IndexFEFO.charger(db, id_produit, expire_a=maintenant + self.ttl)
+
+        with self._lock:
+            # Invalidé pendant le chargement: servir la lecture sans la garder
+            if self._versions[id_produit] == version:
+                self._entrees[id_produit] = entree
+                self._entrees.move_to_end(id_produit)
+                while len(self._entrees) > self.max_produits:
+                    self._entrees.popitem(last=False)
+        return entree
+
+    def invalider(self, ids_produits: Iterable[int]) -> None:
+        with self._lock:
+            for id_produit in set(ids_produits):
+                self._versions[id_produit] += 1
+                if self._entrees.pop(id_produit, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for id_produit in self._entrees:
+                self._versions[id_produit] += 1
+            self._entrees.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "actif": self.actif,
+                "ttl": self.ttl,
+                "produits": len(self._entrees),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations
+            }
+
+
+FEFO_INDEX = IndexFEFO()
+
+
+def invalider_index_fefo(ids_produits: Iterable[int]):
+    """À appeler après commit d'une écriture sur les lots de ces produits"""
+    FEFO_INDEX.invalider(ids_produits)
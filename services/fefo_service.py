@@ -3,16 +3,75 @@ Logique FEFO (First Expired First Out)
 Gestion des lots et allocation intelligente des stocks
 """
 
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from sqlalchemy import and_, desc, case, func, or_, update
 from models.model import Lot, Stock, Produit, LigneCommande
+from services.fefo_index import FEFO_INDEX, EntreeFEFO, IndexFEFO
 from typing import Optional, Tuple
 
+logger = logging.getLogger(__name__)
+
+# Mode de concurrence pour la déduction des lots:
+# - "optimistic": UPDATE conditionnel (quantite_restante >= quantité allouée) + retry
+# - "skip_locked": en plus, les lots sont lus avec SELECT ... FOR UPDATE SKIP LOCKED
+FEFO_CONCURRENCY_MODE = os.getenv("FEFO_CONCURRENCY_MODE", "optimistic").lower()
+FEFO_MAX_RETRIES = int(os.getenv("FEFO_MAX_RETRIES", "3"))
+FEFO_RETRY_BACKOFF_MS = int(os.getenv("FEFO_RETRY_BACKOFF_MS", "50"))
+
+# Durée de vie du résumé des lots (dashboard), 0 = pas de cache
+LOTS_RESUME_CACHE_TTL = int(os.getenv("LOTS_RESUME_CACHE_TTL", "30"))
+
+_resume_lock = threading.Lock()
+_resume_cache: dict = {"valeur": None, "expire_a": 0.0}
+
+
+def invalider_resume_lots():
+    """Invalide le résumé des lots en cache (à appeler après une écriture sur les lots)"""
+    with _resume_lock:
+        _resume_cache["valeur"] = None
+        _resume_cache["expire_a"] = 0.0
+
+
+class FEFOConflictError(Exception):
+    """Les lots ont été modifiés par une autre transaction à chaque tentative"""
+
 
 class FEFOService:
     """Service pour gérer la logique FEFO (First Expired First Out)"""
 
+    # Métriques de concurrence (process-local)
+    _metrics_lock = threading.Lock()
+    _metrics = {"tentatives": 0, "conflits": 0, "retries": 0, "echecs": 0, "succes": 0}
+
+    @staticmethod
+    def _record(**increments: int):
+        with FEFOService._metrics_lock:
+            for nom, valeur in increments.items():
+                FEFOService._metrics[nom] += valeur
+
+    @staticmethod
+    def concurrency_stats() -> dict:
+        """Retourne les compteurs de conflits de déduction FEFO"""
+        with FEFOService._metrics_lock:
+            stats = dict(FEFOService._metrics)
+        stats["mode"] = FEFO_CONCURRENCY_MODE
+        stats["max_retries"] = FEFO_MAX_RETRIES
+        stats["index"] = FEFO_INDEX.stats()
+        return stats
+
+    @staticmethod
+    def reset_concurrency_stats():
+        with FEFOService._metrics_lock:
+            for nom in FEFOService._metrics:
+                FEFOService._metrics[nom] = 0
+
     @staticmethod
     def get_lots_fefo_order(db: Session, id_produit: int) -> list[Lot]:
         """
@@ -34,7 +93,7 @@ class FEFOService:
                 Lot.quantite_restante > 0,  # Seulement lots avec stock
                 Lot.date_expiration > now   # Seulement lots non expirés
             )
-        ).order_by(Lot.date_expiration.asc()).all()
+        ).order_by(Lot.date_expiration.asc(), Lot.id_lot.asc()).all()
         
         return lots
 
@@ -78,6 +137,9 @@ class FEFOService:
         4. Passer au lot suivant s'il reste à déduire
         5. Retourner la liste d'allocations [{'id_lot': X, 'quantite': Y}, ...]
         
+        Simulation uniquement (lots servis par l'index FEFO s'il est actif):
+        la validation passe par allocate_and_deduct_commande.
+        
         Args:
             db: Session SQLAlchemy
             id_produit: ID du produit
@@ -90,11 +152,11 @@ class FEFOService:
             - error_message: Message d'erreur si échec
         """
         now = datetime.now()
+        entree = FEFOService.entree_fefo(db, id_produit)
         
         # 1. Vérifier si stock expiré existe
-        lots_expired = FEFOService.get_lots_expired(db, id_produit)
-        if lots_expired:
-            expired_count = sum(lot.quantite_restante for lot in lots_expired)
+        expired_count = entree.quantite_expiree(now)
+        if expired_count:
             return (
                 [],
                 False,
@@ -102,11 +164,8 @@ class FEFOService:
                 f"Impossible de traiter commande. Contactez gestionnaire stock."
             )
         
-        # 2. Récupérer stocks actifs triés par FEFO
-        lots_actifs = FEFOService.get_lots_fefo_order(db, id_produit)
-        
-        # 3. Vérifier si quantité totale disponible suffit
-        quantite_totale = sum(lot.quantite_restante for lot in lots_actifs)
+        # 2. Vérifier si quantité totale disponible suffit
+        quantite_totale = entree.quantite_disponible(now)
         if quantite_totale < quantite_demandee:
             return (
                 [],
@@ -114,56 +173,229 @@ class FEFOService:
                 f"Stock insuffisant: {quantite_totale} disponible, {quantite_demandee} demandée"
             )
         
-        # 4. Allouer en suivant FEFO
-        allocations = []
-        quantite_restante = quantite_demandee
+        # 3. Allouer en suivant FEFO (lots triés par expiration, quantités cumulées)
+        return (entree.allouer(quantite_demandee, now), True, None)
+
+    @staticmethod
+    def entree_fefo(db: Session, id_produit: int) -> EntreeFEFO:
+        """
+        Lots avec stock du produit triés FEFO: depuis l'index mémoire s'il est
+        actif (FEFO_INDEX_TTL > 0), sinon lus en base (une requête)
+        """
+        if FEFO_INDEX.actif:
+            return FEFO_INDEX.entree(db, id_produit)
+        return IndexFEFO.charger(db, id_produit)
+
+    @staticmethod
+    def deduct_lots(
+        db: Session,
+        allocations: list[dict]
+    ) -> bool:
+        """
+        Applique les déductions aux lots après validation commande
         
-        for lot in lots_actifs:
-            if quantite_restante <= 0:
-                break
+        Args:
+            db: Session SQLAlchemy
+            allocations: Liste [{'id_lot': X, 'quantite': Y}, ...]
             
-            # Prendre ce qu'on peut du lot courant
-            quantite_du_lot = min(lot.quantite_restante, quantite_restante)
+        Returns:
+            True si succès, False si erreur
+        """
+        # Pas de clamp à 0: un lot insuffisant fait échouer la déduction
+        if not FEFOService.deduct_lots_bulk(db, allocations):
+            db.rollback()
+            return False
+        
+        db.commit()
+        return True
+
+    @staticmethod
+    def _allocation_dict(lot: Lot, quantite: int) -> dict:
+        return {
+            "id_lot": lot.id_lot,
+            "numero_lot": lot.numero_lot,
+            "quantite": quantite,
+            "date_expiration": lot.date_expiration.isoformat(),
+            "fournisseur": lot.fournisseur
+        }
+
+    @staticmethod
+    def allocate_fefo_commande(
+        db: Session,
+        demandes: list[tuple[int, int]],
+        skip_locked: bool = False
+    ) -> Tuple[list[list[dict]], bool, Optional[str]]:
+        """
+        Alloue en FEFO toutes les lignes d'une commande en une seule requête
+        
+        Charge les lots avec stock de tous les produits demandés (triés par
+        produit puis expiration), puis calcule toutes les allocations en mémoire.
+        Mêmes règles et mêmes messages d'erreur que allocate_fefo, ligne par ligne.
+        
+        Args:
+            db: Session SQLAlchemy
+            demandes: Liste [(id_produit, quantite), ...] dans l'ordre des lignes
+            skip_locked: Verrouille les lots lus (FOR UPDATE SKIP LOCKED);
+                les lots déjà verrouillés par une autre validation sont ignorés
             
-            allocations.append({
-                "id_lot": lot.id_lot,
-                "numero_lot": lot.numero_lot,
-                "quantite": quantite_du_lot,
-                "date_expiration": lot.date_expiration.isoformat(),
-                "fournisseur": lot.fournisseur
-            })
+        Returns:
+            Tuple (allocations, success, error_message)
+            - allocations: une liste d'allocations par demande (même ordre)
+            - success: True si toutes les lignes sont allouées
+            - error_message: Message d'erreur de la première ligne en échec
+        """
+        now = datetime.now()
+        ids_produits = {id_produit for id_produit, _ in demandes}
+        
+        query = db.query(Lot).filter(
+            Lot.id_produit.in_(ids_produits),
+            Lot.quantite_restante > 0
+        ).order_by(
+            Lot.id_produit, Lot.date_expiration.asc(), Lot.id_lot.asc()
+        )
+        if skip_locked:
+            query = query.with_for_update(skip_locked=True)
+        lots = query.all()
+        
+        lots_expired = defaultdict(list)
+        lots_actifs = defaultdict(list)
+        for lot in lots:
+            if lot.date_expiration <= now:
+                lots_expired[lot.id_produit].append(lot)
+            else:
+                lots_actifs[lot.id_produit].append(lot)
+        
+        # Quantités encore allouables (un produit peut apparaître sur plusieurs demandes)
+        restant = {lot.id_lot: lot.quantite_restante for lot in lots}
+        
+        resultat = []
+        for id_produit, quantite_demandee in demandes:
+            # 1. Vérifier si stock expiré existe
+            if lots_expired[id_produit]:
+                expired_count = sum(lot.quantite_restante for lot in lots_expired[id_produit])
+                return (
+                    [],
+                    False,
+                    f"⚠️ ERREUR SANITAIRE: {expired_count} unités expirées détectées! "
+                    f"Impossible de traiter commande. Contactez gestionnaire stock."
+                )
+            
+            # 2. Vérifier si quantité totale disponible suffit
+            quantite_totale = sum(restant[lot.id_lot] for lot in lots_actifs[id_produit])
+            if quantite_totale < quantite_demandee:
+                return (
+                    [],
+                    False,
+                    f"Stock insuffisant: {quantite_totale} disponible, {quantite_demandee} demandée"
+                )
+            
+            # 3. Allouer en suivant FEFO
+            allocations = []
+            a_allouer = quantite_demandee
+            for lot in lots_actifs[id_produit]:
+                if a_allouer <= 0:
+                    break
+                quantite_du_lot = min(restant[lot.id_lot], a_allouer)
+                if quantite_du_lot <= 0:
+                    continue
+                allocations.append(FEFOService._allocation_dict(lot, quantite_du_lot))
+                restant[lot.id_lot] -= quantite_du_lot
+                a_allouer -= quantite_du_lot
             
-            quantite_restante -= quantite_du_lot
+            resultat.append(allocations)
         
-        return (allocations, True, None)
+        return (resultat, True, None)
 
     @staticmethod
-    def deduct_lots(
+    def deduct_lots_bulk(
         db: Session,
         allocations: list[dict]
     ) -> bool:
         """
-        Applique les déductions aux lots après validation commande
+        Applique toutes les déductions en un seul UPDATE ... CASE id_lot
+        
+        L'UPDATE est conditionnel (quantite_restante >= quantité allouée): un lot
+        consommé entre-temps par une autre transaction n'est pas modifié, ce qui
+        se détecte sur le nombre de lignes mises à jour.
+        
+        Ne commit pas: l'appelant valide la transaction avec le reste de la commande.
         
         Args:
             db: Session SQLAlchemy
             allocations: Liste [{'id_lot': X, 'quantite': Y}, ...]
             
         Returns:
-            True si succès, False si erreur
+            True si tous les lots ont été mis à jour, False sinon (conflit)
         """
+        quantites = defaultdict(int)
         for alloc in allocations:
-            lot = db.get(Lot, alloc["id_lot"])
-            if not lot:
-                return False
+            quantites[alloc["id_lot"]] += alloc["quantite"]
+        if not quantites:
+            return True
+        
+        quantite_lot = case(quantites, value=Lot.id_lot, else_=0)
+        result = db.execute(
+            update(Lot)
+            .where(Lot.id_lot.in_(quantites.keys()), Lot.quantite_restante >= quantite_lot)
+            .values(quantite_restante=Lot.quantite_restante - quantite_lot)
+            .execution_options(synchronize_session=False)
+        )
+        
+        # Les lots déjà chargés dans la session doivent relire leur quantité
+        for obj in list(db.identity_map.values()):
+            if isinstance(obj, Lot) and obj.id_lot in quantites:
+                db.expire(obj, ["quantite_restante"])
+        
+        return result.rowcount == len(quantites)
+
+    @staticmethod
+    def allocate_and_deduct_commande(
+        db: Session,
+        demandes: list[tuple[int, int]]
+    ) -> Tuple[list[list[dict]], bool, Optional[str]]:
+        """
+        Alloue et déduit les lots d'une commande, sans survente en concurrence
+        
+        En cas de conflit (un lot modifié par une autre validation entre la
+        lecture et l'UPDATE), la transaction est annulée puis l'allocation est
+        recalculée, avec un backoff exponentiel borné (FEFO_MAX_RETRIES).
+        
+        Ne commit pas en cas de succès: l'appelant valide la transaction.
+        
+        Returns:
+            Tuple (allocations, success, error_message) comme allocate_fefo_commande
             
-            # Déduire la quantité
-            lot.quantite_restante -= alloc["quantite"]
-            if lot.quantite_restante < 0:
-                lot.quantite_restante = 0
+        Raises:
+            FEFOConflictError: si toutes les tentatives sont en conflit
+        """
+        skip_locked = FEFO_CONCURRENCY_MODE == "skip_locked"
         
-        db.commit()
-        return True
+        for tentative in range(FEFO_MAX_RETRIES + 1):
+            FEFOService._record(tentatives=1)
+            allocations, success, error = FEFOService.allocate_fefo_commande(
+                db, demandes, skip_locked=skip_locked
+            )
+            if not success:
+                return (allocations, False, error)
+            
+            toutes = [alloc for lignes in allocations for alloc in lignes]
+            if FEFOService.deduct_lots_bulk(db, toutes):
+                FEFOService._record(succes=1)
+                return (allocations, True, None)
+            
+            # Conflit: un autre validateur a consommé un des lots
+            db.rollback()
+            FEFOService._record(conflits=1)
+            if tentative < FEFO_MAX_RETRIES:
+                FEFOService._record(retries=1)
+                delai = FEFO_RETRY_BACKOFF_MS * (2 ** tentative) / 1000
+                time.sleep(delai * random.uniform(0.5, 1.5))
+                logger.warning(f"⚠️ Conflit FEFO, nouvelle tentative ({tentative + 1}/{FEFO_MAX_RETRIES})")
+        
+        FEFOService._record(echecs=1)
+        raise FEFOConflictError(
+            "Conflit de concurrence sur les lots: commande validée simultanément ailleurs. Réessayez."
+        )
 
     @staticmethod
     def get_lot_alert_status(lot: Lot) -> str:
@@ -197,6 +429,76 @@ class FEFOService:
         else:
             return "VERT"
 
+    @staticmethod
+    def get_lots_resume(db: Session) -> dict:
+        """
+        Résumé des lots pour le tableau de bord, calculé par une seule
+        requête d'agrégation (comptes et sommes par seuil d'expiration)
+        
+        Le résultat est gardé LOTS_RESUME_CACHE_TTL secondes, et invalidé
+        par les écritures sur les lots (invalider_resume_lots).
+        
+        Returns:
+            Statistiques globales sur les lots
+        """
+        if LOTS_RESUME_CACHE_TTL > 0:
+            with _resume_lock:
+                if _resume_cache["valeur"] is not None and _resume_cache["expire_a"] > time.monotonic():
+                    return _resume_cache["valeur"]
+        
+        now = datetime.now()
+        seuil = {jours: now + timedelta(days=jours + 1) for jours in (30, 60, 90)}
+        expire = Lot.date_expiration <= now
+        rouge = and_(Lot.date_expiration > now, Lot.date_expiration < seuil[30])
+        orange = and_(Lot.date_expiration >= seuil[30], Lot.date_expiration < seuil[60])
+        jaune = and_(Lot.date_expiration >= seuil[60], Lot.date_expiration < seuil[90])
+        vert = Lot.date_expiration >= seuil[90]
+        
+        def compte(condition):
+            return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+        
+        def quantite(condition):
+            return func.coalesce(func.sum(case((condition, Lot.quantite_restante), else_=0)), 0)
+        
+        row = db.query(
+            func.count(Lot.id_lot).label("total"),
+            compte(vert).label("vert"),
+            compte(jaune).label("jaune"),
+            compte(orange).label("orange"),
+            compte(rouge).label("rouge"),
+            compte(expire).label("expire"),
+            quantite(Lot.date_expiration > now).label("stock_sain"),
+            quantite(or_(rouge, orange)).label("stock_risque"),
+            quantite(expire).label("stock_expire")
+        ).one()
+        
+        resume = {
+            "total_lots": row.total,
+            "statistiques": {
+                "vert": row.vert,
+                "jaune": row.jaune,
+                "orange": row.orange,
+                "rouge": row.rouge,
+                "expiré": row.expire
+            },
+            "quantites": {
+                "stock_sain": row.stock_sain,
+                "stock_risque": row.stock_risque,  # Orange + Rouge
+                "stock_expiré": row.stock_expire
+            },
+            "alertes": {
+                "critique": row.stock_expire > 0,  # ⚠️ Stock expiré = CRITIQUE
+                "attention": row.stock_risque > 0   # ⚠️ Stock expire bientôt
+            }
+        }
+        
+        if LOTS_RESUME_CACHE_TTL > 0:
+            with _resume_lock:
+                _resume_cache["valeur"] = resume
+                _resume_cache["expire_a"] = time.monotonic() + LOTS_RESUME_CACHE_TTL
+        
+        return resume
+
     @staticmethod
     def get_jours_avant_expiration(lot: Lot) -> int:
         """Retourne le nombre de jours avant expiration (négatif si expiré)"""
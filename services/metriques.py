@@ -0,0 +1,217 @@
+"""
+Instrumentation par requête: latence, nombre de requêtes SQL et temps base
+
+- Middleware ASGI: durée de chaque requête HTTP par (méthode, route), en-tête
+  Server-Timing (app, db)
+- Hooks SQLAlchemy before/after_cursor_execute (sur toutes les Engine): nombre
+  de requêtes SQL et temps passé en base, attribués à la requête HTTP courante
+  via une ContextVar
+- GET /metrics: format texte Prometheus
+
+Désactivé (METRIQUES_ACTIVES=false), le middleware se contente de passer la
+main et aucun hook SQL n'est installé.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRIQUES_ACTIVES = os.getenv("METRIQUES_ACTIVES", "false").lower() == "true"
+# Jeton attendu par GET /metrics (Authorization: Bearer ...), vide = accès libre
+METRIQUES_TOKEN = os.getenv("METRIQUES_TOKEN", "")
+
+BUCKETS_LATENCE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_REQUETES_SQL = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Compteurs SQL de la requête HTTP en cours: [nombre de requêtes, durée en secondes]
+_requete_courante: ContextVar[Optional[list]] = ContextVar("metriques_requete", default=None)
+
+
+class Histogramme:
+    """Histogramme cumulatif à la Prometheus (bornes fixes)"""
+
+    __slots__ = ("bornes", "compteurs", "somme", "total")
+
+    def __init__(self, bornes: tuple):
+        self.bornes = bornes
+        self.compteurs = [0] * len(bornes)
+        self.somme = 0.0
+        self.total = 0
+
+    def observer(self, valeur: float) -> None:
+        index = bisect_left(self.bornes, valeur)
+        if index < len(self.bornes):
+            self.compteurs[index] += 1
+        self.somme += valeur
+        self.total += 1
+
+    def cumuls(self) -> list[int]:
+        cumul, resultat = 0, []
+        for compteur in self.compteurs:
+            cumul += compteur
+            resultat.append(cumul)
+        return resultat
+
+
+class StatsRoute:
+    __slots__ = ("latence", "requetes_sql", "duree_sql", "statuts")
+
+    def __init__(self):
+        self.latence = Histogramme(BUCKETS_LATENCE)
+        self.requetes_sql = Histogramme(BUCKETS_REQUETES_SQL)
+        self.duree_sql = 0.0
+        self.statuts: dict[int, int] = {}
+
+
+def _echapper(valeur: str) -> str:
+    return valeur.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _borne(valeur: float) -> str:
+    return f"{valeur:g}"
+
+
+class RegistreMetriques:
+    """Statistiques par (méthode, route), process-local"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: dict[tuple[str, str], StatsRoute] = {}
+        self.actif = False
+
+    # ---------- Hooks SQLAlchemy ----------
+    @staticmethod
+    def _avant_execution(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and _requete_courante.get() is not None:
+            context._metriques_debut = time.perf_counter()
+
+    @staticmethod
+    def _apres_execution(conn, cursor, statement, parameters, context, executemany):
+        compteurs = _requete_courante.get()
+        debut = getattr(context, "_metriques_debut", None)
+        if compteurs is None or debut is None:
+            return
+        compteurs[0] += 1
+        compteurs[1] += time.perf_counter() - debut
+
+    def activer(self) -> None:
+        if self.actif:
+            return
+        event.listen(Engine, "before_cursor_execute", RegistreMetriques._avant_execution)
+        event.listen(Engine, "after_cursor_execute", RegistreMetriques._apres_execution)
+        self.actif = True
+
+    def desactiver(self) -> None:
+        if not self.actif:
+            return
+        event.remove(Engine, "before_cursor_execute", RegistreMetriques._avant_execution)
+        event.remove(Engine, "after_cursor_execute", RegistreMetriques._apres_execution)
+        self.actif = False
+
+    # ---------- Enregistrement ----------
+    def enregistrer(self, methode: str, route: str, statut: int, duree: float, requetes_sql: int, duree_sql: float):
+        with self._lock:
+            stats = self._routes.get((methode, route))
+            if stats is None:
+                stats = self._routes[(methode, route)] = StatsRoute()
+            stats.latence.observer(duree)
+            stats.requetes_sql.observer(requetes_sql)
+            stats.duree_sql += duree_sql
+            stats.statuts[statut] = stats.statuts.get(statut, 0) + 1
+
+    def reinitialiser(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+    # ---------- Export Prometheus ----------
+    def exporter(self) -> str:
+        lignes = []
+        with self._lock:
+            routes = sorted(self._routes.items())
+
+            def histogramme(nom: str, aide: str, attribut: str):
+                lignes.append(f"# HELP {nom} {aide}")
+                lignes.append(f"# TYPE {nom} histogram")
+                for (methode, route), stats in routes:
+                    h = getattr(stats, attribut)
+                    etiquettes = f'method="{methode}",route="{_echapper(route)}"'
+                    for borne, cumul in zip(h.bornes, h.cumuls()):
+                        lignes.append(f'{nom}_bucket{{{etiquettes},le="{_borne(borne)}"}} {cumul}')
+                    lignes.append(f'{nom}_bucket{{{etiquettes},le="+Inf"}} {h.total}')
+                    lignes.append(f"{nom}_sum{{{etiquettes}}} {h.somme:.6f}")
+                    lignes.append(f"{nom}_count{{{etiquettes}}} {h.total}")
+
+            histogramme("http_request_duration_seconds", "Durée des requêtes HTTP", "latence")
+            histogramme("http_request_db_queries", "Requêtes SQL par requête HTTP", "requetes_sql")
+
+            lignes.append("# HELP http_request_db_seconds_total Temps passé en base par route")
+            lignes.append("# TYPE http_request_db_seconds_total counter")
+            for (methode, route), stats in routes:
+                lignes.append(
+                    f'http_request_db_seconds_total{{method="{methode}",route="{_echapper(route)}"}} '
+                    f"{stats.duree_sql:.6f}"
+                )
+
+            lignes.append("# HELP http_requests_total Requêtes HTTP par route et statut")
+            lignes.append("# TYPE http_requests_total counter")
+            for (methode, route), stats in routes:
+                for statut, nombre in sorted(stats.statuts.items()):
+                    lignes.append(
+                        f'http_requests_total{{method="{methode}",route="{_echapper(route)}",status="{statut}"}} {nombre}'
+                    )
+        return "\n".join(lignes) + "\n"
+
+
+METRIQUES = RegistreMetriques()
+
+
+class MiddlewareMetriques:
+    """
+    Middleware ASGI (pas BaseHTTPMiddleware: pas de surcoût sur les réponses
+    streamées). Sans métriques actives, transmet la requête telle quelle.
+    """
+
+    def __init__(self, app, registre: RegistreMetriques = METRIQUES):
+        self.app = app
+        self.registre = registre
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.registre.actif:
+            await self.app(scope, receive, send)
+            return
+
+        compteurs = [0, 0.0]
+        jeton = _requete_courante.set(compteurs)
+        debut = time.perf_counter()
+        statut = 500
+
+        async def envoyer(message):
+            nonlocal statut
+            if message["type"] == "http.response.start":
+                statut = message["status"]
+                duree_ms = (time.perf_counter() - debut) * 1000
+                en_tete = (
+                    f'app;dur={duree_ms:.1f}, db;dur={compteurs[1] * 1000:.1f};desc="{compteurs[0]} requetes"'
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", en_tete.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, envoyer)
+        finally:
+            _requete_courante.reset(jeton)
+            route = scope.get("route")
+            self.registre.enregistrer(
+                scope["method"],
+                getattr(route, "path", "non_route"),
+                statut,
+                time.perf_counter() - debut,
+                compteurs[0],
+                compteurs[1]
+            )
@@ -0,0 +1,150 @@
+"""
+Pagination keyset (par curseur) commune aux endpoints de liste
+
+Le curseur encode la clé de tri et la clé primaire du dernier élément renvoyé:
+la page suivante repart de là avec un WHERE indexé, sans OFFSET, quel que soit
+le nombre de lignes déjà parcourues.
+"""
+
+import base64
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_
+
+PAGINATION_LIMITE_DEFAUT = int(os.getenv("PAGINATION_LIMITE_DEFAUT", "100"))
+PAGINATION_LIMITE_MAX = int(os.getenv("PAGINATION_LIMITE_MAX", "500"))
+
+# En-tête portant le curseur de la page suivante (absent sur la dernière page)
+HEADER_CURSEUR_SUIVANT = "X-Next-Cursor"
+
+
+def _encoder_valeur(valeur):
+    if isinstance(valeur, datetime):
+        return {"dt": valeur.isoformat()}
+    if isinstance(valeur, date):
+        return {"d": valeur.isoformat()}
+    if isinstance(valeur, Decimal):
+        return {"dec": str(valeur)}
+    return valeur
+
+
+def _decoder_valeur(valeur):
+    if isinstance(valeur, dict):
+        if "dt" in valeur:
+            return datetime.fromisoformat(valeur["dt"])
+        if "d" in valeur:
+            return date.fromisoformat(valeur["d"])
+        if "dec" in valeur:
+            return Decimal(valeur["dec"])
+    return valeur
+
+
+def encoder_curseur(tri: str, valeur_tri, valeur_id) -> str:
+    contenu = json.dumps([tri, _encoder_valeur(valeur_tri), valeur_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(contenu.encode()).decode().rstrip("=")
+
+
+def decoder_curseur(curseur: str) -> tuple:
+    try:
+        remplissage = "=" * (-len(curseur) % 4)
+        tri, valeur_tri, valeur_id = json.loads(base64.urlsafe_b64decode(curseur + remplissage))
+        return tri, _decoder_valeur(valeur_tri), valeur_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+
+
+class Pagination:
+    """
+    Dépendance FastAPI: curseur, limite (plafonnée) et options de tri
+
+    Utilisation dans un router:
+        pagination: Pagination = Depends()
+        return pagination.paginer(query, {"id": Modele.id, "date": Modele.date}, Modele.id)
+    """
+
+    def __init__(
+        self,
+        response: Response,
+        cursor: Optional[str] = Query(None, description="Curseur renvoyé dans l'en-tête X-Next-Cursor"),
+        limit: int = Query(
+            PAGINATION_LIMITE_DEFAUT, ge=1, le=PAGINATION_LIMITE_MAX,
+            description=f"Nombre d'éléments par page (max {PAGINATION_LIMITE_MAX})"
+        ),
+        tri: Optional[str] = Query(None, description="Colonne de tri (selon l'endpoint)"),
+        ordre: Optional[str] = Query(None, pattern="^(asc|desc)$", description="asc ou desc"),
+    ):
+        self.response = response
+        self.cursor = cursor
+        self.limit = limit
+        self.tri = tri
+        self.ordre = ordre
+
+    def paginer(
+        self,
+        query,
+        colonnes_tri: dict,
+        cle_primaire,
+        tri_defaut: Optional[str] = None,
+        ordre_defaut: str = "asc"
+    ) -> list:
+        """
+        Applique tri + keyset + limite à la requête et renvoie la page
+
+        Args:
+            query: Requête SQLAlchemy déjà filtrée
+            colonnes_tri: {nom exposé: colonne} autorisés pour ?tri= (colonnes NOT NULL
+                indexées avec la clé primaire: un NULL dans le curseur arrêterait la pagination)
+            cle_primaire: Colonne unique servant de départage (et de tri par défaut)
+            tri_defaut: Nom de la colonne de tri par défaut (première de colonnes_tri sinon)
+            ordre_defaut: "asc" ou "desc"
+
+        Returns:
+            Les éléments de la page; l'en-tête X-Next-Cursor est posé s'il en reste
+        """
+        tri = self.tri or tri_defaut or next(iter(colonnes_tri))
+        if tri not in colonnes_tri:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Tri '{tri}' non supporté. Valeurs possibles: {', '.join(colonnes_tri)}"
+            )
+        colonne = colonnes_tri[tri]
+        descendant = (self.ordre or ordre_defaut) == "desc"
+
+        if self.cursor:
+            tri_curseur, valeur_tri, valeur_id = decoder_curseur(self.cursor)
+            if tri_curseur != tri:
+                raise HTTPException(status_code=400, detail="Curseur incompatible avec le tri demandé")
+            if colonne is cle_primaire:
+                query = query.filter(cle_primaire < valeur_id if descendant else cle_primaire > valeur_id)
+            elif descendant:
+                query = query.filter(or_(
+                    colonne < valeur_tri,
+                    and_(colonne == valeur_tri, cle_primaire < valeur_id)
+                ))
+            else:
+                query = query.filter(or_(
+                    colonne > valeur_tri,
+                    and_(colonne == valeur_tri, cle_primaire > valeur_id)
+                ))
+
+        ordres = [colonne.desc() if descendant else colonne.asc()]
+        if colonne is not cle_primaire:
+            ordres.append(cle_primaire.desc() if descendant else cle_primaire.asc())
+
+        elements = query.order_by(*ordres).limit(self.limit + 1).all()
+
+        if len(elements) > self.limit:
+            elements = elements[:self.limit]
+            dernier = elements[-1]
+            self.response.headers[HEADER_CURSEUR_SUIVANT] = encoder_curseur(
+                tri,
+                getattr(dernier, colonne.key),
+                getattr(dernier, cle_primaire.key)
+            )
+
+        return elements
@@ -0,0 +1,331 @@
+"""
+Cache des PDF (bons de commande / livraison) adressé par contenu
+
+Clé = (type de document, id) + empreinte du snapshot (les lignes qui alimentent
+le document). L'empreinte sert aussi d'ETag: un client qui renvoie If-None-Match
+reçoit 304 sans rendu ni transfert. Les rendus manquants passent par un pool de
+workers borné (PDF_RENDU_WORKERS) pour ne pas monopoliser les workers de l'API.
+Les lots (impression de dizaines de bons) sont rendus dans un pool de processus
+(PDF_LOT_PROCESSUS) et renvoyés en un PDF fusionné ou en ZIP streamé.
+
+Ce module n'importe pas ReportLab: le rendu (services/pdf_service.py) n'est
+chargé qu'au premier cache miss.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+from fastapi import Request, Response
+
+logger = logging.getLogger(__name__)
+
+PDF_CACHE_MAX_ENTREES = int(os.getenv("PDF_CACHE_MAX_ENTREES", "256"))
+PDF_CACHE_MAX_MO = int(os.getenv("PDF_CACHE_MAX_MO", "64"))
+PDF_RENDU_WORKERS = int(os.getenv("PDF_RENDU_WORKERS", "2"))
+# Rendu des lots: nombre de processus PAR WORKER uvicorn (0 = pool de threads ci-dessus).
+# Chaque worker a son pool: N workers x PDF_LOT_PROCESSUS processus au total.
+# Par défaut, les CPU sont partagés entre les WEB_CONCURRENCY workers (--workers).
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+PDF_LOT_PROCESSUS = int(os.getenv(
+    "PDF_LOT_PROCESSUS", str(max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))
+))
+PDF_LOT_MAX_DOCUMENTS = int(os.getenv("PDF_LOT_MAX_DOCUMENTS", "500"))
+
+TYPES_DOCUMENTS = ("commande", "livraison")
+
+
+def empreinte_snapshot(snapshot: dict) -> str:
+    """SHA-256 (tronquée) du snapshot sérialisé de façon canonique"""
+    contenu = json.dumps(snapshot, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(contenu.encode()).hexdigest()[:32]
+
+
+def etag(type_document: str, id_document: int, empreinte: str) -> str:
+    return f'"{type_document}-{id_document}-{empreinte}"'
+
+
+def etag_correspond(request: Request, valeur_etag: str) -> bool:
+    """If-None-Match contient-il l'ETag courant (formes faibles et * acceptées)"""
+    entete = request.headers.get("if-none-match")
+    if not entete:
+        return False
+    for candidat in entete.split(","):
+        candidat = candidat.strip()
+        if candidat.startswith("W/"):
+            candidat = candidat[2:]
+        if candidat in ("*", valeur_etag):
+            return True
+    return False
+
+
+class PDFCache:
+    """
+    LRU borné en nombre d'entrées et en octets
+
+    Une seule version par document: une empreinte différente (données modifiées)
+    est un miss, et le nouveau rendu remplace l'ancien.
+    """
+
+    def __init__(self, max_entrees: int = PDF_CACHE_MAX_ENTREES, max_octets: int = PDF_CACHE_MAX_MO * 1024 * 1024):
+        self.max_entrees = max_entrees
+        self.max_octets = max_octets
+        self._lock = threading.Lock()
+        # (type, id) -> (empreinte, pdf, id_commande)
+        self._entries: OrderedDict = OrderedDict()
+        self._octets = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def get(self, type_document: str, id_document: int, empreinte: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get((type_document, id_document))
+            if entry is None or entry[0] != empreinte:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((type_document, id_document))
+            self.hits += 1
+            return entry[1]
+
+    def set(self, type_document: str, id_document: int, empreinte: str, pdf: bytes, id_commande: int) -> None:
+        with self._lock:
+            ancien = self._entries.pop((type_document, id_document), None)
+            if ancien is not None:
+                self._octets -= len(ancien[1])
+            if len(pdf) > self.max_octets:
+                return
+            self._entries[(type_document, id_document)] = (empreinte, pdf, id_commande)
+            self._octets += len(pdf)
+            while self._entries and (len(self._entries) > self.max_entrees or self._octets > self.max_octets):
+                _, (_, pdf_evince, _) = self._entries.popitem(last=False)
+                self._octets -= len(pdf_evince)
+
+    def invalider_commandes(self, ids_commandes: Iterable[int]) -> None:
+        """Retire les bons de ces commandes et les bons de livraison qui en dépendent"""
+        ids = set(ids_commandes)
+        if not ids:
+            return
+        with self._lock:
+            for cle in [c for c, (_, _, id_commande) in self._entries.items() if id_commande in ids]:
+                self._octets -= len(self._entries.pop(cle)[1])
+                self.invalidations += 1
+
+    def invalider(self, type_document: str, ids_documents: Iterable[int]) -> None:
+        with self._lock:
+            for id_document in ids_documents:
+                entry = self._entries.pop((type_document, id_document), None)
+                if entry is not None:
+                    self._octets -= len(entry[1])
+                    self.invalidations += 1
+
+    def compter_304(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._octets = 0
+            self.hits = self.misses = self.not_modified = self.invalidations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / total, 3) if total else None,
+                "entries": len(self._entries),
+                "octets": self._octets,
+                "rendus_en_cours": len(_rendus_en_cours),
+                "workers": PDF_RENDU_WORKERS,
+            }
+
+
+PDF_CACHE = PDFCache()
+
+
+def invalider_pdf_commandes(ids_commandes: Iterable[int]) -> None:
+    """À appeler après modification d'une commande ou de ses lignes"""
+    PDF_CACHE.invalider_commandes(ids_commandes)
+
+
+def invalider_pdf_livraisons(ids_livraisons: Iterable[int]) -> None:
+    """À appeler après modification d'une livraison"""
+    PDF_CACHE.invalider("livraison", ids_livraisons)
+
+
+# Pool de rendu borné + un seul rendu par (document, empreinte) à la fois
+_executor: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_rendus_lock = threading.Lock()
+_rendus_en_cours: dict = {}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=PDF_RENDU_WORKERS, thread_name_prefix="rendu-pdf")
+    return _executor
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """Pool de processus (spawn: sûr malgré les threads du scheduler et du serveur)"""
+    global _process_pool
+    if _process_pool is None:
+        with _executor_lock:
+            if _process_pool is None:
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=PDF_LOT_PROCESSUS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"🖨️ Pool de rendu PDF: {PDF_LOT_PROCESSUS} processus")
+    return _process_pool
+
+
+def arreter_pools() -> None:
+    """Arrête les pools de rendu (arrêt de l'application)"""
+    global _executor, _process_pool
+    with _executor_lock:
+        for pool in (_executor, _process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        _executor = _process_pool = None
+
+
+def _rendre(type_document: str, snapshot: dict) -> bytes:
+    from services.pdf_service import PDFService
+    if type_document == "commande":
+        return PDFService.rendre_bon_commande(snapshot)
+    return PDFService.rendre_bon_livraison(snapshot)
+
+
+def soumettre_rendu(type_document: str, id_document: int, empreinte: str, snapshot: dict) -> Future:
+    """
+    Planifie le rendu dans le pool (ou rejoint un rendu identique en cours)
+
+    Le PDF est mis en cache à la fin du rendu.
+    """
+    cle = (type_document, id_document, empreinte)
+    with _rendus_lock:
+        future = _rendus_en_cours.get(cle)
+        if future is not None:
+            return future
+        future = _get_executor().submit(_rendre, type_document, snapshot)
+        _rendus_en_cours[cle] = future
+
+    def terminer(f: Future):
+        with _rendus_lock:
+            _rendus_en_cours.pop(cle, None)
+        if f.exception() is None:
+            PDF_CACHE.set(type_document, id_document, empreinte, f.result(), snapshot["id_commande"])
+        else:
+            logger.error(f"❌ Rendu PDF {type_document} {id_document} échoué: {f.exception()}")
+
+    future.add_done_callback(terminer)
+    return future
+
+
+async def servir_pdf(request: Request, type_document: str, id_document: int, snapshot: dict, filename: str) -> Response:
+    """
+    Réponse HTTP d'un document: 304 si l'ETag correspond, cache sinon, rendu en dernier recours
+    """
+    empreinte = empreinte_snapshot(snapshot)
+    valeur_etag = etag(type_document, id_document, empreinte)
+    headers = {"ETag": valeur_etag, "Cache-Control": "private, no-cache"}
+
+    if etag_correspond(request, valeur_etag):
+        PDF_CACHE.compter_304()
+        return Response(status_code=304, headers=headers)
+
+    pdf = PDF_CACHE.get(type_document, id_document, empreinte)
+    if pdf is None:
+        pdf = await asyncio.wrap_future(soumettre_rendu(type_document, id_document, empreinte, snapshot))
+
+    headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return Response(content=pdf, media_type="application/pdf", headers=headers)
+
+
+def rendre_documents(type_document: str, cle_id: str, snapshots: list[dict]) -> Iterator[bytes]:
+    """
+    PDF d'un lot de documents, dans l'ordre des snapshots
+
+    Les documents en cache sont réutilisés; les autres sont soumis d'un coup au
+    pool de processus (tous les cœurs) puis mis en cache au fil des résultats.
+    """
+    pool = _get_process_pool() if PDF_LOT_PROCESSUS > 0 else _get_executor()
+    empreintes = [empreinte_snapshot(snapshot) for snapshot in snapshots]
+    pdfs = [PDF_CACHE.get(type_document, snapshot[cle_id], empreinte)
+            for snapshot, empreinte in zip(snapshots, empreintes)]
+    futures = {
+        i: pool.submit(_rendre, type_document, snapshot)
+        for i, (snapshot, pdf) in enumerate(zip(snapshots, pdfs)) if pdf is None
+    }
+    try:
+        for i, snapshot in enumerate(snapshots):
+            pdf = pdfs[i]
+            if pdf is None:
+                pdf = futures.pop(i).result()
+                PDF_CACHE.set(type_document, snapshot[cle_id], empreintes[i], pdf, snapshot["id_commande"])
+            yield pdf
+    finally:
+        # Client parti en cours de flux: ne pas rendre le reste pour rien
+        for future in futures.values():
+            future.cancel()
+
+
+def fusionner_pdfs(pdfs: Iterable[bytes]) -> bytes:
+    """Concatène des PDF en un seul document (impression en une fois)"""
+    from pypdf import PdfWriter
+    writer = PdfWriter()
+    for pdf in pdfs:
+        writer.append(io.BytesIO(pdf))
+    sortie = io.BytesIO()
+    writer.write(sortie)
+    return sortie.getvalue()
+
+
+class _TamponZip(io.RawIOBase):
+    """Flux non seekable: zipfile y écrit, on vide au fil des fichiers"""
+
+    def __init__(self):
+        self._morceaux = []
+
+    def writable(self):
+        return True
+
+    def write(self, donnees):
+        self._morceaux.append(bytes(donnees))
+        return len(donnees)
+
+    def vider(self) -> bytes:
+        contenu = b"".join(self._morceaux)
+        self._morceaux.clear()
+        return contenu
+
+
+def flux_zip(fichiers: Iterable[tuple[str, bytes]]) -> Iterator[bytes]:
+    """ZIP streamé: chaque PDF est envoyé dès qu'il est rendu"""
+    tampon = _TamponZip()
+    # Les PDF sont déjà compressés: ZIP_STORED évite de recompresser pour rien
+    with zipfile.ZipFile(tampon, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for nom, pdf in fichiers:
+            archive.writestr(nom, pdf)
+            yield tampon.vider()
+    yield tampon.vider()
@@ -1,6 +1,11 @@
 """
 Service de génération PDF pour bons de commande et bons de livraison
 Utilise ReportLab pour créer des PDFs professionnels
+
+Deux étapes séparées:
+- snapshot_*: lecture des lignes qui alimentent le document (dict sérialisable,
+  dont l'empreinte sert de clé de cache et d'ETag, cf. services/pdf_cache.py)
+- rendre_*: mise en page ReportLab à partir du snapshot, sans accès base
 """
 
 import base64
@@ -9,6 +14,7 @@ import urllib.request
 from functools import lru_cache
 from io import BytesIO
 from datetime import datetime
+from typing import Optional
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
@@ -19,8 +25,84 @@ from reportlab.graphics.barcode import qr
 from reportlab.graphics.shapes import Drawing
 from svglib.svglib import svg2rlg
 
-from database import SessionLocal
-from models.model import Commande, Livraison, LigneCommande
+from sqlalchemy.orm import Session
+
+from models.model import Commande, Client, Utilisateur, Livraison, LigneCommande, Produit
+
+
+@lru_cache(maxsize=1)
+def _styles():
+    """Feuille de styles construite une seule fois par processus"""
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        'FarmName',
+        parent=styles['Heading1'],
+        fontSize=16,
+        textColor=colors.HexColor('#2C5F2D'),
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    ))
+    styles.add(ParagraphStyle(
+        'DocType',
+        parent=styles['Heading2'],
+        fontSize=13,
+        textColor=colors.HexColor('#666666'),
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    ))
+    styles.add(ParagraphStyle(
+        'DocRef',
+        parent=styles['Normal'],
+        fontSize=9,
+        textColor=colors.HexColor('#444444'),
+        alignment=TA_CENTER
+    ))
+    styles.add(ParagraphStyle(
+        'Footer',
+        parent=styles['Normal'],
+        fontSize=9,
+        textColor=colors.grey,
+        alignment=TA_CENTER
+    ))
+    return styles
+
+
+# Styles des tableaux (identiques d'un document à l'autre)
+STYLE_TABLE_INFO = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F0F0F0')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+])
+STYLE_TABLE_CLIENT = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F0F0F0')),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey)
+])
+STYLE_TABLE_TRANSPORT = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey)
+])
+STYLE_TABLE_LIGNES = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2C5F2D')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+    ('TOPPADDING', (0, 0), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#F0F0F0')),
+    ('FONTNAME', (2, -1), (-1, -1), 'Helvetica-Bold'),
+])
 
 
 class PDFService:
@@ -108,32 +190,11 @@ class PDFService:
         farm_name: str = "FERME MOKPOKPO"
     ) -> list:
         """Crée l'en-tête du document avec logo et QR code si disponibles"""
-        styles = getSampleStyleSheet()
+        styles = _styles()
         elements = []
-
-        farm_style = ParagraphStyle(
-            'FarmName',
-            parent=styles['Heading1'],
-            fontSize=16,
-            textColor=colors.HexColor('#2C5F2D'),
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-        doc_style = ParagraphStyle(
-            'DocType',
-            parent=styles['Heading2'],
-            fontSize=13,
-            textColor=colors.HexColor('#666666'),
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-        ref_style = ParagraphStyle(
-            'DocRef',
-            parent=styles['Normal'],
-            fontSize=9,
-            textColor=colors.HexColor('#444444'),
-            alignment=TA_CENTER
-        )
+        farm_style = styles['FarmName']
+        doc_style = styles['DocType']
+        ref_style = styles['DocRef']
 
         center_block = [
             Paragraph(farm_name, farm_style),
@@ -169,14 +230,7 @@ class PDFService:
     @staticmethod
     def _create_footer(doc_date: datetime) -> list:
         """Crée le pied de page"""
-        styles = getSampleStyleSheet()
-        footer_style = ParagraphStyle(
-            'Footer',
-            parent=styles['Normal'],
-            fontSize=9,
-            textColor=colors.grey,
-            alignment=TA_CENTER
-        )
+        footer_style = _styles()['Footer']
         
         return [
             Spacer(1, 0.3*inch),
@@ -188,288 +242,324 @@ class PDFService:
         ]
     
     @staticmethod
-    def generate_bon_commande(commande_id: int) -> BytesIO:
+    def _snapshot_lignes(db: Session, ids_commandes: list[int]) -> dict[int, list[dict]]:
+        """Lignes (avec nom de produit) de plusieurs commandes en une requête"""
+        lignes = {id_commande: [] for id_commande in ids_commandes}
+        if not lignes:
+            return lignes
+        rows = db.query(
+            LigneCommande.id_commande,
+            LigneCommande.id_ligne_commande,
+            LigneCommande.id_produit,
+            Produit.nom_produit,
+            LigneCommande.quantite,
+            LigneCommande.prix_unitaire,
+            LigneCommande.montant_ligne,
+        ).outerjoin(
+            Produit, LigneCommande.id_produit == Produit.id_produit
+        ).filter(
+            LigneCommande.id_commande.in_(list(lignes))
+        ).order_by(LigneCommande.id_commande, LigneCommande.id_ligne_commande).all()
+        for row in rows:
+            lignes[row.id_commande].append({
+                "id_ligne": row.id_ligne_commande,
+                "produit_nom": row.nom_produit if row.nom_produit is not None else f"Produit {row.id_produit}",
+                "quantite": row.quantite,
+                "prix_unitaire": row.prix_unitaire,
+                "montant_ligne": row.montant_ligne,
+            })
+        return lignes
+
+    @staticmethod
+    def snapshot_bon_commande(db: Session, commande_id: int) -> dict:
         """
-        Génère un bon de commande en PDF
+        Données d'un bon de commande (2 requêtes)
+        
+        Raises:
+            ValueError: Commande introuvable
+        """
+        row = db.query(
+            Commande.id_commande,
+            Commande.id_client,
+            Commande.date_commande,
+            Commande.statut,
+            Commande.montant_total,
+            Client.telephone,
+            Client.adresse,
+            Utilisateur.prenom,
+            Utilisateur.nom,
+            Utilisateur.email,
+        ).outerjoin(
+            Client, Commande.id_client == Client.id_client
+        ).outerjoin(
+            Utilisateur, Client.id_utilisateur == Utilisateur.id_utilisateur
+        ).filter(Commande.id_commande == commande_id).first()
+        if not row:
+            raise ValueError(f"Commande {commande_id} non trouvée")
+
+        return {
+            "id_commande": row.id_commande,
+            "id_client": row.id_client,
+            "date_commande": row.date_commande,
+            "statut": f"{row.statut}",
+            "montant_total": row.montant_total,
+            "client": {
+                "prenom": row.prenom,
+                "nom": row.nom,
+                "email": row.email,
+                "telephone": row.telephone,
+                "adresse": row.adresse,
+            } if row.email is not None else None,
+            "lignes": PDFService._snapshot_lignes(db, [commande_id])[commande_id],
+        }
+
+    @staticmethod
+    def snapshot_bon_livraison(db: Session, livraison_id: int) -> dict:
+        """
+        Données d'un bon de livraison (2 requêtes)
+        
+        Raises:
+            ValueError: Livraison introuvable
+        """
+        snapshots = PDFService.snapshots_bons_livraison(db, ids_livraisons=[livraison_id])
+        if not snapshots:
+            raise ValueError(f"Livraison {livraison_id} non trouvée")
+        return snapshots[0]
+
+    @staticmethod
+    def snapshots_bons_livraison(
+        db: Session,
+        ids_livraisons: Optional[list[int]] = None,
+        statut: Optional[str] = None,
+        limite: Optional[int] = None
+    ) -> list[dict]:
+        """
+        Données de plusieurs bons de livraison en 2 requêtes (livraisons + lignes)
         
         Args:
-            commande_id: ID de la commande
+            ids_livraisons: Livraisons demandées (toutes si None)
+            statut: Filtre sur le statut de livraison
+            limite: Nombre maximum de livraisons lues
             
         Returns:
-            BytesIO: Document PDF en mémoire
+            Snapshots triés par id_livraison
         """
-        db = SessionLocal()
-        try:
-            # Récupérer les données
-            commande = db.query(Commande).filter(Commande.id_commande == commande_id).first()
-            if not commande:
-                raise ValueError(f"Commande {commande_id} non trouvée")
-            
-            client = commande.client
-            utilisateur = client.utilisateur if client else None
-            lignes = db.query(LigneCommande).filter(LigneCommande.id_commande == commande_id).all()
-            
-            # Créer le PDF en mémoire
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(
-                buffer,
-                pagesize=PDFService.PAGE_SIZE,
-                rightMargin=PDFService.MARGIN,
-                leftMargin=PDFService.MARGIN,
-                topMargin=PDFService.MARGIN,
-                bottomMargin=PDFService.MARGIN
-            )
-            
-            elements = []
-            styles = getSampleStyleSheet()
-            
-            # En-tête
-            qr_data = "\n".join([
-                "TYPE: BON_COMMANDE",
-                f"COMMANDE: CMD-{commande_id:06d}",
-                f"DATE: {commande.date_commande.strftime('%d/%m/%Y')}",
-                f"CLIENT: {utilisateur.prenom} {utilisateur.nom}" if utilisateur else "CLIENT: N/A",
-                f"EMAIL: {utilisateur.email}" if utilisateur else "EMAIL: N/A",
-                f"TOTAL: {commande.montant_total:.2f}"
-            ])
-            elements.extend(PDFService._create_header(
-                "BON DE COMMANDE",
-                doc_ref=f"CMD-{commande_id:06d}",
-                qr_data=qr_data
-            ))
-            
-            # Informations principales
-            info_data = [
-                ["Numéro de commande:", f"CMD-{commande_id:06d}"],
-                ["Date de commande:", commande.date_commande.strftime("%d/%m/%Y")],
-                ["Statut:", f"{commande.statut}"],
-            ]
-            
-            info_table = Table(info_data, colWidths=[2*inch, 3*inch])
-            info_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F0F0F0')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-            ]))
-            elements.append(info_table)
-            elements.append(Spacer(1, 0.3*inch))
-            
-            # Infos client
-            elements.append(Paragraph("<b>Informations client:</b>", styles['Heading3']))
-            client_data = [
-                ["Nom:", f"{utilisateur.prenom} {utilisateur.nom}" if utilisateur else "N/A"],
-                ["Email:", utilisateur.email if utilisateur else "N/A"],
-                ["Téléphone:", client.telephone if client and client.telephone else "N/A"],
-                ["Adresse:", client.adresse if client and client.adresse else "N/A"],
-            ]
-            
-            client_table = Table(client_data, colWidths=[1.5*inch, 4*inch])
-            client_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F0F0F0')),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('TOPPADDING', (0, 0), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey)
-            ]))
-            elements.append(client_table)
-            elements.append(Spacer(1, 0.25*inch))
-            
-            # Détail des lignes
-            elements.append(Paragraph("<b>Articles commandés:</b>", styles['Heading3']))
-            
-            ligne_data = [["Produit", "Quantité", "Prix unitaire", "Montant"]]
-            for ligne in lignes:
-                produit_nom = ligne.produit.nom_produit if ligne.produit else f"Produit {ligne.id_produit}"
-                ligne_data.append([
-                    produit_nom or "N/A",
-                    str(ligne.quantite),
-                    f"{ligne.prix_unitaire:.2f} €",
-                    f"{ligne.montant_ligne:.2f} €"
-                ])
-            
-            # Ajouter la ligne totale
+        query = db.query(
+            Livraison.id_livraison,
+            Livraison.numero_livraison,
+            Livraison.statut,
+            Livraison.date_creation,
+            Livraison.date_livraison,
+            Livraison.adresse_livraison,
+            Livraison.transporteur,
+            Livraison.numero_suivi,
+            Livraison.notes,
+            Commande.id_commande,
+            Commande.id_client,
+            Utilisateur.prenom,
+            Utilisateur.nom,
+        ).join(
+            Commande, Livraison.id_commande == Commande.id_commande
+        ).outerjoin(
+            Client, Commande.id_client == Client.id_client
+        ).outerjoin(
+            Utilisateur, Client.id_utilisateur == Utilisateur.id_utilisateur
+        )
+        if ids_livraisons is not None:
+            query = query.filter(Livraison.id_livraison.in_(ids_livraisons))
+        if statut:
+            query = query.filter(Livraison.statut == statut)
+        query = query.order_by(Livraison.id_livraison)
+        if limite is not None:
+            query = query.limit(limite)
+        rows = query.all()
+
+        lignes = PDFService._snapshot_lignes(db, [row.id_commande for row in rows])
+        return [
+            {
+                "id_livraison": row.id_livraison,
+                "numero_livraison": row.numero_livraison,
+                "id_commande": row.id_commande,
+                "id_client": row.id_client,
+                "statut": f"{row.statut}",
+                "date_creation": row.date_creation,
+                "date_livraison": row.date_livraison,
+                "adresse_livraison": row.adresse_livraison,
+                "transporteur": row.transporteur,
+                "numero_suivi": row.numero_suivi,
+                "notes": row.notes,
+                "client": {"prenom": row.prenom, "nom": row.nom} if row.nom is not None else None,
+                "lignes": lignes[row.id_commande],
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def _document(buffer: BytesIO) -> SimpleDocTemplate:
+        return SimpleDocTemplate(
+            buffer,
+            pagesize=PDFService.PAGE_SIZE,
+            rightMargin=PDFService.MARGIN,
+            leftMargin=PDFService.MARGIN,
+            topMargin=PDFService.MARGIN,
+            bottomMargin=PDFService.MARGIN
+        )
+
+    @staticmethod
+    def _table_lignes(lignes: list[dict], libelle_total: str, total) -> Table:
+        ligne_data = [["Produit", "Quantité", "Prix unitaire", "Montant"]]
+        for ligne in lignes:
             ligne_data.append([
-                "",
-                "",
-                "<b>TOTAL:</b>",
-                f"<b>{commande.montant_total:.2f} €</b>"
+                ligne["produit_nom"] or "N/A",
+                str(ligne["quantite"]),
+                f"{ligne['prix_unitaire']:.2f} €",
+                f"{ligne['montant_ligne']:.2f} €"
             ])
-            
-            ligne_table = Table(ligne_data)
-            ligne_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2C5F2D')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-                ('TOPPADDING', (0, 0), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#F0F0F0')),
-                ('FONTNAME', (2, -1), (-1, -1), 'Helvetica-Bold'),
-            ]))
-            elements.append(ligne_table)
-            
-            # Pied de page
-            elements.extend(PDFService._create_footer(datetime.now()))
-            
-            # Build PDF
-            doc.build(elements)
-            buffer.seek(0)
-            return buffer
-            
-        finally:
-            db.close()
-    
+        ligne_data.append(["", "", f"<b>{libelle_total}</b>", f"<b>{total:.2f} €</b>"])
+
+        ligne_table = Table(ligne_data)
+        ligne_table.setStyle(STYLE_TABLE_LIGNES)
+        return ligne_table
+
     @staticmethod
-    def generate_bon_livraison(livraison_id: int) -> BytesIO:
+    def rendre_bon_commande(snapshot: dict) -> bytes:
         """
-        Génère un bon de livraison en PDF
+        Met en page un bon de commande à partir de son snapshot
         
         Args:
-            livraison_id: ID de la livraison
+            snapshot: Résultat de snapshot_bon_commande
             
         Returns:
-            BytesIO: Document PDF en mémoire
+            bytes: Document PDF
         """
-        db = SessionLocal()
-        try:
-            # Récupérer les données
-            livraison = db.query(Livraison).filter(Livraison.id_livraison == livraison_id).first()
-            if not livraison:
-                raise ValueError(f"Livraison {livraison_id} non trouvée")
-            
-            commande = livraison.commande
-            client = commande.client
-            utilisateur = client.utilisateur if client else None
-            lignes = db.query(LigneCommande).filter(LigneCommande.id_commande == commande.id_commande).all()
-            
-            # Créer le PDF en mémoire
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(
-                buffer,
-                pagesize=PDFService.PAGE_SIZE,
-                rightMargin=PDFService.MARGIN,
-                leftMargin=PDFService.MARGIN,
-                topMargin=PDFService.MARGIN,
-                bottomMargin=PDFService.MARGIN
-            )
-            
-            elements = []
-            styles = getSampleStyleSheet()
-            
-            # En-tête
-            qr_data = "\n".join([
-                "TYPE: BON_LIVRAISON",
-                f"LIVRAISON: {livraison.numero_livraison}",
-                f"COMMANDE: CMD-{commande.id_commande:06d}",
-                f"STATUT: {livraison.statut}",
-                f"CLIENT: {utilisateur.prenom} {utilisateur.nom}" if utilisateur else "CLIENT: N/A",
-                f"SUIVI: {livraison.numero_suivi or 'N/A'}"
-            ])
-            elements.extend(PDFService._create_header(
-                "BON DE LIVRAISON",
-                doc_ref=livraison.numero_livraison,
-                qr_data=qr_data
-            ))
-            
-            # Informations principales
-            info_data = [
-                ["N° Livraison:", livraison.numero_livraison],
-                ["N° Commande:", f"CMD-{commande.id_commande:06d}"],
-                ["Date création:", livraison.date_creation.strftime("%d/%m/%Y")],
-                ["Statut:", f"{livraison.statut}"],
-            ]
-            
-            if livraison.date_livraison:
-                info_data.append(["Date livraison:", livraison.date_livraison.strftime("%d/%m/%Y")])
-            
-            info_table = Table(info_data, colWidths=[2*inch, 3*inch])
-            info_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F0F0F0')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-            ]))
-            elements.append(info_table)
-            elements.append(Spacer(1, 0.25*inch))
-            
-            # Infos de livraison
-            elements.append(Paragraph("<b>Adresse de livraison:</b>", styles['Heading3']))
-            elements.append(Paragraph(livraison.adresse_livraison or "N/A", styles['Normal']))
-            
-            if livraison.transporteur:
-                elements.append(Spacer(1, 0.15*inch))
-                elements.append(Paragraph("<b>Transporteur:</b>", styles['Heading3']))
-                transport_data = [
-                    ["Prestataire:", livraison.transporteur],
-                ]
-                if livraison.numero_suivi:
-                    transport_data.append(["Numéro suivi:", livraison.numero_suivi])
-                
-                transport_table = Table(transport_data, colWidths=[1.5*inch, 3.5*inch])
-                transport_table.setStyle(TableStyle([
-                    ('FONTSIZE', (0, 0), (-1, -1), 9),
-                    ('TOPPADDING', (0, 0), (-1, -1), 6),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey)
-                ]))
-                elements.append(transport_table)
+        commande_id = snapshot["id_commande"]
+        client = snapshot["client"]
+        styles = _styles()
+        buffer = BytesIO()
+        elements = []
+
+        # En-tête
+        qr_data = "\n".join([
+            "TYPE: BON_COMMANDE",
+            f"COMMANDE: CMD-{commande_id:06d}",
+            f"DATE: {snapshot['date_commande'].strftime('%d/%m/%Y')}",
+            f"CLIENT: {client['prenom']} {client['nom']}" if client else "CLIENT: N/A",
+            f"EMAIL: {client['email']}" if client else "EMAIL: N/A",
+            f"TOTAL: {snapshot['montant_total']:.2f}"
+        ])
+        elements.extend(PDFService._create_header(
+            "BON DE COMMANDE",
+            doc_ref=f"CMD-{commande_id:06d}",
+            qr_data=qr_data
+        ))
+
+        # Informations principales
+        info_table = Table([
+            ["Numéro de commande:", f"CMD-{commande_id:06d}"],
+            ["Date de commande:", snapshot["date_commande"].strftime("%d/%m/%Y")],
+            ["Statut:", snapshot["statut"]],
+        ], colWidths=[2*inch, 3*inch])
+        info_table.setStyle(STYLE_TABLE_INFO)
+        elements.append(info_table)
+        elements.append(Spacer(1, 0.3*inch))
+
+        # Infos client
+        elements.append(Paragraph("<b>Informations client:</b>", styles['Heading3']))
+        client_table = Table([
+            ["Nom:", f"{client['prenom']} {client['nom']}" if client else "N/A"],
+            ["Email:", client["email"] if client else "N/A"],
+            ["Téléphone:", client["telephone"] if client and client["telephone"] else "N/A"],
+            ["Adresse:", client["adresse"] if client and client["adresse"] else "N/A"],
+        ], colWidths=[1.5*inch, 4*inch])
+        client_table.setStyle(STYLE_TABLE_CLIENT)
+        elements.append(client_table)
+        elements.append(Spacer(1, 0.25*inch))
+
+        # Détail des lignes
+        elements.append(Paragraph("<b>Articles commandés:</b>", styles['Heading3']))
+        elements.append(PDFService._table_lignes(snapshot["lignes"], "TOTAL:", snapshot["montant_total"]))
+
+        # Pied de page
+        elements.extend(PDFService._create_footer(datetime.now()))
+
+        PDFService._document(buffer).build(elements)
+        return buffer.getvalue()
+
+    @staticmethod
+    def rendre_bon_livraison(snapshot: dict) -> bytes:
+        """
+        Met en page un bon de livraison à partir de son snapshot
+        
+        Args:
+            snapshot: Résultat de snapshot_bon_livraison
             
+        Returns:
+            bytes: Document PDF
+        """
+        client = snapshot["client"]
+        styles = _styles()
+        buffer = BytesIO()
+        elements = []
+
+        # En-tête
+        qr_data = "\n".join([
+            "TYPE: BON_LIVRAISON",
+            f"LIVRAISON: {snapshot['numero_livraison']}",
+            f"COMMANDE: CMD-{snapshot['id_commande']:06d}",
+            f"STATUT: {snapshot['statut']}",
+            f"CLIENT: {client['prenom']} {client['nom']}" if client else "CLIENT: N/A",
+            f"SUIVI: {snapshot['numero_suivi'] or 'N/A'}"
+        ])
+        elements.extend(PDFService._create_header(
+            "BON DE LIVRAISON",
+            doc_ref=snapshot["numero_livraison"],
+            qr_data=qr_data
+        ))
+
+        # Informations principales
+        info_data = [
+            ["N° Livraison:", snapshot["numero_livraison"]],
+            ["N° Commande:", f"CMD-{snapshot['id_commande']:06d}"],
+            ["Date création:", snapshot["date_creation"].strftime("%d/%m/%Y")],
+            ["Statut:", snapshot["statut"]],
+        ]
+        if snapshot["date_livraison"]:
+            info_data.append(["Date livraison:", snapshot["date_livraison"].strftime("%d/%m/%Y")])
+
+        info_table = Table(info_data, colWidths=[2*inch, 3*inch])
+        info_table.setStyle(STYLE_TABLE_INFO)
+        elements.append(info_table)
+        elements.append(Spacer(1, 0.25*inch))
+
+        # Infos de livraison
+        elements.append(Paragraph("<b>Adresse de livraison:</b>", styles['Heading3']))
+        elements.append(Paragraph(snapshot["adresse_livraison"] or "N/A", styles['Normal']))
+
+        if snapshot["transporteur"]:
+            elements.append(Spacer(1, 0.15*inch))
+            elements.append(Paragraph("<b>Transporteur:</b>", styles['Heading3']))
+            transport_data = [["Prestataire:", snapshot["transporteur"]]]
+            if snapshot["numero_suivi"]:
+                transport_data.append(["Numéro suivi:", snapshot["numero_suivi"]])
+
+            transport_table = Table(transport_data, colWidths=[1.5*inch, 3.5*inch])
+            transport_table.setStyle(STYLE_TABLE_TRANSPORT)
+            elements.append(transport_table)
+
+        elements.append(Spacer(1, 0.2*inch))
+
+        # Détail des produits
+        elements.append(Paragraph("<b>Produits livrés:</b>", styles['Heading3']))
+        total_montant = sum((ligne["montant_ligne"] for ligne in snapshot["lignes"]), 0)
+        elements.append(PDFService._table_lignes(snapshot["lignes"], "MONTANT TOTAL:", total_montant))
+
+        if snapshot["notes"]:
             elements.append(Spacer(1, 0.2*inch))
-            
-            # Détail des produits
-            elements.append(Paragraph("<b>Produits livrés:</b>", styles['Heading3']))
-            
-            produit_data = [["Produit", "Quantité", "Prix unitaire", "Montant"]]
-            total_montant = 0
-            for ligne in lignes:
-                produit_nom = ligne.produit.nom_produit if ligne.produit else f"Produit {ligne.id_produit}"
-                produit_data.append([
-                    produit_nom or "N/A",
-                    str(ligne.quantite),
-                    f"{ligne.prix_unitaire:.2f} €",
-                    f"{ligne.montant_ligne:.2f} €"
-                ])
-                total_montant += ligne.montant_ligne
-            
-            produit_data.append(["", "", "<b>MONTANT TOTAL:</b>", f"<b>{total_montant:.2f} €</b>"])
-            
-            produit_table = Table(produit_data)
-            produit_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2C5F2D')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-                ('TOPPADDING', (0, 0), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#F0F0F0')),
-                ('FONTNAME', (2, -1), (-1, -1), 'Helvetica-Bold'),
-            ]))
-            elements.append(produit_table)
-            
-            if livraison.notes:
-                elements.append(Spacer(1, 0.2*inch))
-                elements.append(Paragraph("<b>Remarques:</b>", styles['Heading3']))
-                elements.append(Paragraph(livraison.notes, styles['Normal']))
-            
-            # Pied de page
-            elements.extend(PDFService._create_footer(datetime.now()))
-            
-            # Build PDF
-            doc.build(elements)
-            buffer.seek(0)
-            return buffer
-            
-        finally:
-            db.close()
+            elements.append(Paragraph("<b>Remarques:</b>", styles['Heading3']))
+            elements.append(Paragraph(snapshot["notes"], styles['Normal']))
+
+        # Pied de page
+        elements.extend(PDFService._create_footer(datetime.now()))
+
+        PDFService._document(buffer).build(elements)
+        return buffer.getvalue()
@@ -1,12 +1,14 @@
 import os
-import joblib
-import numpy as np
-import pandas as pd
-import google.generativeai as genai
+import asyncio
+import hashlib
+import threading
+import time as time_module
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from models.model import Vente, Commande, LigneCommande, Produit, Stock
-from datetime import datetime, timedelta
+from services.ventes_journalieres_service import VentesJournalieresService
+from services.profilage_contexte import appel_profile
+from datetime import datetime, timedelta, date
 import json
 from pathlib import Path
 import logging
@@ -18,36 +20,317 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Configuration de Gemini
+# Les bibliothèques lourdes (joblib/sklearn, pandas, google.generativeai) sont
+# importées à la première utilisation: l'import du module reste instantané.
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    logger.info("✅ API Gemini configurée")
-else:
-    logger.warning("⚠️ GOOGLE_API_KEY non trouvée dans l'environnement")
-
-# Charger le modèle RandomForest
 MODEL_PATH = Path(__file__).parent.parent / "AI" / "modele_ventes.pkl"
-MODELE_ML = None
-if MODEL_PATH.exists():
+
+
+def _hash_fichier(path: Path) -> str | None:
+    """Empreinte SHA-256 (tronquée) d'un artefact, utilisée comme clé de cache"""
     try:
-        MODELE_ML = joblib.load(str(MODEL_PATH))
-        logger.info(f"✅ Modèle ML chargé depuis {MODEL_PATH}")
-        logger.info(f"   Type: {type(MODELE_ML).__name__}")
-    except Exception as e:
-        logger.error(f"❌ Erreur chargement modèle ML: {e}")
-else:
-    logger.error(f"❌ Fichier modèle ML introuvable: {MODEL_PATH}")
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for bloc in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(bloc)
+        return digest.hexdigest()[:16]
+    except OSError:
+        return None
+
+
+class ModeleML:
+    """
+    Chargement paresseux (thread-safe) du modèle RandomForest
+    
+    Le modèle est chargé au premier appel de get(), ou en arrière-plan par
+    prechauffer() au démarrage de l'application. etat() est exposé par /health.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._modele = None
+        self._hash = None
+        self._etat = "not_loaded"  # not_loaded, loading, loaded, missing, error
+
+    def get(self):
+        if self._etat in ("loaded", "missing", "error"):
+            return self._modele
+        with self._lock:
+            if self._etat in ("not_loaded", "loading"):
+                self._charger()
+        return self._modele
+
+    def _charger(self):
+        self._etat = "loading"
+        if not self.path.exists():
+            logger.error(f"❌ Fichier modèle ML introuvable: {self.path}")
+            self._etat = "missing"
+            return
+        try:
+            import joblib
+            debut = time_module.perf_counter()
+            self._modele = joblib.load(str(self.path))
+            self._hash = _hash_fichier(self.path)
+            self._etat = "loaded"
+            logger.info(f"✅ Modèle ML chargé depuis {self.path} ({time_module.perf_counter() - debut:.2f}s)")
+            logger.info(f"   Type: {type(self._modele).__name__}")
+        except Exception as e:
+            logger.error(f"❌ Erreur chargement modèle ML: {e}")
+            self._etat = "error"
+
+    @property
+    def hash(self) -> str | None:
+        return self._hash
+
+    def etat(self) -> str:
+        return self._etat
+
+
+MODELE = ModeleML(MODEL_PATH)
+
+_gemini_lock = threading.Lock()
+_gemini = None
+
+
+def get_gemini():
+    """Importe et configure google.generativeai à la première utilisation"""
+    global _gemini
+    if _gemini is None:
+        with _gemini_lock:
+            if _gemini is None:
+                import google.generativeai as genai
+                if GOOGLE_API_KEY:
+                    genai.configure(api_key=GOOGLE_API_KEY)
+                    logger.info("✅ API Gemini configurée")
+                else:
+                    logger.warning("⚠️ GOOGLE_API_KEY non trouvée dans l'environnement")
+                _gemini = genai
+    return _gemini
+
+
+def prechauffer():
+    """Charge le modèle ML et le client Gemini (appelé en tâche de fond au démarrage)"""
+    MODELE.get()
+    get_gemini()
+    import pandas  # noqa: F401  (utilisé par build_feature_matrix)
+
+
+# Durée de vie max d'une entrée du cache de prédictions (secondes)
+PREDICTION_CACHE_TTL = int(os.getenv("PREDICTION_CACHE_TTL", 3600))
+
+
+class PredictionCache:
+    """
+    Cache process-local des prédictions ML par produit.
+    
+    Clé: (hash de l'artefact modèle, jour calendaire). Une entrée expire au changement
+    de jour, après PREDICTION_CACHE_TTL secondes, ou partiellement quand un produit
+    est invalidé (validation de commande, mouvement de stock, vente...).
+    Dans ce dernier cas, seuls les produits invalidés sont recalculés.
+    """
+
+    def __init__(self, ttl_seconds: int = PREDICTION_CACHE_TTL):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: dict[tuple, dict] = {}
+        self._generation = 0
+        self._generation_globale = 0
+        self._generation_produit: dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.partial_hits = 0
+        self.invalidations = 0
+
+    def lookup(self, key: tuple) -> tuple[dict[int, dict], bool, int]:
+        """
+        Returns:
+            Tuple (predictions par produit encore valides, entrée complète?, génération lue)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["expires_at"] <= time_module.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry and entry["complete"]:
+                self.hits += 1
+            elif entry:
+                self.partial_hits += 1
+            else:
+                self.misses += 1
+            if not entry:
+                return {}, False, self._generation
+            return dict(entry["predictions"]), entry["complete"], self._generation
+
+    def store(self, key: tuple, predictions: dict[int, dict], generation: int) -> None:
+        """
+        Enregistre les prédictions calculées à partir de l'état lu à `generation`.
+        Les produits invalidés pendant le calcul ne sont pas conservés.
+        """
+        with self._lock:
+            if self._generation_globale > generation:
+                return
+            perimes = {
+                pid for pid in predictions
+                if self._generation_produit.get(pid, 0) > generation
+            }
+            previous = self._entries.get(key)
+            expires_at = previous["expires_at"] if previous else time_module.monotonic() + self.ttl_seconds
+            # Une seule clé active: les entrées d'un autre jour / modèle sont purgées
+            self._entries = {key: {
+                "predictions": {pid: p for pid, p in predictions.items() if pid not in perimes},
+                "complete": not perimes,
+                "expires_at": expires_at
+            }}
+
+    def invalidate(self, product_ids=None) -> None:
+        """Invalide les produits donnés (ou tout le cache si product_ids est None)"""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if product_ids is None:
+                self._generation_globale = self._generation
+                self._entries.clear()
+                return
+            for pid in product_ids:
+                self._generation_produit[pid] = self._generation
+            for entry in self._entries.values():
+                for pid in product_ids:
+                    entry["predictions"].pop(pid, None)
+                entry["complete"] = False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation_produit.clear()
+            self.hits = self.misses = self.partial_hits = self.invalidations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses + self.partial_hits
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "partial_hits": self.partial_hits,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / total, 3) if total else None,
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl_seconds,
+                "model_hash": MODELE.hash
+            }
+
+
+PREDICTION_CACHE = PredictionCache()
+
+# Recommandations Gemini
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-flash-latest")
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", 20))
+GEMINI_CACHE_TTL = int(os.getenv("GEMINI_CACHE_TTL", 6 * 3600))
+
+
+class RecommendationStore:
+    """
+    Mémorise les recommandations Gemini par empreinte des entrées du prompt
+    (top produits + historique 30 jours), ainsi que les appels en cours.
+    Statuts: pending, ready, error.
+    """
+
+    MAX_ENTRIES = 128
+
+    def __init__(self, ttl_seconds: int = GEMINI_CACHE_TTL):
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[str, dict] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def get(self, key: str) -> dict | None:
+        entry = self._entries.get(key)
+        if entry and entry["expires_at"] <= time_module.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def task(self, key: str) -> asyncio.Task | None:
+        task = self._tasks.get(key)
+        return task if task and not task.done() else None
+
+    def start(self, key: str, coro) -> asyncio.Task:
+        """Lance l'appel en tâche de fond (une seule tâche par clé)"""
+        existing = self.task(key)
+        if existing:
+            coro.close()
+            return existing
+        self._put(key, {"status": "pending"})
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks[key] = task
+        task.add_done_callback(self._on_done(key))
+        return task
+
+    def _on_done(self, key: str):
+        def callback(task: asyncio.Task):
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+            if not task.cancelled():
+                task.exception()  # Évite "Task exception was never retrieved"
+        return callback
+
+    def set_result(self, key: str, result: dict) -> None:
+        self._put(key, {"status": "ready", "result": result})
+
+    def set_error(self, key: str, error: Exception) -> None:
+        message = str(error) or type(error).__name__
+        self._put(key, {"status": "error", "error": message}, ttl_seconds=60)
+
+    def _put(self, key: str, entry: dict, ttl_seconds: int | None = None) -> None:
+        if key not in self._entries and len(self._entries) >= self.MAX_ENTRIES:
+            self._entries.pop(next(iter(self._entries)))
+        entry["expires_at"] = time_module.monotonic() + (ttl_seconds or self.ttl_seconds)
+        self._entries[key] = entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tasks.clear()
+
+
+RECOMMENDATION_STORE = RecommendationStore()
+
+
+def invalider_predictions(product_ids=None) -> None:
+    """
+    À appeler après une écriture qui modifie les features d'un produit
+    (commande validée, stock, vente, ligne de commande, produit).
+    """
+    PREDICTION_CACHE.invalidate(product_ids)
+
+# Ordre des 15 features attendu par le modèle RandomForest
+FEATURES_ORDER = [
+    'product_id', 'product_type_enc', 'prix_unitaire', 'stock_initial',
+    'seuil_minimal', 'commandes_acceptees', 'reservations', 'day_of_week',
+    'is_weekend', 'is_holiday', 'lag_1_ventes', 'lag_2_ventes', 'lag_3_ventes',
+    'lag_7_ventes', 'rolling_mean_3'
+]
+
+# Décalages (en jours) utilisés pour les lags de ventes
+LAGS_JOURS = (1, 2, 3, 7)
+
 
 class PredictionService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, llm_client=None):
         self.db = db
-        self.model = MODELE_ML
+        self.model = MODELE.get()
+        # Client LLM exposant generate_content(prompt, request_options) -> objet avec .text
+        # (Gemini par défaut, injectable pour les tests)
+        self.llm_client = llm_client
+        self.gemini_timeout = GEMINI_TIMEOUT_SECONDS
         if self.model is None:
             logger.warning("⚠️ PredictionService initialisé SANS modèle ML")
         else:
             logger.debug("✅ PredictionService initialisé avec modèle ML")
 
+    def cache_key(self) -> tuple:
+        """Clé du cache de prédictions: artefact modèle + jour calendaire"""
+        model_key = MODELE.hash if self.model is MODELE.get() else f"model-{id(self.model)}"
+        return (model_key, date.today().isoformat())
+
     def get_historical_sales_data(self, days: int = 90):
         """
         Extrait les données de ventes agrégées par jour pour les 'days' derniers jours.
@@ -56,16 +339,10 @@ class PredictionService:
         try:
             start_date = datetime.now() - timedelta(days=days)
             
-            # Agrégation des ventes par jour
-            sales = self.db.query(
-                func.date(Vente.date_vente).label("date"),
-                func.sum(Vente.chiffre_affaires).label("total_ca")
-            ).filter(Vente.date_vente >= start_date)\
-             .group_by(func.date(Vente.date_vente))\
-             .order_by(func.date(Vente.date_vente))\
-             .all()
+            # Agrégation des ventes par jour (table vente_journaliere + jours non encore agrégés)
+            sales = VentesJournalieresService.historique_ca(self.db, start_date.date())
             
-            result = [{"date": str(s.date), "ca": float(s.total_ca)} for s in sales]
+            result = [{"date": str(jour), "ca": ca} for jour, ca in sales]
             logger.info(f"📈 {len(result)} jours d'historique récupérés")
             return result
         except Exception as e:
@@ -94,6 +371,61 @@ class PredictionService:
             logger.error(f"❌ Erreur récupération top produits: {e}")
             return []
 
+    def _quantites_vendues(self, product_ids: list[int], today: date) -> dict[int, dict]:
+        """
+        Quantités vendues pour chaque lag (J-1, J-2, J-3, J-7), lues dans l'agrégat
+        vente_produit_journaliere (et dans vente pour les jours pas encore agrégés).
+        
+        Returns:
+            Dictionnaire {id_produit: {lag: quantite}}
+        """
+        jours = {n: today - timedelta(days=n) for n in LAGS_JOURS}
+        quantites = VentesJournalieresService.quantites_produits(
+            self.db, list(jours.values()), product_ids
+        )
+        return {
+            pid: {n: quantites.get((pid, jour), 0) for n, jour in jours.items()}
+            for pid in product_ids
+        }
+
+    @staticmethod
+    def _build_features(produit: Produit, stock, commandes_prod, reservations,
+                        lags: dict, now: datetime) -> dict:
+        """
+        Assemble le dictionnaire des 15 features à partir des données déjà chargées.
+        Partagé entre le chemin unitaire et le chemin batch pour garantir des résultats identiques.
+        """
+        # Encodage type produit (simple hash)
+        product_type_enc = hash(produit.type_produit or "unknown") % 100
+        
+        # Données temporelles
+        day_of_week = now.weekday()
+        is_weekend = 1 if day_of_week >= 5 else 0
+        is_holiday = 0  # À implémenter avec calendar si besoin
+        
+        lag_1, lag_2, lag_3, lag_7 = (lags.get(n, 0) for n in LAGS_JOURS)
+        
+        # Moyenne mobile 3 jours
+        rolling_mean_3 = (lag_1 + lag_2 + lag_3) / 3 if any([lag_1, lag_2, lag_3]) else 0
+        
+        return {
+            "product_id": float(produit.id_produit),
+            "product_type_enc": float(product_type_enc),
+            "prix_unitaire": float(produit.prix_unitaire or 0),
+            "stock_initial": float(stock.quantite_disponible if stock else 0),
+            "seuil_minimal": float(stock.seuil_minimal if stock else 0),
+            "commandes_acceptees": float(commandes_prod),
+            "reservations": float(reservations),
+            "day_of_week": float(day_of_week),
+            "is_weekend": float(is_weekend),
+            "is_holiday": float(is_holiday),
+            "lag_1_ventes": float(lag_1),
+            "lag_2_ventes": float(lag_2),
+            "lag_3_ventes": float(lag_3),
+            "lag_7_ventes": float(lag_7),
+            "rolling_mean_3": float(rolling_mean_3)
+        }
+
     def prepare_features_for_product(self, product_id: int) -> dict:
         """
         Prépare les 15 features requises par le modèle RandomForest
@@ -110,9 +442,6 @@ class PredictionService:
             
             stock = self.db.query(Stock).filter(Stock.id_produit == product_id).first()
             
-            # Encodage type produit (simple hash)
-            product_type_enc = hash(produit.type_produit or "unknown") % 100
-            
             # Commandes acceptées pour ce produit
             commandes_prod = self.db.query(func.count(LigneCommande.id_ligne_commande)).join(
                 Commande, Commande.id_commande == LigneCommande.id_commande
@@ -126,54 +455,11 @@ class PredictionService:
                 LigneCommande.id_produit == product_id
             ).scalar() or 0
             
-            # Données temporelles
-            now = datetime.now()
-            day_of_week = now.weekday()
-            is_weekend = 1 if day_of_week >= 5 else 0
-            is_holiday = 0  # À implémenter avec calendar si besoin
-            
             # Lags de ventes (derniers 1, 2, 3, 7 jours)
-            today = datetime.now().date()
-            lag_1 = self.db.query(func.sum(Vente.quantite_vendue)).filter(
-                Vente.id_produit == product_id,
-                func.date(Vente.date_vente) == today - timedelta(days=1)
-            ).scalar() or 0
-            
-            lag_2 = self.db.query(func.sum(Vente.quantite_vendue)).filter(
-                Vente.id_produit == product_id,
-                func.date(Vente.date_vente) == today - timedelta(days=2)
-            ).scalar() or 0
-            
-            lag_3 = self.db.query(func.sum(Vente.quantite_vendue)).filter(
-                Vente.id_produit == product_id,
-                func.date(Vente.date_vente) == today - timedelta(days=3)
-            ).scalar() or 0
-            
-            lag_7 = self.db.query(func.sum(Vente.quantite_vendue)).filter(
-                Vente.id_produit == product_id,
-                func.date(Vente.date_vente) == today - timedelta(days=7)
-            ).scalar() or 0
-            
-            # Moyenne mobile 3 jours
-            rolling_mean_3 = np.mean([lag_1, lag_2, lag_3]) if any([lag_1, lag_2, lag_3]) else 0
+            now = datetime.now()
+            lags = self._quantites_vendues([product_id], now.date())[product_id]
             
-            features = {
-                "product_id": float(product_id),
-                "product_type_enc": float(product_type_enc),
-                "prix_unitaire": float(produit.prix_unitaire or 0),
-                "stock_initial": float(stock.quantite_disponible if stock else 0),
-                "seuil_minimal": float(stock.seuil_minimal if stock else 0),
-                "commandes_acceptees": float(commandes_prod),
-                "reservations": float(reservations),
-                "day_of_week": float(day_of_week),
-                "is_weekend": float(is_weekend),
-                "is_holiday": float(is_holiday),
-                "lag_1_ventes": float(lag_1),
-                "lag_2_ventes": float(lag_2),
-                "lag_3_ventes": float(lag_3),
-                "lag_7_ventes": float(lag_7),
-                "rolling_mean_3": float(rolling_mean_3)
-            }
+            features = self._build_features(produit, stock, commandes_prod, reservations, lags, now)
             
             logger.debug(f"✅ Features OK pour produit {product_id} ({produit.nom_produit})")
             return features
@@ -182,10 +468,81 @@ class PredictionService:
             logger.error(f"❌ Erreur préparation features pour produit {product_id}: {e}")
             return None
 
+    def prepare_features_batch(self, produits: list[Produit]) -> dict[int, dict]:
+        """
+        Prépare les features de plusieurs produits en un nombre constant de requêtes
+        (stocks, commandes acceptées, réservations, lags), au lieu de ~8 requêtes par produit.
+        
+        Produit exactement les mêmes valeurs que prepare_features_for_product.
+        
+        Returns:
+            Dictionnaire {id_produit: features}
+        """
+        if not produits:
+            return {}
+        
+        ids = [p.id_produit for p in produits]
+        logger.debug(f"🔧 Préparation features batch pour {len(ids)} produits")
+        
+        # Stocks
+        stocks = {
+            s.id_produit: s
+            for s in self.db.query(Stock).filter(Stock.id_produit.in_(ids)).all()
+        }
+        
+        # Commandes acceptées par produit
+        commandes = dict(
+            self.db.query(
+                LigneCommande.id_produit,
+                func.count(LigneCommande.id_ligne_commande)
+            ).join(
+                Commande, Commande.id_commande == LigneCommande.id_commande
+            ).filter(
+                LigneCommande.id_produit.in_(ids),
+                Commande.statut == "ACCEPTEE"
+            ).group_by(LigneCommande.id_produit).all()
+        )
+        
+        # Réservations par produit
+        reservations = dict(
+            self.db.query(
+                LigneCommande.id_produit,
+                func.count(LigneCommande.id_ligne_commande)
+            ).filter(
+                LigneCommande.id_produit.in_(ids)
+            ).group_by(LigneCommande.id_produit).all()
+        )
+        
+        # Lags: agrégat journalier + une requête SUM(CASE ...) pour les jours non agrégés
+        now = datetime.now()
+        lags = self._quantites_vendues(ids, now.date())
+        
+        return {
+            produit.id_produit: self._build_features(
+                produit,
+                stocks.get(produit.id_produit),
+                commandes.get(produit.id_produit, 0),
+                reservations.get(produit.id_produit, 0),
+                lags[produit.id_produit],
+                now
+            )
+            for produit in produits
+        }
+
+    @staticmethod
+    def build_feature_matrix(features_list: list[dict]):
+        """Construit la matrice de features (une ligne par produit) dans l'ordre du modèle"""
+        import pandas as pd
+        return pd.DataFrame(
+            [[f[name] for name in FEATURES_ORDER] for f in features_list],
+            columns=FEATURES_ORDER,
+            dtype=float
+        )
+
     def predict_sales_by_product(self):
         """
         Prédit les ventes pour tous les produits sur les 7 prochains jours
-        Utilise le modèle RandomForest
+        Utilise le modèle RandomForest (un seul appel predict pour tous les produits)
         """
         logger.info("🔮 Démarrage prédictions ML pour tous les produits")
         
@@ -194,43 +551,45 @@ class PredictionService:
             logger.error(f"❌ {error_msg}")
             return {"error": error_msg, "error_type": "ml_model_not_loaded"}
         
+        key = self.cache_key()
+        cached, complete, generation = PREDICTION_CACHE.lookup(key)
+        if complete:
+            logger.info(f"⚡ {len(cached)} prédictions servies depuis le cache")
+            return sorted(
+                (dict(p) for p in cached.values()),
+                key=lambda x: x['predicted_sales_7_days'],
+                reverse=True
+            )
+        
         try:
             produits = self.db.query(Produit).all()
-            logger.info(f"📊 {len(produits)} produits à analyser")
-            predictions = []
+            a_calculer = [p for p in produits if p.id_produit not in cached]
+            logger.info(
+                f"📊 {len(produits)} produits à analyser "
+                f"({len(produits) - len(a_calculer)} depuis le cache)"
+            )
             
-            for produit in produits:
-                features_dict = self.prepare_features_for_product(produit.id_produit)
-                if not features_dict:
-                    logger.warning(f"⏭️ Skip produit {produit.id_produit} (features manquantes)")
-                    continue
-                
-                # Construire le vecteur dans l'ordre des features du modèle
-                features_order = [
-                    'product_id', 'product_type_enc', 'prix_unitaire', 'stock_initial',
-                    'seuil_minimal', 'commandes_acceptees', 'reservations', 'day_of_week',
-                    'is_weekend', 'is_holiday', 'lag_1_ventes', 'lag_2_ventes', 'lag_3_ventes',
-                    'lag_7_ventes', 'rolling_mean_3'
-                ]
-                
-                X = np.array([[features_dict[f] for f in features_order]])
+            predictions_par_produit = {
+                p.id_produit: cached[p.id_produit]
+                for p in produits if p.id_produit in cached
+            }
+            if a_calculer:
+                features = self.prepare_features_batch(a_calculer)
+                X = self.build_feature_matrix([features[p.id_produit] for p in a_calculer])
+                preds = self.model.predict(X)
                 
-                try:
-                    pred_7_days = self.model.predict(X)[0]
-                    
-                    predictions.append({
+                for produit, pred_7_days in zip(a_calculer, preds):
+                    predictions_par_produit[produit.id_produit] = {
                         "product_id": produit.id_produit,
                         "nom_produit": produit.nom_produit,
                         "type_produit": produit.type_produit,
                         "prix_unitaire": float(produit.prix_unitaire),
                         "predicted_sales_7_days": round(float(pred_7_days), 2),
                         "confidence": "High"  # RandomForest a bonne confiance
-                    })
-                    
-                    logger.debug(f"   ✓ {produit.nom_produit}: {pred_7_days:.2f} unités prévues")
-                    
-                except Exception as e:
-                    logger.error(f"❌ Erreur prédiction produit {produit.id_produit}: {e}")
+                    }
+            
+            PREDICTION_CACHE.store(key, predictions_par_produit, generation)
+            predictions = [dict(p) for p in predictions_par_produit.values()]
             
             result = sorted(predictions, key=lambda x: x['predicted_sales_7_days'], reverse=True)
             logger.info(f"✅ {len(result)} prédictions générées avec succès")
@@ -241,16 +600,118 @@ class PredictionService:
             logger.error(f"❌ {error_msg}")
             return {"error": error_msg, "error_type": "prediction_failed"}
 
-    async def predict_sales(self):
+    @staticmethod
+    def _build_gemini_prompt(sales_data: list, top_3_products: list, total_predicted_sales: float) -> str:
+        """Construit le prompt Gemini à partir des données ML"""
+        return f"""
+Tu es un expert en gestion agricole et en supply chain pour une ferme.
+
+DONNÉES HISTORIQUES (30 derniers jours):
+{json.dumps(sales_data)}
+
+PRÉDICTIONS ML (RandomForest) - VENTES ATTENDUES 7 PROCHAINS JOURS:
+{json.dumps(top_3_products)}
+
+Total prévu 7 jours: {total_predicted_sales} unités
+
+En te basant sur ces données RÉELLES de prédiction ML, fournis moi:
+
+1. **Analyse des tendances**: Quels sont les patterns identifiés par le ML?
+2. **Recommandations de stock**: Devrait-on augmenter/diminuer le stock pour ces produits?
+3. **Stratégie de prix**: Y a-t-il des opportunités de prix dynamique?
+4. **Risques identifiés**: Quels produits risquent une rupture de stock?
+5. **Actions prioritaires**: 3 actions concrètes à prendre cette semaine
+
+Réponds en format JSON avec ces clés:
+{{
+  "trends_analysis": "paragraph concis",
+  "stock_recommendations": ["rec1", "rec2", "rec3"],
+  "pricing_strategy": "string",
+  "risk_assessment": ["risque1", "risque2"],
+  "priority_actions": ["action1", "action2", "action3"]
+}}
+"""
+
+    @staticmethod
+    def recommendations_key(sales_data: list, top_3_products: list, total_predicted_sales: float) -> str:
+        """Empreinte des entrées du prompt, utilisée pour mémoriser les réponses Gemini"""
+        payload = json.dumps(
+            {"history": sales_data, "top": top_3_products, "total": total_predicted_sales},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+    def _get_llm_client(self):
+        if self.llm_client is None:
+            self.llm_client = get_gemini().GenerativeModel(GEMINI_MODEL_NAME)
+        return self.llm_client
+
+    def _call_gemini(self, prompt: str) -> dict:
+        """Appel bloquant à Gemini + extraction du JSON (exécuté hors de l'event loop)"""
+        # Timeout transmis au client: wait_for n'arrête que l'attente, pas le thread
+        response = self._get_llm_client().generate_content(
+            prompt, request_options={"timeout": self.gemini_timeout}
+        )
+        
+        # Extraction du JSON
+        text = response.text
+        if "```json" in text:
+            text = text.split("```json")[1].split("```")[0].strip()
+        elif "```" in text:
+            text = text.split("```")[1].split("```")[0].strip()
+        
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            logger.debug(f"Raw response: {text[:200]}...")
+            raise
+
+    async def get_gemini_recommendations(self, key: str, prompt: str) -> dict:
+        """
+        Recommandations Gemini mémorisées par clé.
+        L'appel tourne dans un thread (asyncio.to_thread), l'event loop n'est
+        jamais bloqué. GEMINI_TIMEOUT_SECONDS borne l'attente (wait_for) et la
+        requête HTTP elle-même (request_options), qui libère donc le thread.
+        Les appels concurrents pour la même clé partagent la même tâche.
+        """
+        cached = RECOMMENDATION_STORE.get(key)
+        if cached and cached["status"] == "ready":
+            return cached["result"]
+        
+        task = RECOMMENDATION_STORE.task(key)
+        if task is None:
+            task = RECOMMENDATION_STORE.start(key, self._run_gemini(key, prompt))
+        return await asyncio.shield(task)
+
+    async def _run_gemini(self, key: str, prompt: str) -> dict:
+        logger.info("🤖 Appel API Gemini pour recommandations...")
+        try:
+            result = await asyncio.wait_for(
+                asyncio.to_thread(self._call_gemini, prompt),
+                timeout=self.gemini_timeout
+            )
+        except Exception as e:
+            RECOMMENDATION_STORE.set_error(key, e)
+            raise
+        RECOMMENDATION_STORE.set_result(key, result)
+        logger.info("✅ Recommandations Gemini reçues et parsées")
+        return result
+
+    async def predict_sales(self, defer_recommendations: bool = False):
         """
         Combine prédictions ML + recommandations Gemini
         1. RandomForest prédit les ventes par produit
         2. Gemini fournit des recommandations intelligentes
+        
+        Args:
+            defer_recommendations: si True, retourne immédiatement le bloc ML avec une clé
+                à interroger via GET /predictions/recommendations/{key}
         """
         logger.info("🚀 Démarrage prédiction complète (ML + Gemini)")
         
-        # Étape 1: Prédictions ML
-        ml_predictions = self.predict_sales_by_product()
+        # Étape 1: Prédictions ML (requêtes synchrones hors de l'event loop)
+        ml_predictions = await asyncio.to_thread(appel_profile, self.predict_sales_by_product)
         
         if isinstance(ml_predictions, dict) and "error" in ml_predictions:
             logger.error(f"❌ Échec ML: {ml_predictions.get('error')}")
@@ -267,100 +728,84 @@ class PredictionService:
         logger.info(f"📊 Total prévu 7 jours: {total_predicted_sales:.2f} unités")
         
         # Étape 3: Données pour Gemini
-        sales_data = self.get_historical_sales_data(days=30)
+        sales_data = await asyncio.to_thread(appel_profile, self.get_historical_sales_data, 30)
         
-        if not GOOGLE_API_KEY:
+        summary = {
+            "total_predicted_sales_7_days": round(total_predicted_sales, 2),
+            "top_products": top_3_products
+        }
+        
+        if not GOOGLE_API_KEY and self.llm_client is None:
             logger.warning("⚠️ API Gemini non configurée, retour ML seulement")
             return {
                 "ml_predictions": ml_predictions,
                 "summary": {
-                    "total_predicted_sales_7_days": round(total_predicted_sales, 2),
-                    "top_products": top_3_products,
+                    **summary,
                     "note": "Prédictions ML chargées (recommandations Gemini non disponibles)"
                 },
                 "timestamp": datetime.now().isoformat()
             }
         
         # Étape 4: Prompt pour Gemini avec données ML
-        prompt = f"""
-Tu es un expert en gestion agricole et en supply chain pour une ferme.
-
-DONNÉES HISTORIQUES (30 derniers jours):
-{json.dumps(sales_data)}
-
-PRÉDICTIONS ML (RandomForest) - VENTES ATTENDUES 7 PROCHAINS JOURS:
-{json.dumps(top_3_products)}
-
-Total prévu 7 jours: {total_predicted_sales} unités
-
-En te basant sur ces données RÉELLES de prédiction ML, fournis moi:
-
-1. **Analyse des tendances**: Quels sont les patterns identifiés par le ML?
-2. **Recommandations de stock**: Devrait-on augmenter/diminuer le stock pour ces produits?
-3. **Stratégie de prix**: Y a-t-il des opportunités de prix dynamique?
-4. **Risques identifiés**: Quels produits risquent une rupture de stock?
-5. **Actions prioritaires**: 3 actions concrètes à prendre cette semaine
-
-Réponds en format JSON avec ces clés:
-{{
-  "trends_analysis": "paragraph concis",
-  "stock_recommendations": ["rec1", "rec2", "rec3"],
-  "pricing_strategy": "string",
-  "risk_assessment": ["risque1", "risque2"],
-  "priority_actions": ["action1", "action2", "action3"]
-}}
-"""
+        key = self.recommendations_key(sales_data, top_3_products, total_predicted_sales)
+        prompt = self._build_gemini_prompt(sales_data, top_3_products, total_predicted_sales)
+        
+        if defer_recommendations:
+            cached = RECOMMENDATION_STORE.get(key)
+            if not cached or cached["status"] == "error":
+                RECOMMENDATION_STORE.start(key, self._run_gemini(key, prompt))
+                cached = RECOMMENDATION_STORE.get(key)
+            response = {
+                "ml_predictions": ml_predictions,
+                "summary": summary,
+                "recommendations_key": key,
+                "recommendations_status": cached["status"],
+                "recommendations_url": f"/predictions/recommendations/{key}",
+                "timestamp": datetime.now().isoformat()
+            }
+            if cached["status"] == "ready":
+                response["gemini_recommendations"] = cached["result"]
+            return response
         
         try:
-            logger.info("🤖 Appel API Gemini pour recommandations...")
-            model = genai.GenerativeModel('gemini-flash-latest')
-            response = model.generate_content(prompt)
-            
-            # Extraction du JSON
-            text = response.text
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0].strip()
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0].strip()
-            
-            gemini_recommendations = json.loads(text)
-            logger.info("✅ Recommandations Gemini reçues et parsées")
+            gemini_recommendations = await self.get_gemini_recommendations(key, prompt)
             
             return {
                 "ml_predictions": ml_predictions,
-                "summary": {
-                    "total_predicted_sales_7_days": round(total_predicted_sales, 2),
-                    "top_products": top_3_products
-                },
+                "summary": summary,
                 "gemini_recommendations": gemini_recommendations,
                 "timestamp": datetime.now().isoformat()
             }
             
         except json.JSONDecodeError as e:
             logger.error(f"❌ Erreur parsing JSON Gemini: {e}")
-            logger.debug(f"Raw response: {text[:200]}...")
             # Retourner les prédictions ML même si Gemini échoue
             return {
                 "ml_predictions": ml_predictions,
-                "summary": {
-                    "total_predicted_sales_7_days": round(total_predicted_sales, 2),
-                    "top_products": top_3_products
-                },
+                "summary": summary,
                 "gemini_error": f"JSON parsing failed: {str(e)}",
                 "error_type": "gemini_json_parse_error",
                 "note": "Prédictions ML disponibles, recommandations Gemini échouées",
                 "timestamp": datetime.now().isoformat()
             }
             
+        except asyncio.TimeoutError:
+            logger.error(f"❌ Timeout API Gemini ({self.gemini_timeout}s)")
+            return {
+                "ml_predictions": ml_predictions,
+                "summary": summary,
+                "gemini_error": f"Timeout après {self.gemini_timeout}s",
+                "error_type": "gemini_timeout",
+                "note": "Prédictions ML disponibles, recommandations Gemini échouées",
+                "timestamp": datetime.now().isoformat()
+            }
+            
         except Exception as e:
             logger.error(f"❌ Erreur API Gemini: {e}")
             # Retourner les prédictions ML même si Gemini échoue
             return {
                 "ml_predictions": ml_predictions,
-                "summary": {
-                    "total_predicted_sales_7_days": round(total_predicted_sales, 2),
-                    "top_products": top_3_products
-                },
+                "summary": summary,
                 "gemini_error": str(e),
                 "error_type": "gemini_api_error",
                 "note": "Prédictions ML disponibles, recommandations Gemini échouées",
@@ -0,0 +1,309 @@
+"""
+Profilage à la demande (administrateurs, PROFILAGE_ACTIF=true)
+
+- Par requête: en-tête `X-Profile: 1` ou paramètre `?profile=1` avec un token
+  ADMIN -> cProfile autour de l'endpoint, fichier .prof dans PROFILAGE_DOSSIER,
+  nom renvoyé dans l'en-tête X-Profile-Fichier
+- Échantillonnage: un thread relève les piles de tous les threads du worker à
+  intervalle fixe et écrit des piles "collapsed" (.folded, entrée de
+  flamegraph.pl / speedscope)
+
+cProfile ne suit que le thread qui l'active: le profil d'une requête est
+activé dans chaque thread qui exécute son code, un Profile par thread, fusionnés
+à l'écriture. L'endpoint est enveloppé (installer_profilage); le travail qu'il
+délègue à un thread passe par appel_profile (LectureDB.run, asyncio.to_thread
+des prédictions), défini avec le profil courant dans services.profilage_contexte
+pour que database.py l'importe sans charger ce module. Un endpoint async n'est
+profilé que pendant ses propres étapes, pas pendant celles des autres
+coroutines de la boucle.
+"""
+
+import functools
+import inspect
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+
+from schema.enums import RoleEnum
+from security.auth_cache import AUTH_CACHE, empreinte_token
+from security.jwt import decode_access_token
+from security.revocation import REVOCATIONS
+from services.profilage_contexte import ProfilRequete, _profil_courant, appel_profile
+
+logger = logging.getLogger(__name__)
+
+PROFILAGE_ACTIF = os.getenv("PROFILAGE_ACTIF", "false").lower() == "true"
+PROFILAGE_DOSSIER = os.getenv("PROFILAGE_DOSSIER", "profils")
+# Échantillonnage continu dès le démarrage du worker
+PROFILAGE_ECHANTILLONNAGE = os.getenv("PROFILAGE_ECHANTILLONNAGE", "false").lower() == "true"
+PROFILAGE_INTERVALLE_MS = int(os.getenv("PROFILAGE_INTERVALLE_MS", "10"))
+PROFILAGE_ECRITURE_SECONDES = int(os.getenv("PROFILAGE_ECRITURE_SECONDES", "60"))
+
+EN_TETE_DEMANDE = b"x-profile"
+EN_TETE_FICHIER = b"x-profile-fichier"
+
+def _nom_fichier(prefixe: str, extension: str, detail: str = "") -> str:
+    detail = re.sub(r"[^A-Za-z0-9_-]+", "_", detail).strip("_")
+    horodatage = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return f"{prefixe}-{os.getpid()}-{horodatage}{'-' + detail if detail else ''}.{extension}"
+
+
+def chemin_profil(nom: str) -> Optional[str]:
+    """Chemin d'un fichier de PROFILAGE_DOSSIER (None si le nom sort du dossier)"""
+    if os.path.basename(nom) != nom or not nom.endswith((".prof", ".folded")):
+        return None
+    return os.path.join(PROFILAGE_DOSSIER, nom)
+
+
+def lister_profils() -> list[dict]:
+    if not os.path.isdir(PROFILAGE_DOSSIER):
+        return []
+    fichiers = []
+    for nom in sorted(os.listdir(PROFILAGE_DOSSIER), reverse=True):
+        if chemin_profil(nom):
+            chemin = os.path.join(PROFILAGE_DOSSIER, nom)
+            fichiers.append({"fichier": nom, "octets": os.path.getsize(chemin)})
+    return fichiers
+
+
+# =====================================================
+# cProfile par requête
+# =====================================================
+# Un seul profil à la fois par worker (un seul profileur actif par thread)
+_verrou_profil = threading.Lock()
+
+
+class _CoroutineProfilee:
+    """
+    Exécute une coroutine en n'activant le profil que pendant ses propres
+    étapes: les autres coroutines servies par la boucle pendant un `await`
+    n'entrent pas dans le profil de la requête.
+    """
+
+    def __init__(self, coroutine, profil: ProfilRequete):
+        self.coroutine = coroutine
+        self.profil = profil
+
+    def __await__(self):
+        etapes = self.coroutine.__await__()
+        valeur, erreur = None, None
+        while True:
+            with self.profil.actif():
+                try:
+                    attente = etapes.throw(erreur) if erreur is not None else etapes.send(valeur)
+                except StopIteration as fin:
+                    return fin.value
+            valeur, erreur = None, None
+            try:
+                valeur = yield attente
+            except GeneratorExit:
+                etapes.close()
+                raise
+            except BaseException as exc:
+                erreur = exc
+
+
+def _envelopper(appel):
+    """Active le profil de la requête courante pendant l'exécution de l'endpoint"""
+    if inspect.iscoroutinefunction(appel):
+        @functools.wraps(appel)
+        async def enveloppe_async(*args, **kwargs):
+            profil = _profil_courant.get()
+            if profil is None:
+                return await appel(*args, **kwargs)
+            return await _CoroutineProfilee(appel(*args, **kwargs), profil)
+        enveloppe = enveloppe_async
+    else:
+        @functools.wraps(appel)
+        def enveloppe_sync(*args, **kwargs):
+            return appel_profile(appel, *args, **kwargs)
+        enveloppe = enveloppe_sync
+    enveloppe._profilage = True
+    return enveloppe
+
+
+def _envelopper_routes(routes) -> int:
+    nombre = 0
+    for route in routes:
+        # Routers inclus (résolus paresseusement par FastAPI à partir de route.endpoint)
+        sous_router = getattr(route, "original_router", None)
+        if sous_router is not None:
+            nombre += _envelopper_routes(sous_router.routes)
+        elif isinstance(route, APIRoute) and not getattr(route.endpoint, "_profilage", False):
+            route.endpoint = route.dependant.call = _envelopper(route.endpoint)
+            nombre += 1
+    return nombre
+
+
+def installer_profilage(app) -> int:
+    """
+    Enveloppe les endpoints de l'application (une fois toutes les routes
+    déclarées, avant la première requête). Sans profil demandé, l'enveloppe se
+    limite à la lecture d'une ContextVar.
+
+    Returns:
+        Nombre d'endpoints enveloppés
+    """
+    return _envelopper_routes(app.routes)
+
+
+def _est_admin(en_tetes: dict) -> bool:
+    schema, _, token = en_tetes.get(b"authorization", b"").decode("latin-1").partition(" ")
+    if schema.lower() != "bearer" or not token:
+        return False
+    contexte = AUTH_CACHE.get(empreinte_token(token))
+    if contexte is not None:
+        return contexte.role == RoleEnum.ADMIN and not REVOCATIONS.est_revoque(contexte.jti)
+    payload = decode_access_token(token)
+    return bool(payload) and payload.get("role") == RoleEnum.ADMIN and not REVOCATIONS.est_revoque(payload.get("jti"))
+
+
+class MiddlewareProfilage:
+    """Déclenche le profil cProfile d'une requête demandée par un administrateur"""
+
+    actif = PROFILAGE_ACTIF
+
+    def __init__(self, app):
+        self.app = app
+
+    def _demande(self, scope, en_tetes: dict) -> bool:
+        if en_tetes.get(EN_TETE_DEMANDE, b"") in (b"1", b"true"):
+            return True
+        parametres = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        return parametres.get("profile", [""])[0] in ("1", "true")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.actif:
+            await self.app(scope, receive, send)
+            return
+        en_tetes = dict(scope.get("headers") or [])
+        if not self._demande(scope, en_tetes) or not _est_admin(en_tetes):
+            await self.app(scope, receive, send)
+            return
+        if not _verrou_profil.acquire(blocking=False):
+            # Un autre profil est en cours: requête servie sans profil
+            await self.app(scope, receive, send)
+            return
+
+        profil = ProfilRequete()
+        nom = _nom_fichier("requete", "prof", f"{scope['method']}{scope['path']}")
+        jeton = _profil_courant.set(profil)
+
+        async def envoyer(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(EN_TETE_FICHIER, nom.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, envoyer)
+        finally:
+            _profil_courant.reset(jeton)
+            _verrou_profil.release()
+            os.makedirs(PROFILAGE_DOSSIER, exist_ok=True)
+            profil.ecrire(os.path.join(PROFILAGE_DOSSIER, nom))
+            logger.info(f"🔬 Profil de {scope['method']} {scope['path']} écrit dans {nom}")
+
+
+# =====================================================
+# Échantillonnage (piles collapsed)
+# =====================================================
+def _pile(frame) -> str:
+    noms = []
+    while frame is not None:
+        code = frame.f_code
+        noms.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(noms))
+
+
+class Echantillonneur:
+    """Thread qui relève les piles du worker toutes les PROFILAGE_INTERVALLE_MS"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._arret = threading.Event()
+        self._piles: Counter = Counter()
+        self.echantillons = 0
+        self.fichiers: list[str] = []
+
+    @property
+    def actif(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def demarrer(self, intervalle_ms: int = PROFILAGE_INTERVALLE_MS, duree: Optional[float] = None) -> bool:
+        """
+        Args:
+            duree: Arrêt automatique après `duree` secondes (None = jusqu'à arreter())
+
+        Returns:
+            False si un échantillonnage est déjà en cours
+        """
+        with self._lock:
+            if self.actif:
+                return False
+            self._arret.clear()
+            self._thread = threading.Thread(
+                target=self._boucle, args=(intervalle_ms / 1000, duree),
+                name="profilage-echantillonneur", daemon=True
+            )
+            self._thread.start()
+        logger.info(f"🔬 Échantillonnage démarré (toutes les {intervalle_ms} ms)")
+        return True
+
+    def arreter(self) -> Optional[str]:
+        """Arrête l'échantillonnage et écrit les piles restantes (nom du fichier)"""
+        self._arret.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5)
+        return self.fichiers[-1] if self.fichiers else None
+
+    def _boucle(self, intervalle: float, duree: Optional[float]):
+        moi = threading.get_ident()
+        fin = time.monotonic() + duree if duree else None
+        prochaine_ecriture = time.monotonic() + PROFILAGE_ECRITURE_SECONDES
+        while not self._arret.wait(intervalle):
+            for ident, frame in sys._current_frames().items():
+                if ident != moi:
+                    self._piles[_pile(frame)] += 1
+            self.echantillons += 1
+            maintenant = time.monotonic()
+            if fin is not None and maintenant >= fin:
+                break
+            if maintenant >= prochaine_ecriture:
+                self.ecrire()
+                prochaine_ecriture = maintenant + PROFILAGE_ECRITURE_SECONDES
+        self.ecrire()
+
+    def ecrire(self) -> Optional[str]:
+        """Écrit les piles accumulées depuis la dernière écriture (format collapsed)"""
+        piles, self._piles = self._piles, Counter()
+        if not piles:
+            return None
+        nom = _nom_fichier("echantillons", "folded")
+        os.makedirs(PROFILAGE_DOSSIER, exist_ok=True)
+        with open(os.path.join(PROFILAGE_DOSSIER, nom), "w") as fichier:
+            for pile, nombre in piles.most_common():
+                fichier.write(f"{pile} {nombre}\n")
+        self.fichiers.append(nom)
+        return nom
+
+    def stats(self) -> dict:
+        return {
+            "actif": self.actif,
+            "echantillons": self.echantillons,
+            "dernier_fichier": self.fichiers[-1] if self.fichiers else None
+        }
+
+
+ECHANTILLONNEUR = Echantillonneur()
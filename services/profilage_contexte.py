@@ -0,0 +1,72 @@
+"""
+Contexte du profilage par requête (bibliothèque standard uniquement)
+
+Importé par database.py et les services qui délèguent du travail à un thread:
+le profil de la requête courante (ContextVar) et appel_profile, sans charger
+le middleware, la sécurité ni FastAPI (voir services.profilage).
+"""
+
+import cProfile
+import pstats
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+
+class ProfilRequete:
+    """
+    Profil d'une requête: un cProfile.Profile par thread qui exécute du code
+    de la requête (boucle d'événements, threadpool), fusionnés à l'écriture
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # id du thread -> [Profile, profondeur d'activation]
+        self._profils: dict[int, list] = {}
+
+    @contextmanager
+    def actif(self):
+        """Active le profil dans le thread courant (réentrant)"""
+        ident = threading.get_ident()
+        with self._lock:
+            entree = self._profils.get(ident)
+            if entree is None:
+                entree = self._profils[ident] = [cProfile.Profile(), 0]
+            entree[1] += 1
+        if entree[1] == 1:
+            entree[0].enable()
+        try:
+            yield
+        finally:
+            if entree[1] == 1:
+                entree[0].disable()
+            with self._lock:
+                entree[1] -= 1
+
+    def ecrire(self, chemin: str) -> None:
+        stats = pstats.Stats()
+        with self._lock:
+            profils = [profil for profil, _ in self._profils.values()]
+        for profil in profils:
+            profil.create_stats()
+            if profil.stats:
+                stats.add(profil)
+        stats.dump_stats(chemin)
+
+
+_profil_courant: ContextVar[Optional[ProfilRequete]] = ContextVar("profil_requete", default=None)
+
+
+def appel_profile(fonction, *args, **kwargs):
+    """
+    Exécute fonction(*args, **kwargs) dans le profil de la requête courante
+
+    À utiliser pour le travail délégué à un thread (run_in_threadpool,
+    asyncio.to_thread): le contexte, et donc le profil, y est propagé.
+    """
+    profil = _profil_courant.get()
+    if profil is None:
+        return fonction(*args, **kwargs)
+    with profil.actif():
+        return fonction(*args, **kwargs)
@@ -0,0 +1,148 @@
+"""
+Réconciliation entre Stock.quantite_disponible et le journal des mouvements
+
+Stock.quantite_disponible est la projection du journal mouvement_stock (solde
+d'ouverture INITIAL, réceptions, déductions FEFO, ajustements, péremptions):
+c'est le journal qui fait foi, le solde d'ouverture d'un stock n'étant porté
+par aucun lot. Les deux peuvent diverger (écritures SQL directes sur stock,
+anciens triggers, incidents): ce service compare la projection au total du
+journal en une requête groupée, journalise les écarts et peut reprojeter.
+
+- Passage incrémental: seulement les produits ayant un mouvement de stock
+  depuis le filigrane du dernier passage (table reconciliation_stock)
+- Passage complet: tous les produits (rattrape les écritures hors journal)
+"""
+
+import logging
+from typing import Optional
+
+from sqlalchemy import case, select, func, update
+from sqlalchemy.orm import Session
+
+from models.model import Stock, MouvementStock, ReconciliationStock
+
+logger = logging.getLogger(__name__)
+
+
+class ReconciliationStockService:
+    """Comparaison Stock / journal, réparation et filigrane"""
+
+    @staticmethod
+    def comparer(
+        db: Session,
+        ids_produits: Optional[list[int]] = None,
+        verrouiller: bool = False
+    ) -> tuple[int, list[dict]]:
+        """
+        Compare stock et total du journal de chaque produit (une requête)
+
+        Args:
+            ids_produits: Produits à vérifier (tous si None)
+            verrouiller: FOR UPDATE sur les lignes stock (avant réparation)
+
+        Returns:
+            (nombre de produits vérifiés, écarts [{id_produit, quantite_stock, quantite_journal, ecart}])
+        """
+        totaux_journal = select(
+            MouvementStock.id_produit,
+            func.sum(MouvementStock.quantite).label("quantite_journal")
+        ).group_by(MouvementStock.id_produit)
+        if ids_produits is not None:
+            totaux_journal = totaux_journal.where(MouvementStock.id_produit.in_(ids_produits))
+        totaux_journal = totaux_journal.subquery()
+
+        query = select(
+            Stock.id_produit,
+            Stock.quantite_disponible,
+            func.coalesce(totaux_journal.c.quantite_journal, 0).label("quantite_journal")
+        ).outerjoin(
+            totaux_journal, totaux_journal.c.id_produit == Stock.id_produit
+        ).order_by(Stock.id_produit)
+        if ids_produits is not None:
+            query = query.where(Stock.id_produit.in_(ids_produits))
+        if verrouiller:
+            query = query.with_for_update(of=Stock)
+
+        rows = db.execute(query).all()
+        ecarts = [
+            {
+                "id_produit": row.id_produit,
+                "quantite_stock": row.quantite_disponible,
+                "quantite_journal": row.quantite_journal,
+                "ecart": row.quantite_disponible - row.quantite_journal,
+            }
+            for row in rows
+            if row.quantite_disponible != row.quantite_journal
+        ]
+        return len(rows), ecarts
+
+    @staticmethod
+    def reconcilier(db: Session, complet: bool = False, reparer: bool = False) -> dict:
+        """
+        Passage de réconciliation (incrémental par défaut), enregistré avec son filigrane
+
+        Args:
+            complet: Vérifier tous les produits au lieu des seuls produits modifiés
+            reparer: Reprojeter Stock sur le total du journal (sans nouveau mouvement)
+
+        Returns:
+            Rapport du passage
+        """
+        filigrane = db.scalar(
+            select(ReconciliationStock.id_dernier_mouvement)
+            .order_by(ReconciliationStock.id_reconciliation.desc())
+            .limit(1)
+        ) or 0
+        # Filigrane lu avant la comparaison: un mouvement concurrent sera revu au passage suivant
+        nouveau_filigrane = db.scalar(select(func.max(MouvementStock.id_mouvement))) or 0
+
+        ids_produits = None
+        if not complet:
+            ids_produits = list(db.scalars(
+                select(MouvementStock.id_produit).distinct()
+                .where(MouvementStock.id_mouvement > filigrane)
+            ))
+
+        produits_verifies, ecarts = (0, [])
+        if complet or ids_produits:
+            produits_verifies, ecarts = ReconciliationStockService.comparer(
+                db, ids_produits, verrouiller=reparer
+            )
+
+        for ecart in ecarts:
+            logger.warning(
+                f"⚠️ Écart stock produit {ecart['id_produit']}: "
+                f"stock={ecart['quantite_stock']}, journal={ecart['quantite_journal']}"
+            )
+
+        repares = 0
+        if reparer and ecarts:
+            # Le journal fait foi: un AJUSTEMENT le déplacerait avec la projection
+            attendus = {ecart["id_produit"]: ecart["quantite_journal"] for ecart in ecarts}
+            repares = db.execute(
+                update(Stock)
+                .where(Stock.id_produit.in_(attendus.keys()))
+                .values(
+                    quantite_disponible=case(attendus, value=Stock.id_produit),
+                    date_derniere_mise_a_jour=func.now()
+                )
+                .execution_options(synchronize_session="fetch")
+            ).rowcount
+
+        mode = "COMPLET" if complet else "INCREMENTAL"
+        db.add(ReconciliationStock(
+            mode=mode,
+            id_dernier_mouvement=max(filigrane, nouveau_filigrane),
+            produits_verifies=produits_verifies,
+            ecarts=len(ecarts),
+            repares=repares
+        ))
+        db.commit()
+
+        return {
+            "mode": mode,
+            "produits_verifies": produits_verifies,
+            "ecarts": ecarts,
+            "repares": repares,
+            "id_dernier_mouvement": max(filigrane, nouveau_filigrane),
+        }
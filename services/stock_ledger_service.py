@@ -0,0 +1,262 @@
+"""
+Journal des mouvements de stock (append-only) et niveaux à date
+
+- Chaque variation (réception de lot, déduction FEFO, ajustement d'inventaire,
+  radiation de lots périmés) est une ligne de mouvement_stock.
+- Stock.quantite_disponible est la projection du journal: mise à jour dans la
+  même transaction que l'insertion des mouvements.
+- Des snapshots périodiques (scheduler) figent le niveau de chaque produit; un
+  niveau à une date passée = dernier snapshot antérieur + rejeu des mouvements
+  suivants (quelques lignes au lieu de tout l'historique).
+"""
+
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import select, update, insert, func, case
+from sqlalchemy.orm import Session
+
+from models.model import MouvementStock, SnapshotStock, Stock, Lot
+
+logger = logging.getLogger(__name__)
+
+TYPES_MOUVEMENT = ("INITIAL", "RECEPTION", "DEDUCTION_FEFO", "AJUSTEMENT", "PEREMPTION")
+
+# Les mouvements plus récents que cette marge ne sont pas figés dans un snapshot
+# (une transaction encore ouverte pourrait insérer un id inférieur)
+STOCK_SNAPSHOT_MARGE_MINUTES = int(os.getenv("STOCK_SNAPSHOT_MARGE_MINUTES", "5"))
+
+
+def mouvement(
+    type_mouvement: str,
+    id_produit: int,
+    quantite: int,
+    id_lot: Optional[int] = None,
+    id_commande: Optional[int] = None,
+    motif: Optional[str] = None
+) -> dict:
+    """Construit un mouvement à passer à StockLedgerService.enregistrer"""
+    if type_mouvement not in TYPES_MOUVEMENT:
+        raise ValueError(f"Type de mouvement inconnu: {type_mouvement}")
+    return {
+        "type_mouvement": type_mouvement,
+        "id_produit": id_produit,
+        "quantite": quantite,
+        "id_lot": id_lot,
+        "id_commande": id_commande,
+        "motif": motif,
+    }
+
+
+class StockLedgerService:
+    """Écriture du journal, projection Stock et requêtes à date"""
+
+    @staticmethod
+    def enregistrer(db: Session, mouvements: Iterable[dict], projeter: bool = True) -> int:
+        """
+        Ajoute des mouvements au journal (un INSERT multi-lignes) et met à jour
+        Stock.quantite_disponible (un UPDATE ... CASE id_produit)
+
+        Ne commit pas: les mouvements sont validés avec l'opération qui les cause.
+
+        Args:
+            mouvements: Dicts construits par mouvement()
+            projeter: False si Stock a déjà été écrit (création d'un stock)
+
+        Returns:
+            Nombre de mouvements enregistrés
+        """
+        mouvements = [m for m in mouvements if m["quantite"]]
+        if not mouvements:
+            return 0
+
+        db.execute(insert(MouvementStock), mouvements)
+
+        if projeter:
+            deltas = defaultdict(int)
+            for m in mouvements:
+                deltas[m["id_produit"]] += m["quantite"]
+            StockLedgerService._projeter(db, deltas)
+
+        return len(mouvements)
+
+    @staticmethod
+    def _projeter(db: Session, deltas: dict) -> None:
+        deltas = {id_produit: delta for id_produit, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        delta = case(deltas, value=Stock.id_produit, else_=0)
+        db.execute(
+            update(Stock)
+            .where(Stock.id_produit.in_(deltas.keys()))
+            .values(
+                quantite_disponible=Stock.quantite_disponible + delta,
+                date_derniere_mise_a_jour=func.now()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        # Les stocks déjà chargés dans la session doivent relire leur quantité
+        for obj in list(db.identity_map.values()):
+            if isinstance(obj, Stock) and obj.id_produit in deltas:
+                db.expire(obj, ["quantite_disponible", "date_derniere_mise_a_jour"])
+
+    @staticmethod
+    def _niveaux(
+        db: Session,
+        filtre_snapshot,
+        filtre_mouvement,
+        ids_produits: Optional[list[int]] = None
+    ) -> tuple[dict, dict]:
+        """
+        Dernier snapshot retenu par produit + somme des mouvements postérieurs (2 requêtes)
+
+        Returns:
+            ({id_produit: quantité du snapshot}, {id_produit: somme rejouée})
+        """
+        dernier = select(
+            SnapshotStock.id_produit,
+            func.max(SnapshotStock.id_snapshot).label("id_snapshot")
+        ).where(filtre_snapshot)
+        if ids_produits is not None:
+            dernier = dernier.where(SnapshotStock.id_produit.in_(ids_produits))
+        dernier = dernier.group_by(SnapshotStock.id_produit).subquery()
+
+        snapshots = select(
+            SnapshotStock.id_produit,
+            SnapshotStock.quantite,
+            SnapshotStock.id_dernier_mouvement
+        ).join(dernier, SnapshotStock.id_snapshot == dernier.c.id_snapshot).subquery()
+
+        base = {
+            row.id_produit: row.quantite
+            for row in db.execute(select(snapshots.c.id_produit, snapshots.c.quantite))
+        }
+
+        rejeu = select(
+            MouvementStock.id_produit,
+            func.sum(MouvementStock.quantite).label("quantite")
+        ).outerjoin(
+            snapshots, snapshots.c.id_produit == MouvementStock.id_produit
+        ).where(
+            filtre_mouvement,
+            MouvementStock.id_mouvement > func.coalesce(snapshots.c.id_dernier_mouvement, 0)
+        )
+        if ids_produits is not None:
+            rejeu = rejeu.where(MouvementStock.id_produit.in_(ids_produits))
+        rejeu = rejeu.group_by(MouvementStock.id_produit)
+
+        return base, {row.id_produit: row.quantite for row in db.execute(rejeu)}
+
+    @staticmethod
+    def niveaux_a_date(
+        db: Session,
+        date: datetime,
+        ids_produits: Optional[list[int]] = None
+    ) -> dict[int, int]:
+        """
+        Niveau de stock de chaque produit à une date passée
+
+        Args:
+            date: Instant demandé
+            ids_produits: Limiter à ces produits (tous ceux ayant un historique sinon)
+
+        Returns:
+            {id_produit: quantité}
+        """
+        base, rejeu = StockLedgerService._niveaux(
+            db,
+            SnapshotStock.date_snapshot <= date,
+            MouvementStock.date_mouvement <= date,
+            ids_produits
+        )
+        produits = set(base) | set(rejeu)
+        if ids_produits is not None:
+            produits |= set(ids_produits)
+        return {
+            id_produit: base.get(id_produit, 0) + rejeu.get(id_produit, 0)
+            for id_produit in sorted(produits)
+        }
+
+    @staticmethod
+    def niveau_a_date(db: Session, id_produit: int, date: datetime) -> int:
+        return StockLedgerService.niveaux_a_date(db, date, [id_produit])[id_produit]
+
+    @staticmethod
+    def creer_snapshots(db: Session, now: Optional[datetime] = None) -> int:
+        """
+        Fige le niveau des produits ayant bougé depuis leur dernier snapshot
+
+        Returns:
+            Nombre de snapshots créés
+        """
+        limite = (now or datetime.now()) - timedelta(minutes=STOCK_SNAPSHOT_MARGE_MINUTES)
+        watermark = db.scalar(
+            select(func.max(MouvementStock.id_mouvement))
+            .where(MouvementStock.date_mouvement <= limite)
+        )
+        if watermark is None:
+            return 0
+
+        base, rejeu = StockLedgerService._niveaux(
+            db,
+            SnapshotStock.id_dernier_mouvement <= watermark,
+            MouvementStock.id_mouvement <= watermark
+        )
+        # Un produit dont les mouvements s'annulent a quand même bougé: nouveau snapshot
+        lignes = [
+            {
+                "id_produit": id_produit,
+                "quantite": base.get(id_produit, 0) + delta,
+                "id_dernier_mouvement": watermark,
+                "date_snapshot": limite,
+            }
+            for id_produit, delta in rejeu.items()
+        ]
+        if lignes:
+            db.execute(insert(SnapshotStock), lignes)
+        db.commit()
+        return len(lignes)
+
+    @staticmethod
+    def radier_lots_expires(db: Session, now: Optional[datetime] = None) -> list[dict]:
+        """
+        Met à zéro les lots périmés ayant encore du stock et journalise la perte
+
+        Ne commit pas.
+
+        Returns:
+            Mouvements de péremption enregistrés
+        """
+        now = now or datetime.now()
+        lots = db.execute(
+            select(Lot.id_lot, Lot.id_produit, Lot.numero_lot, Lot.quantite_restante)
+            .where(Lot.date_expiration <= now, Lot.quantite_restante > 0)
+            .with_for_update()
+        ).all()
+        if not lots:
+            return []
+
+        # Lots verrouillés (FOR UPDATE): les quantités lues sont celles radiées
+        ids_lots = {lot.id_lot for lot in lots}
+        db.execute(
+            update(Lot)
+            .where(Lot.id_lot.in_(ids_lots))
+            .values(quantite_restante=0)
+            .execution_options(synchronize_session=False)
+        )
+        for obj in list(db.identity_map.values()):
+            if isinstance(obj, Lot) and obj.id_lot in ids_lots:
+                db.expire(obj, ["quantite_restante"])
+
+        mouvements = [
+            mouvement(
+                "PEREMPTION", lot.id_produit, -lot.quantite_restante,
+                id_lot=lot.id_lot, motif=f"Lot {lot.numero_lot} périmé"
+            )
+            for lot in lots
+        ]
+        StockLedgerService.enregistrer(db, mouvements)
+        return mouvements
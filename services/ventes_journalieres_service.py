@@ -0,0 +1,218 @@
+"""
+Agrégats de ventes journaliers (table de faits vente_journaliere / vente_produit_journaliere)
+Rafraîchis incrémentalement par le scheduler, lus par les prédictions et l'historique
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, case, insert, select
+from sqlalchemy.orm import Session
+
+from models.model import Vente, LigneCommande, VenteJournaliere, VenteProduitJournaliere
+
+
+class VentesJournalieresService:
+    """Service de maintenance et de lecture des ventes agrégées par jour"""
+
+    # Jours déjà agrégés recalculés à chaque rafraîchissement (ventes saisies en retard)
+    JOURS_RECALCUL = 3
+
+    @staticmethod
+    def _debut(jour: date) -> datetime:
+        return datetime.combine(jour, time.min)
+
+    @staticmethod
+    def _as_date(value) -> date:
+        """func.date() renvoie une chaîne sous SQLite, une date sous PostgreSQL"""
+        return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+    @staticmethod
+    def dernier_jour_agrege(db: Session) -> Optional[date]:
+        """Dernier jour présent dans l'agrégat (None si jamais rafraîchi)"""
+        jour = db.query(func.max(VenteJournaliere.jour)).scalar()
+        return VentesJournalieresService._as_date(jour) if jour else None
+
+    @staticmethod
+    def rafraichir(
+        db: Session,
+        depuis: Optional[date] = None,
+        jusqu_a: Optional[date] = None
+    ) -> Dict[str, int]:
+        """
+        Recalcule les agrégats sur [depuis, jusqu_a] (jours clos uniquement)
+        
+        Par défaut:
+        - depuis = dernier jour agrégé - JOURS_RECALCUL (ou première vente si table vide)
+        - jusqu_a = hier
+        
+        Args:
+            db: Session SQLAlchemy
+            depuis: Premier jour à recalculer
+            jusqu_a: Dernier jour à recalculer
+            
+        Returns:
+            Dictionnaire {jours, lignes_produit}
+        """
+        svc = VentesJournalieresService
+        jusqu_a = jusqu_a or (date.today() - timedelta(days=1))
+        
+        if depuis is None:
+            dernier = svc.dernier_jour_agrege(db)
+            if dernier:
+                depuis = dernier - timedelta(days=svc.JOURS_RECALCUL)
+            else:
+                premiere_vente = db.query(func.min(Vente.date_vente)).scalar()
+                if premiere_vente is None:
+                    return {"jours": 0, "lignes_produit": 0}
+                depuis = premiere_vente.date()
+        
+        if depuis > jusqu_a:
+            return {"jours": 0, "lignes_produit": 0}
+        
+        debut = svc._debut(depuis)
+        fin = svc._debut(jusqu_a + timedelta(days=1))
+        jour_vente = func.date(Vente.date_vente)
+        
+        try:
+            db.query(VenteJournaliere).filter(
+                VenteJournaliere.jour >= depuis,
+                VenteJournaliere.jour <= jusqu_a
+            ).delete(synchronize_session=False)
+            db.query(VenteProduitJournaliere).filter(
+                VenteProduitJournaliere.jour >= depuis,
+                VenteProduitJournaliere.jour <= jusqu_a
+            ).delete(synchronize_session=False)
+            
+            # CA par jour (une ligne par jour, y compris sans vente)
+            par_jour = {
+                svc._as_date(jour): (ca, nb)
+                for jour, ca, nb in db.query(
+                    jour_vente,
+                    func.sum(Vente.chiffre_affaires),
+                    func.count(Vente.id_vente)
+                ).filter(
+                    Vente.date_vente >= debut,
+                    Vente.date_vente < fin
+                ).group_by(jour_vente).all()
+            }
+            nb_jours = (jusqu_a - depuis).days + 1
+            lignes_jour = []
+            for i in range(nb_jours):
+                jour = depuis + timedelta(days=i)
+                ca, nb = par_jour.get(jour, (0, 0))
+                lignes_jour.append({"jour": jour, "chiffre_affaires": ca or 0, "nombre_ventes": nb})
+            db.execute(insert(VenteJournaliere), lignes_jour)
+            
+            # Quantités et CA par produit et par jour, calculés dans la base
+            result = db.execute(
+                insert(VenteProduitJournaliere).from_select(
+                    ["jour", "id_produit", "quantite", "chiffre_affaires"],
+                    select(
+                        jour_vente,
+                        LigneCommande.id_produit,
+                        func.sum(LigneCommande.quantite),
+                        func.sum(LigneCommande.montant_ligne)
+                    ).join(
+                        Vente, Vente.id_commande == LigneCommande.id_commande
+                    ).where(
+                        Vente.date_vente >= debut,
+                        Vente.date_vente < fin
+                    ).group_by(jour_vente, LigneCommande.id_produit)
+                )
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise Exception(f"Erreur rafraîchissement ventes journalières: {str(e)}")
+        
+        return {"jours": nb_jours, "lignes_produit": result.rowcount or 0}
+
+    @staticmethod
+    def historique_ca(db: Session, depuis: date) -> List[Tuple[date, float]]:
+        """
+        CA par jour depuis `depuis` (inclus) jusqu'à aujourd'hui.
+        Jours agrégés lus dans vente_journaliere, jours suivants (non encore agrégés)
+        lus dans vente sur un intervalle de dates (index idx_vente_date).
+        """
+        svc = VentesJournalieresService
+        dernier = svc.dernier_jour_agrege(db)
+        
+        result = []
+        if dernier and dernier >= depuis:
+            result = [
+                (svc._as_date(r.jour), float(r.chiffre_affaires))
+                for r in db.query(VenteJournaliere).filter(
+                    VenteJournaliere.jour >= depuis,
+                    VenteJournaliere.jour <= dernier,
+                    VenteJournaliere.nombre_ventes > 0
+                ).order_by(VenteJournaliere.jour).all()
+            ]
+            depuis = dernier + timedelta(days=1)
+        
+        jour_vente = func.date(Vente.date_vente)
+        result += [
+            (svc._as_date(jour), float(ca))
+            for jour, ca in db.query(
+                jour_vente,
+                func.sum(Vente.chiffre_affaires)
+            ).filter(
+                Vente.date_vente >= svc._debut(depuis)
+            ).group_by(jour_vente).order_by(jour_vente).all()
+        ]
+        return result
+
+    @staticmethod
+    def quantites_produits(
+        db: Session,
+        jours: List[date],
+        ids_produits: List[int]
+    ) -> Dict[Tuple[int, date], int]:
+        """
+        Quantités vendues par (produit, jour) pour les jours demandés.
+        Jours agrégés lus dans vente_produit_journaliere, les autres dans vente
+        en une seule requête SUM(CASE ...) sur un intervalle de dates.
+        
+        Returns:
+            Dictionnaire {(id_produit, jour): quantite} (absent = 0)
+        """
+        svc = VentesJournalieresService
+        if not jours or not ids_produits:
+            return {}
+        
+        dernier = svc.dernier_jour_agrege(db)
+        jours_agreges = [j for j in jours if dernier and j <= dernier]
+        jours_bruts = [j for j in jours if not (dernier and j <= dernier)]
+        result = {}
+        
+        if jours_agreges:
+            for r in db.query(VenteProduitJournaliere).filter(
+                VenteProduitJournaliere.id_produit.in_(ids_produits),
+                VenteProduitJournaliere.jour.in_(jours_agreges)
+            ).all():
+                result[(r.id_produit, svc._as_date(r.jour))] = r.quantite
+        
+        if jours_bruts:
+            colonnes = [
+                func.sum(case(
+                    (
+                        (Vente.date_vente >= svc._debut(jour)) &
+                        (Vente.date_vente < svc._debut(jour + timedelta(days=1))),
+                        LigneCommande.quantite
+                    ),
+                    else_=0
+                ))
+                for jour in jours_bruts
+            ]
+            rows = db.query(LigneCommande.id_produit, *colonnes).join(
+                Vente, Vente.id_commande == LigneCommande.id_commande
+            ).filter(
+                LigneCommande.id_produit.in_(ids_produits),
+                Vente.date_vente >= svc._debut(min(jours_bruts)),
+                Vente.date_vente < svc._debut(max(jours_bruts) + timedelta(days=1))
+            ).group_by(LigneCommande.id_produit).all()
+            for row in rows:
+                for i, jour in enumerate(jours_bruts):
+                    if row[i + 1]:
+                        result[(row[0], jour)] = row[i + 1]
+        
+        return result
@@ -0,0 +1,22 @@
+-- ======================================================================
+-- ⚡ MIGRATION ALERTES INCRÉMENTALES - Prochaine bascule de seuil par lot
+-- ======================================================================
+-- Objectif: le job incrémental (chaque minute) ne réévalue que les lots
+-- modifiés et ceux dont date_prochaine_alerte est échue. Le scan quotidien
+-- de 06:00 devient une réconciliation.
+-- Les lots existants sont planifiés au premier scan (date NULL).
+-- ======================================================================
+
+SET search_path TO public;
+
+ALTER TABLE lot
+ADD COLUMN IF NOT EXISTS date_prochaine_alerte TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_lot_date_prochaine_alerte
+ON lot(date_prochaine_alerte);
+
+-- ======================================================================
+-- ROLLBACK
+-- ======================================================================
+-- DROP INDEX IF EXISTS idx_lot_date_prochaine_alerte;
+-- ALTER TABLE lot DROP COLUMN IF EXISTS date_prochaine_alerte;
@@ -0,0 +1,100 @@
+-- ======================================================================
+-- 📦 MIGRATION JOURNAL DE STOCK - Mouvements append-only + snapshots
+-- ======================================================================
+-- Objectif: chaque variation de stock (réception de lot, déduction FEFO,
+-- ajustement, radiation de lots périmés) est journalisée. La colonne
+-- stock.quantite_disponible devient la projection de ce journal, mise à
+-- jour par l'API dans la même transaction que les mouvements.
+-- Les niveaux à une date passée = dernier snapshot + rejeu des mouvements.
+--
+-- ⚠️ Le trigger trg_maj_stock_commande_acceptee est supprimé: la validation
+-- FEFO journalise déjà la déduction (sinon le stock serait décrémenté 2 fois).
+-- ======================================================================
+
+SET search_path TO public;
+
+BEGIN;
+
+-- ======================================================================
+-- 1️⃣ JOURNAL DES MOUVEMENTS
+-- ======================================================================
+CREATE TABLE IF NOT EXISTS mouvement_stock (
+    id_mouvement SERIAL PRIMARY KEY,
+    date_mouvement TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    type_mouvement VARCHAR(20) NOT NULL,
+    quantite INTEGER NOT NULL,
+    motif TEXT,
+    id_produit INTEGER NOT NULL REFERENCES produit(id_produit) ON DELETE CASCADE,
+    id_lot INTEGER REFERENCES lot(id_lot) ON DELETE SET NULL,
+    id_commande INTEGER REFERENCES commande(id_commande) ON DELETE SET NULL,
+
+    CONSTRAINT ck_mouvement_stock_type
+        CHECK (type_mouvement IN ('INITIAL', 'RECEPTION', 'DEDUCTION_FEFO', 'AJUSTEMENT', 'PEREMPTION'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_mouvement_stock_produit_date
+ON mouvement_stock(id_produit, date_mouvement);
+
+-- ======================================================================
+-- 2️⃣ SNAPSHOTS PÉRIODIQUES (job 00:30)
+-- ======================================================================
+CREATE TABLE IF NOT EXISTS snapshot_stock (
+    id_snapshot SERIAL PRIMARY KEY,
+    date_snapshot TIMESTAMP NOT NULL,
+    quantite INTEGER NOT NULL,
+    id_dernier_mouvement INTEGER NOT NULL,
+    id_produit INTEGER NOT NULL REFERENCES produit(id_produit) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_snapshot_stock_produit_date
+ON snapshot_stock(id_produit, date_snapshot);
+
+-- ======================================================================
+-- 3️⃣ SOLDE D'OUVERTURE: une ligne INITIAL par stock existant + snapshot
+-- ======================================================================
+INSERT INTO mouvement_stock (type_mouvement, quantite, motif, id_produit)
+SELECT 'INITIAL', s.quantite_disponible, 'Solde d''ouverture (migration)', s.id_produit
+FROM stock s
+WHERE NOT EXISTS (SELECT 1 FROM mouvement_stock m WHERE m.id_produit = s.id_produit);
+
+INSERT INTO snapshot_stock (date_snapshot, quantite, id_dernier_mouvement, id_produit)
+SELECT CURRENT_TIMESTAMP, SUM(m.quantite), MAX(m.id_mouvement), m.id_produit
+FROM mouvement_stock m
+WHERE NOT EXISTS (SELECT 1 FROM snapshot_stock sn WHERE sn.id_produit = m.id_produit)
+GROUP BY m.id_produit;
+
+-- ======================================================================
+-- 4️⃣ SUPPRESSION DU TRIGGER DE DÉCRÉMENT À L'ACCEPTATION
+-- ======================================================================
+DROP TRIGGER IF EXISTS trg_maj_stock_commande_acceptee ON commande;
+DROP FUNCTION IF EXISTS maj_stock_apres_commande();
+
+COMMIT;
+
+-- ======================================================================
+-- ROLLBACK
+-- ======================================================================
+-- DROP TABLE IF EXISTS snapshot_stock;
+-- DROP TABLE IF EXISTS mouvement_stock;
+-- Puis, avec la version de l'API antérieure au journal uniquement (sinon double décrément):
+-- CREATE OR REPLACE FUNCTION maj_stock_apres_commande()
+-- RETURNS TRIGGER AS $$
+-- BEGIN
+--     -- Décrémenter le stock pour chaque ligne de commande
+--     UPDATE stock s
+--     SET quantite_disponible = s.quantite_disponible - lc.quantite,
+--         date_derniere_mise_a_jour = CURRENT_TIMESTAMP
+--     FROM ligne_commande lc
+--     WHERE lc.id_commande = NEW.id_commande
+--       AND s.id_produit = lc.id_produit;
+--
+--     RETURN NEW;
+-- END;
+-- $$ LANGUAGE plpgsql;
+--
+-- CREATE TRIGGER trg_maj_stock_commande_acceptee
+-- AFTER UPDATE OF statut
+-- ON commande
+-- FOR EACH ROW
+-- WHEN (NEW.statut = 'ACCEPTEE' AND OLD.statut <> 'ACCEPTEE')
+-- EXECUTE FUNCTION maj_stock_apres_commande();
@@ -0,0 +1,86 @@
+-- ======================================================================
+-- 📑 MIGRATION PAGINATION KEYSET - Index (date, id) et dates NOT NULL
+-- ======================================================================
+-- Objectif: les listes triées par date (?tri=date, livraisons par défaut)
+-- paginent avec WHERE (date, id) < (curseur) ORDER BY date, id LIMIT n.
+-- Sans index composite (date, id), chaque page est un tri complet.
+--
+-- Les colonnes de date deviennent NOT NULL: une date NULL dans le curseur
+-- (date < NULL) ne correspond à aucune ligne et la pagination s'arrête en
+-- silence avant la fin. Les NULL existants sont d'abord renseignés.
+-- Les index mono-colonne sur ces dates sont remplacés par les composites.
+-- ======================================================================
+
+SET search_path TO public;
+
+-- =====================================================
+-- 🔹 Dates manquantes
+-- =====================================================
+
+-- Vente / livraison: date de la commande d'origine si elle est connue
+UPDATE vente v
+SET date_vente = COALESCE(c.date_commande, CURRENT_TIMESTAMP)
+FROM commande c
+WHERE v.date_vente IS NULL AND c.id_commande = v.id_commande;
+
+UPDATE livraison l
+SET date_creation = COALESCE(c.date_commande, CURRENT_TIMESTAMP)
+FROM commande c
+WHERE l.date_creation IS NULL AND c.id_commande = l.id_commande;
+
+UPDATE commande SET date_commande = CURRENT_TIMESTAMP WHERE date_commande IS NULL;
+UPDATE vente SET date_vente = CURRENT_TIMESTAMP WHERE date_vente IS NULL;
+UPDATE reservation SET date_reservation = CURRENT_TIMESTAMP WHERE date_reservation IS NULL;
+UPDATE alerte_stock SET date_alerte = CURRENT_TIMESTAMP WHERE date_alerte IS NULL;
+UPDATE livraison SET date_creation = CURRENT_TIMESTAMP WHERE date_creation IS NULL;
+
+ALTER TABLE commande ALTER COLUMN date_commande SET NOT NULL;
+ALTER TABLE vente ALTER COLUMN date_vente SET NOT NULL;
+ALTER TABLE reservation ALTER COLUMN date_reservation SET NOT NULL;
+ALTER TABLE alerte_stock ALTER COLUMN date_alerte SET NOT NULL;
+ALTER TABLE livraison ALTER COLUMN date_creation SET NOT NULL;
+
+-- =====================================================
+-- 🔹 Index keyset (date, id)
+-- =====================================================
+
+CREATE INDEX IF NOT EXISTS idx_commande_date_id
+ON commande(date_commande, id_commande);
+
+CREATE INDEX IF NOT EXISTS idx_vente_date_id
+ON vente(date_vente, id_vente);
+
+CREATE INDEX IF NOT EXISTS idx_reservation_date_id
+ON reservation(date_reservation, id_reservation);
+
+CREATE INDEX IF NOT EXISTS idx_alerte_stock_date_id
+ON alerte_stock(date_alerte, id_alerte);
+
+CREATE INDEX IF NOT EXISTS idx_livraison_date_creation_id
+ON livraison(date_creation, id_livraison);
+
+CREATE INDEX IF NOT EXISTS idx_mouvement_stock_date_id
+ON mouvement_stock(date_mouvement, id_mouvement);
+
+-- Couverts par les index composites (même première colonne)
+DROP INDEX IF EXISTS idx_commande_date;
+DROP INDEX IF EXISTS idx_vente_date;
+DROP INDEX IF EXISTS idx_livraison_date_creation;
+
+-- ======================================================================
+-- ROLLBACK
+-- ======================================================================
+-- CREATE INDEX idx_commande_date ON commande(date_commande);
+-- CREATE INDEX idx_vente_date ON vente(date_vente);
+-- CREATE INDEX idx_livraison_date_creation ON livraison(date_creation DESC);
+-- DROP INDEX IF EXISTS idx_commande_date_id;
+-- DROP INDEX IF EXISTS idx_vente_date_id;
+-- DROP INDEX IF EXISTS idx_reservation_date_id;
+-- DROP INDEX IF EXISTS idx_alerte_stock_date_id;
+-- DROP INDEX IF EXISTS idx_livraison_date_creation_id;
+-- DROP INDEX IF EXISTS idx_mouvement_stock_date_id;
+-- ALTER TABLE commande ALTER COLUMN date_commande DROP NOT NULL;
+-- ALTER TABLE vente ALTER COLUMN date_vente DROP NOT NULL;
+-- ALTER TABLE reservation ALTER COLUMN date_reservation DROP NOT NULL;
+-- ALTER TABLE alerte_stock ALTER COLUMN date_alerte DROP NOT NULL;
+-- ALTER TABLE livraison ALTER COLUMN date_creation DROP NOT NULL;
@@ -0,0 +1,31 @@
+-- ======================================================================
+-- 🔄 MIGRATION RÉCONCILIATION STOCK - Historique et filigrane
+-- ======================================================================
+-- Objectif: chaque passage de réconciliation (stock.quantite_disponible vs
+-- total du journal mouvement_stock) est enregistré. id_dernier_mouvement
+-- (filigrane sur mouvement_stock) limite le passage incrémental suivant
+-- aux produits ayant bougé depuis.
+-- Prérequis: migration_journal_stock.sql
+-- ======================================================================
+
+SET search_path TO public;
+
+CREATE TABLE IF NOT EXISTS reconciliation_stock (
+    id_reconciliation SERIAL PRIMARY KEY,
+    date_execution TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    mode VARCHAR(20) NOT NULL,
+    id_dernier_mouvement INTEGER NOT NULL DEFAULT 0,
+    produits_verifies INTEGER NOT NULL DEFAULT 0,
+    ecarts INTEGER NOT NULL DEFAULT 0,
+    repares INTEGER NOT NULL DEFAULT 0
+);
+
+-- La comparaison groupe les lots par produit
+CREATE INDEX IF NOT EXISTS idx_lot_produit_quantite
+ON lot(id_produit, quantite_restante);
+
+-- ======================================================================
+-- ROLLBACK
+-- ======================================================================
+-- DROP INDEX IF EXISTS idx_lot_produit_quantite;
+-- DROP TABLE IF EXISTS reconciliation_stock;
@@ -0,0 +1,27 @@
+-- ======================================================================
+-- 🔑 MIGRATION RÉVOCATION DES TOKENS - Déconnexion (POST /auth/logout)
+-- ======================================================================
+-- Objectif: les tokens JWT portent un jti; un token révoqué est enregistré
+-- ici jusqu'à son expiration. Chaque worker en garde une copie en mémoire
+-- (filtre de Bloom + ensemble exact) synchronisée de façon incrémentale.
+-- Les lignes expirées sont purgées toutes les heures par le scheduler.
+-- ======================================================================
+
+SET search_path TO public;
+
+CREATE TABLE IF NOT EXISTS token_revoque (
+    id_revocation SERIAL PRIMARY KEY,
+    jti VARCHAR(64) NOT NULL UNIQUE,
+    id_utilisateur INTEGER NOT NULL REFERENCES utilisateur(id_utilisateur) ON DELETE CASCADE,
+    date_revocation TIMESTAMP NOT NULL,
+    date_expiration TIMESTAMP NOT NULL
+);
+
+-- Synchronisation incrémentale (relecture des révocations récentes)
+CREATE INDEX IF NOT EXISTS ix_token_revoque_date_revocation
+ON token_revoque(date_revocation);
+
+-- ======================================================================
+-- ROLLBACK
+-- ======================================================================
+-- DROP TABLE IF EXISTS token_revoque;
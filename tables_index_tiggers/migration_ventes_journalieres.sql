@@ -0,0 +1,69 @@
+-- ======================================================================
+-- 📈 MIGRATION VENTES JOURNALIÈRES - Table de faits pour prévisions
+-- ======================================================================
+-- Objectif: Pré-agréger les ventes par jour et par produit pour que
+-- l'historique et les lags des prédictions ne scannent plus la table vente.
+-- Rafraîchie incrémentalement par le scheduler (job 00:10).
+-- ======================================================================
+
+SET search_path TO public;
+
+-- ======================================================================
+-- 1️⃣ CA PAR JOUR (une ligne par jour rafraîchi, y compris sans vente)
+-- ======================================================================
+CREATE TABLE IF NOT EXISTS vente_journaliere (
+    jour DATE PRIMARY KEY,
+    chiffre_affaires NUMERIC(14,2) NOT NULL DEFAULT 0,
+    nombre_ventes INTEGER NOT NULL DEFAULT 0,
+    date_mise_a_jour TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ======================================================================
+-- 2️⃣ QUANTITÉ ET CA PAR PRODUIT ET PAR JOUR
+-- ======================================================================
+CREATE TABLE IF NOT EXISTS vente_produit_journaliere (
+    jour DATE NOT NULL,
+    id_produit INTEGER NOT NULL REFERENCES produit(id_produit) ON DELETE CASCADE,
+    quantite INTEGER NOT NULL DEFAULT 0,
+    chiffre_affaires NUMERIC(14,2) NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (jour, id_produit)
+);
+
+-- Lags des prédictions: accès par produit puis jour
+CREATE INDEX IF NOT EXISTS idx_vente_produit_journaliere_produit
+    ON vente_produit_journaliere(id_produit, jour);
+
+-- ======================================================================
+-- 3️⃣ INITIALISATION (jours clos déjà présents dans vente)
+-- ======================================================================
+INSERT INTO vente_journaliere (jour, chiffre_affaires, nombre_ventes)
+SELECT d::date,
+       COALESCE(SUM(v.chiffre_affaires), 0),
+       COUNT(v.id_vente)
+FROM generate_series(
+        (SELECT MIN(date_vente)::date FROM vente),
+        CURRENT_DATE - 1,
+        INTERVAL '1 day'
+     ) AS d
+LEFT JOIN vente v
+       ON v.date_vente >= d AND v.date_vente < d + INTERVAL '1 day'
+GROUP BY d
+ON CONFLICT (jour) DO NOTHING;
+
+INSERT INTO vente_produit_journaliere (jour, id_produit, quantite, chiffre_affaires)
+SELECT v.date_vente::date, lc.id_produit, SUM(lc.quantite), SUM(lc.montant_ligne)
+FROM vente v
+JOIN ligne_commande lc ON lc.id_commande = v.id_commande
+WHERE v.date_vente < CURRENT_DATE
+GROUP BY v.date_vente::date, lc.id_produit
+ON CONFLICT (jour, id_produit) DO NOTHING;
+
+-- ======================================================================
+-- ROLLBACK (En cas d'erreur)
+-- ======================================================================
+/*
+DROP TABLE IF EXISTS vente_produit_journaliere;
+DROP TABLE IF EXISTS vente_journaliere;
+*/
+-- ======================================================================
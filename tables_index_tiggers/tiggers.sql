@@ -25,30 +25,12 @@ FOR EACH ROW
 EXECUTE FUNCTION verifier_stock_non_negatif();
 
 -- ============================================
--- TRIGGER : Décrémenter le stock après commande
+-- ⚠️ Pas de trigger de décrément à l'acceptation d'une commande
 -- ============================================
-
-CREATE OR REPLACE FUNCTION maj_stock_apres_commande()
-RETURNS TRIGGER AS $$
-BEGIN
-    -- Décrémenter le stock pour chaque ligne de commande
-    UPDATE stock s
-    SET quantite_disponible = s.quantite_disponible - lc.quantite,
-        date_derniere_mise_a_jour = CURRENT_TIMESTAMP
-    FROM ligne_commande lc
-    WHERE lc.id_commande = NEW.id_commande
-      AND s.id_produit = lc.id_produit;
-
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE TRIGGER trg_maj_stock_commande_acceptee
-AFTER UPDATE OF statut
-ON commande
-FOR EACH ROW
-WHEN (NEW.statut = 'ACCEPTEE' AND OLD.statut <> 'ACCEPTEE')
-EXECUTE FUNCTION maj_stock_apres_commande();
+-- L'API journalise la déduction FEFO (mouvement_stock DEDUCTION_FEFO) et
+-- projette stock.quantite_disponible dans la même transaction: un trigger
+-- sur commande.statut décrémenterait le stock une seconde fois.
+-- (trg_maj_stock_commande_acceptee, supprimé par migration_journal_stock.sql)
 
 -- ============================================
 -- TRIGGER : Alerte stock bas
@@ -1,12 +1,18 @@
+import itertools
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from main import app
 from database import get_db
-from models.model import Base
+from models.model import Base, Utilisateur
+from schema.enums import RoleEnum
+from security.hashing import hash_password
+from security.auth_cache import AUTH_CACHE
+from security.revocation import REVOCATIONS
 
 # Base de données de test en mémoire (SQLite)
 # Note: SQLite ne supporte pas certains types Postgres, mais pour des tests basiques ça passe souvent.
@@ -42,7 +48,62 @@ def client(db_session):
             db_session.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    AUTH_CACHE.clear()  # Base recréée à chaque test: les ids utilisateur sont réutilisés
+    REVOCATIONS.reinitialiser()
     app.state.limiter.enabled = False # Disable rate limit for tests
     yield TestClient(app)
     app.dependency_overrides = {}
     app.state.limiter.enabled = True
+
+
+# Fabrique d'en-têtes Bearer: crée un utilisateur du rôle demandé et le connecte
+@pytest.fixture
+def headers_role(client, db_session):
+    numeros = itertools.count(1)
+
+    def fabriquer(role: RoleEnum = RoleEnum.ADMIN) -> dict:
+        email = f"{role.value.lower()}{next(numeros)}@test.com"
+        db_session.add(Utilisateur(nom="Test", prenom=role.value, email=email,
+                                   mot_de_passe=hash_password("secret123"), role=role))
+        db_session.commit()
+        res = client.post("/auth/login", data={"username": email, "password": "secret123"})
+        assert res.status_code == 200
+        return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+    return fabriquer
+
+
+@pytest.fixture
+def admin_headers(headers_role):
+    return headers_role(RoleEnum.ADMIN)
+
+
+class CaptureRequetes:
+    """Requêtes SQL exécutées dans un bloc `with` (texte des statements)"""
+
+    def __init__(self, bind):
+        self.bind = bind
+        self.statements = []
+
+    def _capturer(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.bind, "before_cursor_execute", self._capturer)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.bind, "before_cursor_execute", self._capturer)
+
+    def __len__(self):
+        return len(self.statements)
+
+    def compter(self, commande: str) -> int:
+        """Nombre de requêtes commençant par `commande` (SELECT, UPDATE...)"""
+        return sum(1 for s in self.statements if s.lstrip().upper().startswith(commande))
+
+
+# Fixture de comptage des requêtes SQL: `with requetes_sql() as requetes: ...`
+@pytest.fixture
+def requetes_sql(db_session):
+    return lambda: CaptureRequetes(db_session.get_bind())
@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from models.model import Produit, Stock, Lot, AlerteStock
+from services.alerte_expiration_service import (
+    AlerteExpirationService, LOTS_A_REEVALUER, signaler_lots_modifies
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_file_lots():
+    LOTS_A_REEVALUER.vider()
+    yield
+    LOTS_A_REEVALUER.vider()
+
+
+def _seed_lots(db_session, jours_expiration, quantite=10):
+    """Crée un produit et un lot par délai d'expiration (en jours)"""
+    now = datetime.now()
+    produit = Produit(nom_produit="Tomate", type_produit="Legume", prix_unitaire=Decimal("10.0"))
+    db_session.add(produit)
+    db_session.flush()
+    stock = Stock(id_produit=produit.id_produit, quantite_disponible=100, seuil_minimal=1)
+    db_session.add(stock)
+    db_session.flush()
+    lots = []
+    for i, jours in enumerate(jours_expiration):
+        lot = Lot(
+            numero_lot=f"L-{i}",
+            date_fabrication=now - timedelta(days=200),
+            date_expiration=now + timedelta(days=jours, hours=1),
+            quantite_initiale=quantite,
+            quantite_restante=quantite,
+            id_produit=produit.id_produit,
+            id_stock=stock.id_stock,
+        )
+        db_session.add(lot)
+        lots.append(lot)
+    db_session.commit()
+    return lots
+
+
+def _alertes_par_lot(db_session):
+    return {
+        alerte.id_lot: alerte.type_alerte
+        for alerte in db_session.query(AlerteStock).all()
+    }
+
+
+def test_scanner_classe_les_lots(db_session):
+    lots = _seed_lots(db_session, [-2, 0, 30, 31, 60, 61, 90, 91, 200])
+
+    stats = AlerteExpirationService.scanner_lots_expiration(db_session)
+
+    assert stats == {"jaune": 2, "orange": 2, "rouge": 2, "expire": 1, "updated": 7, "deleted": 0}
+    assert _alertes_par_lot(db_session) == {
+        lots[0].id_lot: "EXPIRÉ",
+        lots[1].id_lot: "ROUGE",
+        lots[2].id_lot: "ROUGE",
+        lots[3].id_lot: "ORANGE",
+        lots[4].id_lot: "ORANGE",
+        lots[5].id_lot: "JAUNE",
+        lots[6].id_lot: "JAUNE",
+    }
+    alerte = db_session.query(AlerteStock).filter(AlerteStock.id_lot == lots[0].id_lot).one()
+    assert alerte.statut == "ENVOYEE"
+    assert alerte.seuil_declencheur == AlerteExpirationService.SEUIL_EXPIRE
+    assert "L-0" in alerte.message
+
+
+def test_scanner_idempotent_et_diff(db_session):
+    lots = _seed_lots(db_session, [10, 50, 80])
+    AlerteExpirationService.scanner_lots_expiration(db_session)
+
+    stats = AlerteExpirationService.scanner_lots_expiration(db_session)
+    assert stats["updated"] == 0 and stats["deleted"] == 0
+
+    # Le lot JAUNE passe ROUGE, le lot ORANGE est vidé
+    lots[2].date_expiration = datetime.now() + timedelta(days=5)
+    lots[1].quantite_restante = 0
+    db_session.commit()
+
+    stats = AlerteExpirationService.scanner_lots_expiration(db_session)
+    assert stats["updated"] == 1 and stats["deleted"] == 2
+    assert _alertes_par_lot(db_session) == {lots[0].id_lot: "ROUGE", lots[2].id_lot: "ROUGE"}
+
+
+def test_scanner_nombre_de_requetes_constant(db_session, requetes_sql):
+    _seed_lots(db_session, [-1, 10, 45, 75] * 25)
+
+    with requetes_sql() as requetes:
+        stats = AlerteExpirationService.scanner_lots_expiration(db_session)
+
+    assert stats["updated"] == 100
+    # GROUP BY + DELETE + INSERT ... SELECT + planification (SELECT + UPDATE),
+    # quel que soit le nombre de lots
+    assert len(requetes) == 5
+
+
+def test_prochaine_transition():
+    now = datetime(2026, 1, 1)
+    expiration = now + timedelta(days=100)
+
+    assert AlerteExpirationService.prochaine_transition(expiration, now) == expiration - timedelta(days=91)
+    assert AlerteExpirationService.prochaine_transition(expiration, expiration - timedelta(days=45)) == expiration - timedelta(days=31)
+    assert AlerteExpirationService.prochaine_transition(expiration, expiration - timedelta(days=1)) == expiration
+    assert AlerteExpirationService.prochaine_transition(expiration, expiration + timedelta(seconds=1)) is None
+
+
+def test_scan_incremental_lots_signales(db_session):
+    lots = _seed_lots(db_session, [10, 20, 50])
+    AlerteExpirationService.scanner_lots_expiration(db_session)
+    db_session.refresh(lots[0])
+    assert lots[0].date_prochaine_alerte is not None
+
+    # Rien de signalé ni d'échu: aucun travail
+    assert AlerteExpirationService.scanner_lots_modifies(db_session) is None
+
+    # Lot vidé (ex: déduction FEFO) puis signalé après commit
+    lots[0].quantite_restante = 0
+    db_session.commit()
+    signaler_lots_modifies([lots[0].id_lot])
+
+    stats = AlerteExpirationService.scanner_lots_modifies(db_session)
+    assert stats["lots"] == 1 and stats["deleted"] == 1
+    assert {a.id_lot for a in db_session.query(AlerteStock).all()} == {lots[1].id_lot, lots[2].id_lot}
+
+
+def test_scan_incremental_bascule_echue(db_session):
+    lots = _seed_lots(db_session, [50, 200])
+    AlerteExpirationService.scanner_lots_expiration(db_session)
+
+    # Le temps passe: le lot ORANGE arrive à J-30 et sa bascule est échue
+    lots[0].date_expiration = datetime.now() + timedelta(days=20)
+    lots[0].date_prochaine_alerte = datetime.now() - timedelta(minutes=1)
+    db_session.commit()
+
+    stats = AlerteExpirationService.scanner_lots_modifies(db_session)
+    assert stats["lots"] == 1
+    assert _alertes_par_lot(db_session) == {lots[0].id_lot: "ROUGE"}
+    db_session.refresh(lots[0])
+    assert lots[0].date_prochaine_alerte > datetime.now()
+
+
+def test_listing_et_dashboard(db_session):
+    lots = _seed_lots(db_session, [-1, 10, 45, 75], quantite=5)
+    AlerteExpirationService.scanner_lots_expiration(db_session)
+
+    alertes = AlerteExpirationService.get_alertes_expirations(db_session)
+    assert [a["type_alerte"] for a in alertes] == ["EXPIRÉ", "ROUGE", "ORANGE", "JAUNE"]
+    assert alertes[0]["numero_lot"] == "L-0" and alertes[0]["nom_produit"] == "Tomate"
+    assert alertes[0]["date_alerte"] is not None
+
+    rouges = AlerteExpirationService.get_alertes_expirations(db_session, type_alerte="ROUGE")
+    assert [a["id_lot"] for a in rouges] == [lots[1].id_lot]
+
+    stats = AlerteExpirationService.get_alertes_dashboard(db_session)
+    assert stats["total_alertes"] == 4
+    assert stats["par_type"] == {"expiré": 5, "rouge": 5, "orange": 5, "jaune": 5}
+    assert stats["quantite_expirée"] == 5 and stats["quantite_en_risque"] == 15
+    assert stats["par_produit"]["Tomate"]["count"] == 4
+    assert stats["produits_critiques"][0]["types"] == ["EXPIRÉ", "JAUNE", "ORANGE", "ROUGE"]
+
+
+def test_listing_et_dashboard_nombre_de_requetes_constant(db_session, requetes_sql):
+    _seed_lots(db_session, [-1, 10, 45, 75])
+    AlerteExpirationService.scanner_lots_expiration(db_session)
+    db_session.expunge_all()
+    with requetes_sql() as requetes_liste:
+        AlerteExpirationService.get_alertes_expirations(db_session)
+    with requetes_sql() as requetes_dashboard:
+        AlerteExpirationService.get_alertes_dashboard(db_session)
+
+    # 50 fois plus d'alertes, même nombre de requêtes
+    _seed_lots(db_session, [-1, 10, 45, 75] * 50)
+    AlerteExpirationService.scanner_lots_expiration(db_session)
+    db_session.expunge_all()
+    with requetes_sql() as requetes_liste_grande:
+        alertes = AlerteExpirationService.get_alertes_expirations(db_session)
+    with requetes_sql() as requetes_dashboard_grande:
+        stats = AlerteExpirationService.get_alertes_dashboard(db_session)
+
+    assert len(alertes) == 204 and stats["total_alertes"] == 204
+    assert len(requetes_liste) == len(requetes_liste_grande) == 1
+    assert len(requetes_dashboard) == len(requetes_dashboard_grande) == 2
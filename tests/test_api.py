@@ -45,6 +45,101 @@ def test_login_fail(client):
     res = client.post("/auth/login", data={"username": "wrong", "password": "bad"})
     assert res.status_code == 401
 
+def test_auth_cache_et_desactivation(client, requetes_sql, admin_headers, monkeypatch):
+    from security.revocation import REVOCATIONS
+
+    monkeypatch.setattr(REVOCATIONS, "intervalle_sync", 3600)
+
+    token, user_id = signup_login_helper(client, "cache@test.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get(f"/utilisateurs/{user_id}", headers=headers).status_code == 200
+
+    # Token en cache: seule la lecture du profil demandé touche la base
+    with requetes_sql() as requetes:
+        assert client.get(f"/utilisateurs/{user_id}", headers=headers).status_code == 200
+    assert len(requetes) == 1
+
+    # Désactivation: le contexte en cache est retiré, l'utilisateur est refusé
+    assert client.delete(f"/utilisateurs/{user_id}", headers=admin_headers).status_code == 200
+    res = client.get(f"/utilisateurs/{user_id}", headers=headers)
+    assert res.status_code == 401
+    assert res.json()["detail"] == "Utilisateur désactivé"
+
+def test_logout_revoque_le_token(client, db_session):
+    from models.model import TokenRevoque
+    from security.revocation import REVOCATIONS
+
+    token, user_id = signup_login_helper(client, "logout@test.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get(f"/utilisateurs/{user_id}", headers=headers).status_code == 200
+
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+    res = client.get(f"/utilisateurs/{user_id}", headers=headers)
+    assert res.status_code == 401
+    assert res.json()["detail"] == "Token révoqué"
+    assert db_session.query(TokenRevoque).count() == 1
+
+    # Un autre worker (copie vide) retrouve la révocation à la synchronisation
+    REVOCATIONS.reinitialiser()
+    assert client.get(f"/utilisateurs/{user_id}", headers=headers).status_code == 401
+
+    # Les autres tokens du même utilisateur restent valides
+    res_login = client.post("/auth/login", data={"username": "logout@test.com", "password": "password123"})
+    autre = {"Authorization": f"Bearer {res_login.json()['access_token']}"}
+    assert client.get(f"/utilisateurs/{user_id}", headers=autre).status_code == 200
+
+
+def test_filtre_bloom_et_synchronisation_incrementale(db_session):
+    from datetime import datetime, timedelta
+    from models.model import Utilisateur, TokenRevoque
+    from security.revocation import FiltreBloom, ListeRevocation
+
+    bloom = FiltreBloom(bits=4096)
+    for i in range(100):
+        bloom.ajouter(f"jti-{i}")
+    assert all(f"jti-{i}" in bloom for i in range(100))
+    assert sum(f"autre-{i}" in bloom for i in range(1000)) < 50
+
+    user = Utilisateur(nom="R", prenom="V", email="rev@test.com", mot_de_passe="x", role="CLIENT")
+    db_session.add(user)
+    db_session.flush()
+    now = datetime.now()
+    db_session.add_all([
+        TokenRevoque(jti="actif", id_utilisateur=user.id_utilisateur, date_revocation=now,
+                     date_expiration=now + timedelta(hours=1)),
+        TokenRevoque(jti="expire", id_utilisateur=user.id_utilisateur, date_revocation=now - timedelta(hours=2),
+                     date_expiration=now - timedelta(hours=1)),
+    ])
+    db_session.commit()
+
+    liste = ListeRevocation()
+    assert liste.synchroniser(db_session) == 1
+    assert liste.est_revoque("actif") and not liste.est_revoque("expire")
+    db_session.add(TokenRevoque(jti="nouveau", id_utilisateur=user.id_utilisateur, date_revocation=now,
+                                date_expiration=now + timedelta(hours=1)))
+    db_session.commit()
+    liste.synchroniser(db_session)
+    assert liste.est_revoque("nouveau")
+    assert liste.stats()["revoques"] == 2
+
+def test_quotas_par_role_et_par_classe(client, headers_role, monkeypatch):
+    from main import app
+    from security.limiter import QUOTAS, limiter
+
+    headers = {role: headers_role(role) for role in (RoleEnum.ADMIN, RoleEnum.GEST_STOCK)}
+
+    monkeypatch.setitem(QUOTAS, "scan", {"ADMIN": "2/minute", "*": "1/minute"})
+    limiter.reset()
+    app.state.limiter.enabled = True
+    try:
+        statuts_admin = [client.post("/alertes/scanner", headers=headers[RoleEnum.ADMIN]).status_code for _ in range(3)]
+        statuts_stock = [client.post("/alertes/scanner", headers=headers[RoleEnum.GEST_STOCK]).status_code for _ in range(2)]
+    finally:
+        app.state.limiter.enabled = False
+        limiter.reset()
+    assert statuts_admin == [200, 200, 429]
+    assert statuts_stock == [200, 429]
+
 # ================================
 # 2. RBAC & PRIVACY
 # ================================
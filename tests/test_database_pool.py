@@ -0,0 +1,37 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, exc
+
+from database import InstrumentedQueuePool, pool_stats
+
+
+def test_pool_mesure_attente_et_saturation(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.3
+    )
+    premiere = engine.connect()
+
+    # La connexion est rendue après 100 ms: le checkout suivant attend
+    threading.Timer(0.1, premiere.close).start()
+    engine.connect().close()
+
+    occupee = engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    occupee.close()
+
+    stats = pool_stats(engine)
+    assert stats["checkouts"] == 3
+    assert stats["saturations"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["attente_max_ms"] >= 50
+    assert stats["utilisees"] == 0 and stats["taille"] == 1
+    engine.dispose()
+
+
+def test_health_expose_le_pool(client):
+    response = client.get("/health")
+    assert "database_pool" in response.json()["services"]
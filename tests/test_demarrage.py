@@ -0,0 +1,34 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from services.prediction_service import ModeleML
+
+RACINE = Path(__file__).parent.parent
+MODULES_LOURDS = ["pandas", "numpy", "sklearn", "joblib", "reportlab", "svglib", "google.generativeai"]
+
+
+def test_import_main_sans_travail_bloquant():
+    """import main ne charge ni le modèle ML, ni pandas, ni reportlab, ni Gemini"""
+    code = (
+        "import json, sys, main; "
+        f"print(json.dumps([m for m in {MODULES_LOURDS!r} if m in sys.modules])); "
+        "print(main.MODELE.etat())"
+    )
+    env = dict(os.environ, DATABASE_URL="sqlite://", JWT_SECRET_KEY="testsecret")
+    sortie = subprocess.run(
+        [sys.executable, "-c", code], cwd=RACINE, env=env,
+        capture_output=True, text=True, timeout=60, check=True
+    ).stdout.strip().splitlines()
+    assert json.loads(sortie[-2]) == []
+    assert sortie[-1] == "not_loaded"
+
+
+def test_modele_charge_a_la_demande(tmp_path):
+    modele = ModeleML(tmp_path / "absent.pkl")
+    assert modele.etat() == "not_loaded"
+    assert modele.get() is None
+    assert modele.etat() == "missing"
+    assert modele.hash is None
@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from models.model import Utilisateur, Client, Produit, Stock, Lot, Commande, LigneCommande, Vente
+from services import export_service
+
+
+def _seed_historique(db_session, nb_commandes=5):
+    user = Utilisateur(nom="Kossi", prenom="Ama", email="client@export.com", mot_de_passe="xxx", role="CLIENT")
+    db_session.add(user)
+    db_session.flush()
+    cli = Client(id_utilisateur=user.id_utilisateur, telephone="123", adresse="Lomé")
+    db_session.add(cli)
+    produits = [
+        Produit(nom_produit="Tomate", prix_unitaire=Decimal("10.00")),
+        Produit(nom_produit="Mangue", prix_unitaire=Decimal("4.50")),
+    ]
+    db_session.add_all(produits)
+    db_session.flush()
+    stock = Stock(id_produit=produits[0].id_produit, quantite_disponible=10, seuil_minimal=1)
+    db_session.add(stock)
+    db_session.flush()
+    db_session.add(Lot(
+        numero_lot="LOT-EXP", date_fabrication=datetime(2026, 1, 1), date_expiration=datetime(2026, 6, 1),
+        quantite_initiale=10, quantite_restante=4, id_produit=produits[0].id_produit, id_stock=stock.id_stock
+    ))
+    for i in range(nb_commandes):
+        cmd = Commande(id_client=cli.id_client, statut="ACCEPTEE", montant_total=Decimal("24.50"),
+                       date_commande=datetime(2026, 1, 1) + timedelta(days=i))
+        db_session.add(cmd)
+        db_session.flush()
+        db_session.add_all([
+            LigneCommande(id_commande=cmd.id_commande, id_produit=produits[0].id_produit, quantite=2,
+                          prix_unitaire=Decimal("10.00"), montant_ligne=Decimal("20.00")),
+            LigneCommande(id_commande=cmd.id_commande, id_produit=produits[1].id_produit, quantite=1,
+                          prix_unitaire=Decimal("4.50"), montant_ligne=Decimal("4.50")),
+        ])
+        db_session.add(Vente(id_commande=cmd.id_commande, chiffre_affaires=Decimal("24.50"),
+                             date_vente=datetime(2026, 1, 1) + timedelta(days=i)))
+    db_session.commit()
+
+
+def test_export_ventes_ndjson_par_paquets(client, db_session, monkeypatch, admin_headers):
+    _seed_historique(db_session)
+    monkeypatch.setattr(export_service, "EXPORT_TAILLE_PAQUET", 3)
+
+    response = client.get("/ventes/export", headers=admin_headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lignes = [json.loads(l) for l in response.text.splitlines()]
+    assert len(lignes) == 10
+    assert lignes[0]["client_nom"] == "Kossi"
+    assert lignes[0]["nom_produit"] == "Tomate"
+    assert lignes[0]["montant_ligne"] == "20.00"
+    assert lignes[0]["date_vente"] == "2026-01-01T00:00:00"
+
+
+def test_export_commandes_csv_filtre_dates(client, db_session, admin_headers):
+    _seed_historique(db_session)
+
+    response = client.get(
+        "/commandes/export?format=csv&date_debut=2026-01-02T00:00:00&date_fin=2026-01-04T00:00:00",
+        headers=admin_headers
+    )
+
+    assert response.status_code == 200
+    assert "attachment" in response.headers["content-disposition"]
+    lignes = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(lignes) == 4
+    assert {l["nom_produit"] for l in lignes} == {"Tomate", "Mangue"}
+
+
+def test_export_lots_et_permissions(client, db_session, admin_headers):
+    _seed_historique(db_session)
+
+    response = client.get("/lots/export?format=csv", headers=admin_headers)
+    lignes = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(l["numero_lot"], l["quantite_restante"]) for l in lignes] == [("LOT-EXP", "4")]
+
+    assert client.get("/lots/export?format=xml", headers=admin_headers).status_code == 422
+    assert client.get("/ventes/export").status_code == 401
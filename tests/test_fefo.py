@@ -0,0 +1,280 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import update
+
+from models.model import Produit, Stock, Lot
+from services import fefo_service
+from services.fefo_service import FEFOService, FEFOConflictError, invalider_resume_lots
+
+
+def _seed_lots(db_session):
+    """Crée 2 produits, chacun avec plusieurs lots à expirations différentes"""
+    now = datetime.now()
+    produits = [
+        Produit(nom_produit="Tomate", type_produit="Legume", prix_unitaire=Decimal("10.0")),
+        Produit(nom_produit="Mangue", type_produit="Fruit", prix_unitaire=Decimal("4.5")),
+    ]
+    db_session.add_all(produits)
+    db_session.flush()
+
+    for produit, lots in [
+        (produits[0], [(5, 40), (3, 10), (20, 100)]),
+        (produits[1], [(7, 2), (15, 4)]),
+    ]:
+        stock = Stock(id_produit=produit.id_produit, quantite_disponible=sum(q for q, _ in lots), seuil_minimal=1)
+        db_session.add(stock)
+        db_session.flush()
+        for i, (quantite, jours) in enumerate(lots):
+            db_session.add(Lot(
+                numero_lot=f"L{produit.id_produit}-{i}",
+                date_fabrication=now - timedelta(days=10),
+                date_expiration=now + timedelta(days=jours),
+                quantite_initiale=quantite,
+                quantite_restante=quantite,
+                id_produit=produit.id_produit,
+                id_stock=stock.id_stock,
+            ))
+    db_session.commit()
+    return produits
+
+
+def test_allocation_commande_identique_par_ligne(db_session):
+    tomate, mangue = _seed_lots(db_session)
+
+    attendu = []
+    for id_produit, quantite in [(tomate.id_produit, 12), (mangue.id_produit, 9)]:
+        allocations, success, _ = FEFOService.allocate_fefo(db_session, id_produit, quantite)
+        assert success
+        attendu.append(allocations)
+
+    allocations, success, error = FEFOService.allocate_fefo_commande(
+        db_session, [(tomate.id_produit, 12), (mangue.id_produit, 9)]
+    )
+
+    assert success and error is None
+    assert allocations == attendu
+    # Le lot expirant le plus tôt (10 jours) est consommé en premier
+    assert [a["quantite"] for a in allocations[0]] == [3, 5, 4]
+
+
+def test_allocation_commande_produit_repete(db_session):
+    tomate, _ = _seed_lots(db_session)
+
+    allocations, success, _ = FEFOService.allocate_fefo_commande(
+        db_session, [(tomate.id_produit, 4), (tomate.id_produit, 4)]
+    )
+
+    assert success
+    # La deuxième ligne ne réalloue pas ce qui a été pris par la première
+    assert [(a["numero_lot"], a["quantite"]) for a in allocations[1]] == [
+        (f"L{tomate.id_produit}-0", 4)
+    ]
+
+
+def test_allocation_commande_stock_insuffisant(db_session):
+    tomate, mangue = _seed_lots(db_session)
+
+    allocations, success, error = FEFOService.allocate_fefo_commande(
+        db_session, [(tomate.id_produit, 1), (mangue.id_produit, 23)]
+    )
+
+    assert not success
+    assert allocations == []
+    assert error == "Stock insuffisant: 22 disponible, 23 demandée"
+
+
+def test_allocation_commande_lot_expire_bloque(db_session):
+    tomate, _ = _seed_lots(db_session)
+    lot = db_session.query(Lot).filter(Lot.id_produit == tomate.id_produit).first()
+    lot.date_expiration = datetime.now() - timedelta(days=1)
+    db_session.commit()
+
+    _, success, error = FEFOService.allocate_fefo_commande(db_session, [(tomate.id_produit, 1)])
+
+    assert not success
+    assert "ERREUR SANITAIRE" in error
+
+
+def test_deduction_groupee_un_seul_update(db_session, requetes_sql):
+    tomate, mangue = _seed_lots(db_session)
+    demandes = [(tomate.id_produit, 12), (mangue.id_produit, 9), (tomate.id_produit, 1)]
+
+    with requetes_sql() as requetes:
+        allocations, success, _ = FEFOService.allocate_fefo_commande(db_session, demandes)
+        assert success
+        toutes = [a for lignes in allocations for a in lignes]
+        assert FEFOService.deduct_lots_bulk(db_session, toutes)
+
+    # Une requête de lecture et un UPDATE, quel que soit le nombre de lignes
+    assert requetes.compter("SELECT") == 1
+    assert requetes.compter("UPDATE") == 1
+
+    db_session.commit()
+    restants = {
+        lot.numero_lot: lot.quantite_restante
+        for lot in db_session.query(Lot).all()
+    }
+    assert restants == {
+        f"L{tomate.id_produit}-0": 0,
+        f"L{tomate.id_produit}-1": 0,
+        f"L{tomate.id_produit}-2": 15,
+        f"L{mangue.id_produit}-0": 0,
+        f"L{mangue.id_produit}-1": 13,
+    }
+
+
+def test_deduction_conditionnelle_refuse_survente(db_session):
+    tomate, _ = _seed_lots(db_session)
+    allocations, success, _ = FEFOService.allocate_fefo_commande(db_session, [(tomate.id_produit, 4)])
+    assert success
+
+    # Une autre transaction consomme le lot entre l'allocation et la déduction
+    db_session.execute(update(Lot).where(Lot.numero_lot == f"L{tomate.id_produit}-1").values(quantite_restante=1))
+
+    assert not FEFOService.deduct_lots_bulk(db_session, allocations[0])
+    db_session.rollback()
+    assert all(lot.quantite_restante >= 0 for lot in db_session.query(Lot).all())
+
+
+def test_retry_apres_conflit(db_session, monkeypatch):
+    tomate, _ = _seed_lots(db_session)
+    FEFOService.reset_concurrency_stats()
+    monkeypatch.setattr(fefo_service, "FEFO_RETRY_BACKOFF_MS", 0)
+
+    allocate = FEFOService.allocate_fefo_commande
+    appels = {"n": 0}
+
+    def allocate_avec_concurrent(db, demandes, skip_locked=False):
+        resultat = allocate(db, demandes, skip_locked=skip_locked)
+        appels["n"] += 1
+        if appels["n"] == 1:
+            # Simule un validateur concurrent qui vide le premier lot
+            db.execute(update(Lot).where(Lot.numero_lot == f"L{tomate.id_produit}-1").values(quantite_restante=0))
+        return resultat
+
+    monkeypatch.setattr(FEFOService, "allocate_fefo_commande", staticmethod(allocate_avec_concurrent))
+    allocations, success, _ = FEFOService.allocate_and_deduct_commande(db_session, [(tomate.id_produit, 4)])
+
+    assert success
+    assert appels["n"] == 2
+    stats = FEFOService.concurrency_stats()
+    assert stats["conflits"] == 1 and stats["retries"] == 1 and stats["succes"] == 1
+
+
+def test_conflit_persistant_leve_erreur(db_session, monkeypatch):
+    tomate, _ = _seed_lots(db_session)
+    FEFOService.reset_concurrency_stats()
+    monkeypatch.setattr(fefo_service, "FEFO_RETRY_BACKOFF_MS", 0)
+    monkeypatch.setattr(FEFOService, "deduct_lots_bulk", staticmethod(lambda db, allocations: False))
+
+    with pytest.raises(FEFOConflictError):
+        FEFOService.allocate_and_deduct_commande(db_session, [(tomate.id_produit, 4)])
+
+    stats = FEFOService.concurrency_stats()
+    assert stats["tentatives"] == fefo_service.FEFO_MAX_RETRIES + 1
+    assert stats["echecs"] == 1
+
+
+def test_resume_lots_agrege_et_cache(db_session, requetes_sql):
+    tomate, _ = _seed_lots(db_session)
+    invalider_resume_lots()
+
+    resume = FEFOService.get_lots_resume(db_session)
+    assert resume["total_lots"] == 5
+    assert resume["statistiques"] == {"vert": 1, "jaune": 0, "orange": 1, "rouge": 3, "expiré": 0}
+    assert resume["quantites"] == {"stock_sain": 50, "stock_risque": 30, "stock_expiré": 0}
+    assert resume["alertes"] == {"critique": False, "attention": True}
+
+    # Un lot expire: le cache sert l'ancienne valeur tant qu'il n'est pas invalidé
+    lot = db_session.query(Lot).filter(Lot.numero_lot == f"L{tomate.id_produit}-2").one()
+    lot.date_expiration = datetime.now() - timedelta(days=1)
+    db_session.commit()
+
+    with requetes_sql() as requetes:
+        assert FEFOService.get_lots_resume(db_session) == resume
+    assert requetes.compter("SELECT") == 0
+
+    invalider_resume_lots()
+    resume = FEFOService.get_lots_resume(db_session)
+    assert resume["statistiques"]["expiré"] == 1 and resume["statistiques"]["vert"] == 0
+    assert resume["quantites"]["stock_expiré"] == 20
+    assert resume["alertes"]["critique"] is True
+    invalider_resume_lots()
+
+
+def test_index_fefo_sans_requete_et_invalidation(db_session, requetes_sql, monkeypatch):
+    from services.fefo_index import FEFO_INDEX, invalider_index_fefo
+
+    tomate, mangue = _seed_lots(db_session)
+    id_tomate = tomate.id_produit
+    attendu = {q: FEFOService.allocate_fefo(db_session, id_tomate, q) for q in (1, 4, 12, 28, 29)}
+
+    monkeypatch.setattr(FEFO_INDEX, "ttl", 60)
+    FEFO_INDEX.clear()
+    try:
+        assert FEFOService.allocate_fefo(db_session, id_tomate, 12) == attendu[12]
+        with requetes_sql() as requetes:
+            for quantite, resultat in attendu.items():
+                assert FEFOService.allocate_fefo(db_session, id_tomate, quantite) == resultat
+            assert FEFOService.entree_fefo(db_session, id_tomate).peut_servir(28, datetime.now())
+            assert not FEFOService.entree_fefo(db_session, id_tomate).peut_servir(29, datetime.now())
+        assert requetes.compter("SELECT") == 0
+
+        # Le premier lot (le plus proche de l'expiration) est consommé puis l'index invalidé
+        lot = db_session.query(Lot).filter_by(numero_lot=f"L{id_tomate}-1").one()
+        lot.quantite_restante = 0
+        db_session.commit()
+        assert FEFOService.allocate_fefo(db_session, id_tomate, 4) == attendu[4]
+        invalider_index_fefo([id_tomate])
+        allocations, success, _ = FEFOService.allocate_fefo(db_session, id_tomate, 4)
+        assert success and [a["numero_lot"] for a in allocations] == [f"L{id_tomate}-0"]
+
+        # Un lot qui expire après l'indexation bloque l'allocation (erreur sanitaire)
+        entree = FEFOService.entree_fefo(db_session, id_tomate)
+        plus_tard = datetime.now() + timedelta(days=41)
+        assert entree.quantite_expiree(plus_tard) == 5
+        assert not entree.peut_servir(1, plus_tard)
+        assert FEFOService.concurrency_stats()["index"]["hits"] > 0
+    finally:
+        FEFO_INDEX.clear()
+
+
+def test_index_fefo_chargement_invalide_pendant_la_lecture(db_session, monkeypatch):
+    from services.fefo_index import FEFO_INDEX, IndexFEFO
+
+    tomate, _ = _seed_lots(db_session)
+    id_tomate = tomate.id_produit
+    monkeypatch.setattr(FEFO_INDEX, "ttl", 60)
+    FEFO_INDEX.clear()
+    charger = IndexFEFO.charger
+
+    def charger_puis_invalider(db, id_produit, expire_a=0.0):
+        entree = charger(db, id_produit, expire_a)
+        FEFO_INDEX.invalider([id_produit])
+        return entree
+
+    monkeypatch.setattr(IndexFEFO, "charger", staticmethod(charger_puis_invalider))
+    try:
+        FEFO_INDEX.entree(db_session, id_tomate)
+        assert FEFO_INDEX.stats()["produits"] == 0
+    finally:
+        FEFO_INDEX.clear()
+
+
+def test_preview_et_disponibilite_fefo(client, db_session, headers_role):
+    from schema.enums import RoleEnum
+
+    tomate, _ = _seed_lots(db_session)
+    id_tomate = tomate.id_produit
+    headers = headers_role(RoleEnum.GEST_STOCK)
+
+    res = client.get(f"/lots/fefo/{id_tomate}/allocate?quantite_demandee=12", headers=headers)
+    assert res.status_code == 200
+    assert [lot["quantite_disponible"] for lot in res.json()] == [3, 5, 4]
+
+    res = client.get(f"/lots/fefo/{id_tomate}/disponibilite?quantite=200", headers=headers)
+    assert res.json()["quantite_disponible"] == 28
+    assert res.json()["peut_servir"] is False
+    assert client.get("/lots/fefo/9999/disponibilite?quantite=1", headers=headers).status_code == 404
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import database
+from database import get_db, LectureDB
+from main import app
+from models.model import Base, Produit, Stock, Lot, Utilisateur
+from security.hashing import hash_password
+from schema.enums import RoleEnum
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("greenlet")
+
+
+@pytest.fixture
+def client_async(tmp_path, monkeypatch):
+    """Client dont les endpoints de lecture passent par l'AsyncSession (aiosqlite)"""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    chemin = tmp_path / "lecture.db"
+    engine = create_engine(f"sqlite:///{chemin}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    SessionFichier = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{chemin}")
+
+    monkeypatch.setattr(database, "DB_ASYNC_READS", True)
+    monkeypatch.setattr(database, "_async_sessionmaker", async_sessionmaker(async_engine, expire_on_commit=False))
+
+    def override_get_db():
+        db = SessionFichier()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.state.limiter.enabled = False
+    with SessionFichier() as db:
+        yield TestClient(app), db
+    app.dependency_overrides = {}
+    app.state.limiter.enabled = True
+    engine.dispose()
+
+
+def test_lectures_via_session_async(client_async):
+    client, db = client_async
+    db.add(Utilisateur(
+        nom="Admin", prenom="Async", email="admin@async.com",
+        mot_de_passe=hash_password("admin123"), role=RoleEnum.ADMIN
+    ))
+    produit = Produit(nom_produit="Tomate", type_produit="Legume", prix_unitaire=Decimal("10.0"))
+    db.add(produit)
+    db.flush()
+    stock = Stock(id_produit=produit.id_produit, quantite_disponible=5, seuil_minimal=1)
+    db.add(stock)
+    db.flush()
+    db.add(Lot(
+        numero_lot="LOT-A", date_fabrication=datetime.now(), date_expiration=datetime.now() + timedelta(days=10),
+        quantite_initiale=5, quantite_restante=5, id_produit=produit.id_produit, id_stock=stock.id_stock
+    ))
+    db.commit()
+    token = client.post("/auth/login", data={"username": "admin@async.com", "password": "admin123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert [p["nom_produit"] for p in client.get("/produits/").json()] == ["Tomate"]
+    assert client.get(f"/produits/{produit.id_produit}").json()["id_produit"] == produit.id_produit
+    assert client.get("/produits/999").status_code == 404
+    assert [l["numero_lot"] for l in client.get("/lots/", headers=headers).json()] == ["LOT-A"]
+    assert client.get("/alertes/dashboard", headers=headers).status_code == 200
+    assert client.get("/livraisons/dashboard/stats", headers=headers).json()["total_en_cours"] == 0
+
+
+def test_lecture_sync_dans_threadpool(db_session):
+    import asyncio
+
+    lecture = LectureDB(db_session)
+    assert not lecture.est_async
+    assert asyncio.run(lecture.run(lambda db: db.query(Produit).count())) == 0
@@ -0,0 +1,32 @@
+import re
+
+from services.metriques import METRIQUES
+
+
+def test_metriques_desactivees(client):
+    res = client.get("/")
+    assert "server-timing" not in res.headers
+    assert client.get("/metrics").status_code == 404
+
+
+def test_metriques_par_route(client, admin_headers):
+    METRIQUES.reinitialiser()
+    METRIQUES.activer()
+    try:
+        for _ in range(3):
+            res = client.get("/utilisateurs/", headers=admin_headers)
+            assert res.status_code == 200
+        assert re.match(r'app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ requetes"', res.headers["server-timing"])
+        assert client.get("/produits/999999", headers=admin_headers).status_code == 404
+
+        texte = client.get("/metrics").text
+    finally:
+        METRIQUES.desactiver()
+        METRIQUES.reinitialiser()
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/utilisateurs/"} 3' in texte
+    assert 'http_requests_total{method="GET",route="/produits/{id_produit}",status="404"} 1' in texte
+    # Token en cache après la 1re requête: la liste des utilisateurs = 1 requête SQL
+    compte = re.search(r'http_request_db_queries_sum\{method="GET",route="/utilisateurs/"\} ([\d.]+)', texte)
+    assert 3 <= float(compte.group(1)) <= 6
+    assert 'http_request_db_seconds_total{method="GET",route="/utilisateurs/"}' in texte
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi import Response
+
+from models.model import Produit, Utilisateur, Client, Commande
+from services.pagination import Pagination, HEADER_CURSEUR_SUIVANT
+
+
+def _seed_produits(db_session, n=7):
+    db_session.add_all([
+        Produit(nom_produit=f"Produit {i:02d}", type_produit="Fruit" if i % 2 else "Legume", prix_unitaire=Decimal("1.0"))
+        for i in range(n)
+    ])
+    db_session.commit()
+
+
+def _parcourir(client, url):
+    """Suit les curseurs X-Next-Cursor jusqu'à la dernière page"""
+    pages = []
+    curseur = None
+    while True:
+        separateur = "&" if "?" in url else "?"
+        response = client.get(url + (f"{separateur}cursor={curseur}" if curseur else ""))
+        assert response.status_code == 200
+        pages.append(response.json())
+        curseur = response.headers.get(HEADER_CURSEUR_SUIVANT)
+        if not curseur:
+            return pages
+
+
+def test_pagination_produits_par_curseur(client, db_session):
+    _seed_produits(db_session)
+
+    pages = _parcourir(client, "/produits/?limit=3")
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    ids = [p["id_produit"] for page in pages for p in page]
+    assert ids == sorted(ids) and len(set(ids)) == 7
+
+
+def test_pagination_tri_et_filtre(client, db_session):
+    _seed_produits(db_session)
+
+    pages = _parcourir(client, "/produits/?limit=2&tri=nom&ordre=desc&type_produit=Fruit")
+
+    noms = [p["nom_produit"] for page in pages for p in page]
+    assert noms == ["Produit 05", "Produit 03", "Produit 01"]
+
+
+def test_pagination_limite_et_erreurs(client, db_session):
+    _seed_produits(db_session, n=2)
+
+    assert client.get("/produits/?limit=100000").status_code == 422
+    assert client.get("/produits/?tri=prix").status_code == 400
+    assert client.get("/produits/?cursor=pas-un-curseur").status_code == 400
+
+    response = client.get("/produits/")
+    assert len(response.json()) == 2
+    assert HEADER_CURSEUR_SUIVANT not in response.headers
+
+
+def test_keyset_sur_date_avec_egalites(db_session):
+    user = Utilisateur(nom="Page", prenom="User", email="page@test.com", mot_de_passe="xxx", role="CLIENT")
+    db_session.add(user)
+    db_session.flush()
+    cli = Client(id_utilisateur=user.id_utilisateur, telephone="123", adresse="Test")
+    db_session.add(cli)
+    db_session.flush()
+    base = datetime(2026, 1, 1)
+    # Plusieurs commandes à la même date: le départage se fait sur la clé primaire
+    for jours in [0, 1, 1, 1, 2, 3]:
+        db_session.add(Commande(id_client=cli.id_client, statut="EN_ATTENTE", date_commande=base + timedelta(days=jours)))
+    db_session.commit()
+
+    vus = []
+    curseur = None
+    while True:
+        response = Response()
+        pagination = Pagination(response, cursor=curseur, limit=2, tri="date", ordre="desc")
+        page = pagination.paginer(
+            db_session.query(Commande),
+            {"id": Commande.id_commande, "date": Commande.date_commande},
+            Commande.id_commande
+        )
+        vus.extend((c.date_commande, c.id_commande) for c in page)
+        curseur = response.headers.get(HEADER_CURSEUR_SUIVANT)
+        if not curseur:
+            break
+
+    assert len(vus) == 6
+    assert vus == sorted(vus, reverse=True)
@@ -0,0 +1,139 @@
+import io
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from models.model import Utilisateur, Client, Produit, Commande, LigneCommande, Livraison
+from services.pdf_cache import PDF_CACHE, PDFCache, empreinte_snapshot
+
+
+@pytest.fixture(autouse=True)
+def reset_pdf_cache():
+    PDF_CACHE.clear()
+    yield
+    PDF_CACHE.clear()
+
+
+def _seed_commande(db_session):
+    user = Utilisateur(nom="Kossi", prenom="Ama", email="client@pdf.com", mot_de_passe="xxx", role="CLIENT")
+    db_session.add(user)
+    db_session.flush()
+    cli = Client(id_utilisateur=user.id_utilisateur, telephone="123", adresse="Lomé")
+    produits = [Produit(nom_produit="Tomate", prix_unitaire=Decimal("10.00")),
+                Produit(nom_produit="Mangue", prix_unitaire=Decimal("4.50"))]
+    db_session.add_all([cli, *produits])
+    db_session.flush()
+    cmd = Commande(id_client=cli.id_client, statut="ACCEPTEE", montant_total=Decimal("20.00"),
+                   date_commande=datetime(2026, 1, 1))
+    db_session.add(cmd)
+    db_session.flush()
+    db_session.add(LigneCommande(id_commande=cmd.id_commande, id_produit=produits[0].id_produit, quantite=2,
+                                 prix_unitaire=Decimal("10.00"), montant_ligne=Decimal("20.00")))
+    livraison = Livraison(numero_livraison="LIV-TEST-1", id_commande=cmd.id_commande, statut="EN_PREPARATION",
+                          date_creation=datetime(2026, 1, 2))
+    db_session.add(livraison)
+    db_session.commit()
+    return cmd.id_commande, livraison.id_livraison, produits[1].id_produit
+
+
+def test_bon_commande_cache_etag_et_invalidation(client, db_session, admin_headers):
+    id_commande, _, id_mangue = _seed_commande(db_session)
+    url = f"/commandes/{id_commande}/bon-pdf"
+
+    res = client.get(url, headers=admin_headers)
+    assert res.status_code == 200
+    assert res.content.startswith(b"%PDF")
+    etag = res.headers["etag"]
+
+    # Revalidation: 304 sans corps
+    res_304 = client.get(url, headers={**admin_headers, "If-None-Match": etag})
+    assert res_304.status_code == 304
+    assert res_304.headers["etag"] == etag
+
+    # Nouveau téléchargement: servi depuis le cache (même octets)
+    res_cache = client.get(url, headers=admin_headers)
+    assert res_cache.content == res.content
+    assert PDF_CACHE.stats()["hits"] == 1
+
+    # Ajout d'une ligne: nouvelle empreinte, l'ancien ETag ne correspond plus
+    res_ligne = client.post("/ligne-commandes/", headers=admin_headers, json={
+        "id_commande": id_commande, "id_produit": id_mangue, "quantite": 1,
+        "prix_unitaire": "4.50", "montant_ligne": "4.50"
+    })
+    assert res_ligne.status_code == 200
+    assert PDF_CACHE.stats()["entries"] == 0
+    res_modif = client.get(url, headers={**admin_headers, "If-None-Match": etag})
+    assert res_modif.status_code == 200
+    assert res_modif.headers["etag"] != etag
+
+
+def test_bon_livraison_cache(client, db_session, admin_headers):
+    _, id_livraison, _ = _seed_commande(db_session)
+    url = f"/livraisons/{id_livraison}/bon-livraison-pdf"
+
+    res = client.get(url, headers=admin_headers)
+    assert res.status_code == 200
+    assert "LIV-TEST-1" in res.headers["content-disposition"]
+    assert client.get(url, headers={**admin_headers, "If-None-Match": res.headers["etag"]}).status_code == 304
+    assert client.get("/livraisons/999/bon-livraison-pdf", headers=admin_headers).status_code == 404
+
+
+def test_cache_borne_en_octets():
+    cache = PDFCache(max_entrees=10, max_octets=10)
+    cache.set("commande", 1, "a", b"123456", 1)
+    cache.set("commande", 2, "b", b"123456", 2)
+    assert cache.get("commande", 1, "a") is None
+    assert cache.get("commande", 2, "b") == b"123456"
+    assert cache.get("commande", 2, "autre") is None
+    assert empreinte_snapshot({"a": Decimal("1.0")}) != empreinte_snapshot({"a": Decimal("1.00")})
+
+
+def _seed_livraisons(db_session, nb=3):
+    user = Utilisateur(nom="Lawson", prenom="Kafui", email="lot@pdf.com", mot_de_passe="xxx", role="CLIENT")
+    db_session.add(user)
+    db_session.flush()
+    cli = Client(id_utilisateur=user.id_utilisateur, telephone="123", adresse="Kara")
+    produit = Produit(nom_produit="Igname", prix_unitaire=Decimal("3.00"))
+    db_session.add_all([cli, produit])
+    db_session.flush()
+    for i in range(nb):
+        cmd = Commande(id_client=cli.id_client, statut="ACCEPTEE", montant_total=Decimal("6.00"),
+                       date_commande=datetime(2026, 1, 1))
+        db_session.add(cmd)
+        db_session.flush()
+        db_session.add(LigneCommande(id_commande=cmd.id_commande, id_produit=produit.id_produit, quantite=2,
+                                     prix_unitaire=Decimal("3.00"), montant_ligne=Decimal("6.00")))
+        db_session.add(Livraison(numero_livraison=f"LIV-LOT-{i}", id_commande=cmd.id_commande,
+                                 statut="PRETE" if i < nb - 1 else "EN_PREPARATION",
+                                 date_creation=datetime(2026, 1, 2)))
+    db_session.commit()
+
+
+def test_bons_livraison_par_lot_zip_pool_processus(client, db_session, admin_headers):
+    _seed_livraisons(db_session)
+
+    res = client.get("/livraisons/bons-livraison-pdf?statut=PRETE&format=zip", headers=admin_headers)
+    assert res.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(res.content))
+    assert archive.namelist() == ["bon-livraison-LIV-LOT-0.pdf", "bon-livraison-LIV-LOT-1.pdf"]
+    assert all(archive.read(nom).startswith(b"%PDF") for nom in archive.namelist())
+    # Les rendus du lot alimentent le cache des téléchargements unitaires
+    assert PDF_CACHE.stats()["entries"] == 2
+
+
+def test_bons_livraison_par_lot_pdf_fusionne(client, db_session, monkeypatch, admin_headers):
+    from pypdf import PdfReader
+    from services import pdf_cache
+
+    monkeypatch.setattr(pdf_cache, "PDF_LOT_PROCESSUS", 0)
+    _seed_livraisons(db_session)
+
+    res = client.get("/livraisons/bons-livraison-pdf?ids=1&ids=3", headers=admin_headers)
+    assert res.status_code == 200
+    assert len(PdfReader(io.BytesIO(res.content)).pages) == 2
+
+    assert client.get("/livraisons/bons-livraison-pdf", headers=admin_headers).status_code == 400
+    assert client.get("/livraisons/bons-livraison-pdf?statut=LIVRÉE", headers=admin_headers).status_code == 404
+
@@ -1,9 +1,22 @@
 import pytest
-from services.prediction_service import PredictionService
+import numpy as np
+from services.prediction_service import (
+    PredictionService, FEATURES_ORDER, PREDICTION_CACHE, RECOMMENDATION_STORE,
+    invalider_predictions
+)
 from models.model import Vente, Commande, Client, Utilisateur, Produit, LigneCommande
 from decimal import Decimal
 from datetime import datetime
 
+
+@pytest.fixture(autouse=True)
+def reset_prediction_caches():
+    PREDICTION_CACHE.clear()
+    RECOMMENDATION_STORE.clear()
+    yield
+    PREDICTION_CACHE.clear()
+    RECOMMENDATION_STORE.clear()
+
 def test_get_historical_sales_data(db_session):
     # Setup: Create some data
     user = Utilisateur(nom="Test", prenom="User", email="test@test.com", mot_de_passe="xxx", role="CLIENT")
@@ -36,3 +49,255 @@ def test_prediction_endpoint_auth(client):
     # Test that it requires auth and specific roles
     response = client.get("/predictions/sales")
     assert response.status_code == 401 # Should be unauthorized without token
+
+
+def _seed_sales_history(db_session):
+    """Crée 3 produits avec stock, commandes et ventes réparties sur les 7 derniers jours"""
+    from datetime import timedelta
+    from models.model import Stock
+
+    user = Utilisateur(nom="Batch", prenom="User", email="batch@test.com", mot_de_passe="xxx", role="CLIENT")
+    db_session.add(user)
+    db_session.flush()
+    client = Client(id_utilisateur=user.id_utilisateur, telephone="123", adresse="Test")
+    db_session.add(client)
+    db_session.flush()
+
+    produits = [
+        Produit(nom_produit="Tomate", type_produit="Legume", prix_unitaire=Decimal("10.0")),
+        Produit(nom_produit="Mangue", type_produit="Fruit", prix_unitaire=Decimal("4.5")),
+        Produit(nom_produit="Miel", type_produit=None, prix_unitaire=Decimal("12.0")),
+    ]
+    db_session.add_all(produits)
+    db_session.flush()
+    db_session.add_all([
+        Stock(id_produit=produits[0].id_produit, quantite_disponible=50, seuil_minimal=5),
+        Stock(id_produit=produits[1].id_produit, quantite_disponible=8, seuil_minimal=10),
+    ])
+
+    now = datetime.now()
+    for jours, statut, lignes in [
+        (1, "ACCEPTEE", [(produits[0], 3), (produits[1], 2)]),
+        (2, "ACCEPTEE", [(produits[0], 5)]),
+        (3, "ACCEPTEE", [(produits[1], 7)]),
+        (7, "ACCEPTEE", [(produits[0], 1), (produits[1], 4)]),
+        (10, "ACCEPTEE", [(produits[0], 9)]),
+        (0, "EN_ATTENTE", [(produits[0], 2)]),
+    ]:
+        cmd = Commande(id_client=client.id_client, montant_total=Decimal("0"), statut=statut)
+        db_session.add(cmd)
+        db_session.flush()
+        for produit, quantite in lignes:
+            db_session.add(LigneCommande(
+                id_commande=cmd.id_commande, id_produit=produit.id_produit, quantite=quantite,
+                prix_unitaire=produit.prix_unitaire, montant_ligne=produit.prix_unitaire * quantite
+            ))
+        if statut == "ACCEPTEE":
+            db_session.add(Vente(
+                id_commande=cmd.id_commande, chiffre_affaires=Decimal("10.0"),
+                date_vente=now - timedelta(days=jours)
+            ))
+    db_session.commit()
+    return produits
+
+
+class _FakeModel:
+    """Modèle factice: somme des features, compte les appels à predict"""
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, X):
+        self.calls += 1
+        return np.asarray(X, dtype=float).sum(axis=1)
+
+
+def test_batch_features_match_per_product(db_session):
+    produits = _seed_sales_history(db_session)
+    service = PredictionService(db_session)
+
+    batch = service.prepare_features_batch(produits)
+
+    for produit in produits:
+        unitaire = service.prepare_features_for_product(produit.id_produit)
+        assert unitaire is not None
+        assert batch[produit.id_produit] == unitaire
+
+    tomate = batch[produits[0].id_produit]
+    assert tomate["lag_1_ventes"] == 3
+    assert tomate["lag_2_ventes"] == 5
+    assert tomate["lag_7_ventes"] == 1
+    assert tomate["commandes_acceptees"] == 4
+
+
+def test_predict_sales_by_product_single_predict_call(db_session):
+    produits = _seed_sales_history(db_session)
+    service = PredictionService(db_session)
+    service.model = _FakeModel()
+
+    predictions = service.predict_sales_by_product()
+
+    assert service.model.calls == 1
+    assert len(predictions) == len(produits)
+    for p in predictions:
+        features = service.prepare_features_for_product(p["product_id"])
+        attendu = round(float(sum(features[f] for f in FEATURES_ORDER)), 2)
+        assert p["predicted_sales_7_days"] == attendu
+
+
+def test_prediction_cache_hit_and_invalidation(db_session):
+    produits = _seed_sales_history(db_session)
+    service = PredictionService(db_session)
+    service.model = _FakeModel()
+
+    premier = service.predict_sales_by_product()
+    second = service.predict_sales_by_product()
+
+    assert second == premier
+    assert service.model.calls == 1
+    assert PREDICTION_CACHE.stats()["hits"] == 1
+
+    # Un mouvement de stock sur un produit ne recalcule que ce produit
+    produits[1].stock.quantite_disponible = 100
+    db_session.commit()
+    invalider_predictions([produits[1].id_produit])
+
+    troisieme = service.predict_sales_by_product()
+    assert service.model.calls == 2
+    mangue = next(p for p in troisieme if p["product_id"] == produits[1].id_produit)
+    ancienne = next(p for p in premier if p["product_id"] == produits[1].id_produit)
+    assert mangue["predicted_sales_7_days"] == ancienne["predicted_sales_7_days"] + 92
+    assert PREDICTION_CACHE.stats()["partial_hits"] == 1
+
+
+def test_suppression_commande_invalide_predictions(client, db_session, admin_headers):
+    produits = _seed_sales_history(db_session)
+    service = PredictionService(db_session)
+    service.model = _FakeModel()
+    premier = service.predict_sales_by_product()
+    id_tomate = produits[0].id_produit
+
+    # La commande en attente (2 tomates) compte dans la feature "reservations"
+    en_attente = db_session.query(Commande).filter_by(statut="EN_ATTENTE").one()
+    assert client.delete(f"/commandes/{en_attente.id_commande}", headers=admin_headers).status_code == 204
+
+    second = service.predict_sales_by_product()
+    assert service.model.calls == 2
+    tomate = next(p for p in second if p["product_id"] == id_tomate)
+    ancienne = next(p for p in premier if p["product_id"] == id_tomate)
+    assert tomate["predicted_sales_7_days"] < ancienne["predicted_sales_7_days"]
+
+
+class _FakeLLM:
+    """Remplace genai.GenerativeModel: réponse JSON fixe, délai optionnel"""
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.request_options = None
+
+    def generate_content(self, prompt, request_options=None):
+        import time
+        from types import SimpleNamespace
+        self.calls += 1
+        self.request_options = request_options
+        time.sleep(self.delay)
+        return SimpleNamespace(text='```json\n{"trends_analysis": "ok", "priority_actions": ["a"]}\n```')
+
+
+def _prediction_service_with_fakes(db_session, llm):
+    _seed_sales_history(db_session)
+    service = PredictionService(db_session, llm_client=llm)
+    service.model = _FakeModel()
+    return service
+
+
+def test_gemini_recommendations_memoized(db_session):
+    import asyncio
+    llm = _FakeLLM()
+    service = _prediction_service_with_fakes(db_session, llm)
+
+    async def scenario():
+        first = await service.predict_sales()
+        second = await service.predict_sales()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first["gemini_recommendations"] == {"trends_analysis": "ok", "priority_actions": ["a"]}
+    assert second["gemini_recommendations"] == first["gemini_recommendations"]
+    assert llm.calls == 1
+    assert llm.request_options == {"timeout": service.gemini_timeout}
+
+
+def test_gemini_timeout_does_not_block_event_loop(db_session):
+    import asyncio
+    service = _prediction_service_with_fakes(db_session, _FakeLLM(delay=0.5))
+    service.gemini_timeout = 0.05
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tick_task = asyncio.create_task(ticker())
+        result = await service.predict_sales()
+        tick_task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(scenario())
+
+    assert result["error_type"] == "gemini_timeout"
+    assert "ml_predictions" in result
+    assert ticks > 0
+
+
+def test_deferred_recommendations(db_session):
+    import asyncio
+    service = _prediction_service_with_fakes(db_session, _FakeLLM(delay=0.05))
+
+    async def scenario():
+        immediate = await service.predict_sales(defer_recommendations=True)
+        status_initial = immediate["recommendations_status"]
+        await RECOMMENDATION_STORE.task(immediate["recommendations_key"])
+        return immediate, status_initial
+
+    immediate, status_initial = asyncio.run(scenario())
+
+    assert status_initial == "pending"
+    assert "gemini_recommendations" not in immediate
+    entry = RECOMMENDATION_STORE.get(immediate["recommendations_key"])
+    assert entry["status"] == "ready"
+    assert entry["result"]["trends_analysis"] == "ok"
+
+
+def test_daily_sales_aggregate_matches_raw_path(db_session):
+    from datetime import date, timedelta
+    from models.model import VenteJournaliere, VenteProduitJournaliere
+    from services.ventes_journalieres_service import VentesJournalieresService
+
+    produits = _seed_sales_history(db_session)
+    service = PredictionService(db_session)
+    features_brutes = service.prepare_features_batch(produits)
+    historique_brut = service.get_historical_sales_data(days=30)
+
+    stats = VentesJournalieresService.rafraichir(db_session)
+
+    hier = date.today() - timedelta(days=1)
+    assert VentesJournalieresService.dernier_jour_agrege(db_session) == hier
+    assert stats["jours"] == 10  # de J-10 à J-1, jours sans vente inclus
+    tomate_j2 = db_session.get(VenteProduitJournaliere, (hier - timedelta(days=1), produits[0].id_produit))
+    assert tomate_j2.quantite == 5
+    assert db_session.get(VenteJournaliere, hier - timedelta(days=2)).nombre_ventes == 1
+    assert db_session.get(VenteJournaliere, hier - timedelta(days=3)).nombre_ventes == 0
+
+    assert service.prepare_features_batch(produits) == features_brutes
+    for produit in produits:
+        assert service.prepare_features_for_product(produit.id_produit) == features_brutes[produit.id_produit]
+    assert service.get_historical_sales_data(days=30) == historique_brut
+
+    # Rafraîchissement incrémental idempotent
+    VentesJournalieresService.rafraichir(db_session)
+    assert db_session.query(VenteJournaliere).count() == 10
@@ -0,0 +1,70 @@
+import os
+import re
+
+import pytest
+
+import services.profilage as profilage
+from schema.enums import RoleEnum
+from services.profilage import ECHANTILLONNEUR, MiddlewareProfilage
+
+
+@pytest.fixture
+def profilage_actif(monkeypatch, tmp_path):
+    monkeypatch.setattr(MiddlewareProfilage, "actif", True)
+    monkeypatch.setattr(profilage, "PROFILAGE_DOSSIER", str(tmp_path))
+    return tmp_path
+
+
+def test_profilage_desactive(client, admin_headers):
+    res = client.get("/utilisateurs/?profile=1", headers=admin_headers)
+    assert res.status_code == 200
+    assert "x-profile-fichier" not in res.headers
+    assert client.get("/profilage/", headers=admin_headers).status_code == 404
+
+
+def test_profil_requete_admin(client, headers_role, profilage_actif):
+    admin = headers_role(RoleEnum.ADMIN)
+    client_role = headers_role(RoleEnum.CLIENT)
+
+    res = client.get("/produits/", headers={**client_role, "X-Profile": "1"})
+    assert "x-profile-fichier" not in res.headers
+
+    res = client.get("/utilisateurs/", headers={**admin, "X-Profile": "1"})
+    assert res.status_code == 200
+    fichier = res.headers["x-profile-fichier"]
+    assert os.path.isfile(profilage_actif / fichier)
+
+    resume = client.get(f"/profilage/fichiers/{fichier}", headers=admin)
+    assert resume.status_code == 200
+    # L'endpoint lui-même a bien été profilé dans le thread qui l'exécute
+    assert "get_utilisateurs" in resume.text
+    assert fichier in [f["fichier"] for f in client.get("/profilage/", headers=admin).json()["fichiers"]]
+
+    assert client.get("/profilage/fichiers/..%2Fmain.py", headers=admin).status_code == 404
+    assert client.get("/profilage/", headers=client_role).status_code == 403
+
+
+def test_profil_endpoint_async_inclut_le_travail_delegue(client, admin_headers, profilage_actif):
+    # /alertes/dashboard est async: la lecture tourne dans le threadpool (LectureDB.run)
+    res = client.get("/alertes/dashboard", headers={**admin_headers, "X-Profile": "1"})
+    assert res.status_code == 200
+    fichier = res.headers["x-profile-fichier"]
+
+    resume = client.get(f"/profilage/fichiers/{fichier}?limite=500", headers=admin_headers).text
+    assert re.search(r"alerte_expiration_service\.py:\d+\(get_alertes_dashboard\)", resume)
+    assert re.search(r"\(execute\)", resume)
+
+
+def test_echantillonnage(client, admin_headers, profilage_actif):
+    res = client.post("/profilage/echantillonnage/demarrer?intervalle_ms=1&duree=60", headers=admin_headers)
+    assert res.status_code == 200
+    try:
+        assert client.post("/profilage/echantillonnage/demarrer", headers=admin_headers).status_code == 409
+        client.get("/utilisateurs/", headers=admin_headers)
+    finally:
+        res = client.post("/profilage/echantillonnage/arreter", headers=admin_headers)
+    assert res.status_code == 200
+    assert not ECHANTILLONNEUR.actif
+    contenu = (profilage_actif / res.json()["fichier"]).read_text()
+    # Format collapsed: "module:fonction;module:fonction nombre"
+    assert all(ligne.rsplit(" ", 1)[1].isdigit() for ligne in contenu.splitlines())
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from models.model import Produit, Stock, MouvementStock, ReconciliationStock
+from services.reconciliation_stock_service import ReconciliationStockService
+
+
+def _produit(db_session, nom, quantite_journal, quantite_stock=None):
+    """Stock dont le journal totalise quantite_journal (quantite_stock: écriture hors journal)"""
+    produit = Produit(nom_produit=nom, prix_unitaire=Decimal("2.00"))
+    db_session.add(produit)
+    db_session.flush()
+    quantite_stock = quantite_journal if quantite_stock is None else quantite_stock
+    db_session.add(Stock(id_produit=produit.id_produit, quantite_disponible=quantite_stock, seuil_minimal=0))
+    db_session.add(MouvementStock(type_mouvement="INITIAL", quantite=quantite_journal, id_produit=produit.id_produit))
+    db_session.commit()
+    return produit.id_produit
+
+
+def test_comparaison_en_une_requete(db_session, requetes_sql):
+    ok = _produit(db_session, "Riz", 15)
+    faux = _produit(db_session, "Mil", 7, quantite_stock=9)
+    sans_mouvement = _produit(db_session, "Sel", 0, quantite_stock=2)
+
+    with requetes_sql() as requetes:
+        verifies, ecarts = ReconciliationStockService.comparer(db_session)
+
+    assert len(requetes) == 1
+    assert verifies == 3
+    assert {e["id_produit"]: e["ecart"] for e in ecarts} == {faux: 2, sans_mouvement: 2}
+    assert ok not in {e["id_produit"] for e in ecarts}
+
+
+def test_incremental_reparation_et_filigrane(db_session):
+    a = _produit(db_session, "Blé", 10)
+    b = _produit(db_session, "Orge", 5, quantite_stock=8)
+
+    rapport = ReconciliationStockService.reconcilier(db_session)
+    assert rapport["mode"] == "INCREMENTAL"
+    assert rapport["produits_verifies"] == 2
+    assert [e["id_produit"] for e in rapport["ecarts"]] == [b]
+
+    # Aucun mouvement depuis le filigrane: rien à vérifier
+    rapport = ReconciliationStockService.reconcilier(db_session, reparer=True)
+    assert rapport["produits_verifies"] == 0
+
+    # Écriture hors journal: seul le passage complet la voit, la réparation reprojette
+    db_session.query(Stock).filter_by(id_produit=a).update({"quantite_disponible": 4})
+    db_session.commit()
+    rapport = ReconciliationStockService.reconcilier(db_session, complet=True, reparer=True)
+    assert rapport["repares"] == 2
+    assert {e["id_produit"]: e["ecart"] for e in rapport["ecarts"]} == {a: -6, b: 3}
+    assert db_session.query(Stock).filter_by(id_produit=a).one().quantite_disponible == 10
+    assert db_session.query(Stock).filter_by(id_produit=b).one().quantite_disponible == 5
+    assert db_session.query(MouvementStock).filter_by(type_mouvement="AJUSTEMENT").count() == 0
+
+    # Le journal n'a pas bougé: le passage incrémental suivant n'a rien à vérifier
+    rapport = ReconciliationStockService.reconcilier(db_session)
+    assert rapport["produits_verifies"] == 0
+
+    historique = db_session.query(ReconciliationStock).order_by(ReconciliationStock.id_reconciliation).all()
+    assert [h.mode for h in historique] == ["INCREMENTAL", "INCREMENTAL", "COMPLET", "INCREMENTAL"]
+
+
+def test_solde_ouverture_puis_reception_sans_ecart(client, db_session, admin_headers):
+    res = client.post("/produits/", json={"nom_produit": "Igname", "prix_unitaire": 3.5}, headers=admin_headers)
+    id_produit = res.json()["id_produit"]
+    res = client.post("/stocks/", json={"id_produit": id_produit, "quantite_disponible": 10, "seuil_minimal": 0},
+                      headers=admin_headers)
+    assert res.status_code == 200
+    res = client.post("/lots/", json={
+        "numero_lot": "IGN-1", "date_fabrication": datetime.now().isoformat(),
+        "date_expiration": (datetime.now() + timedelta(days=30)).isoformat(),
+        "quantite_initiale": 5, "quantite_restante": 5,
+        "id_produit": id_produit, "id_stock": res.json()["id_stock"]
+    }, headers=admin_headers)
+    assert res.status_code == 201
+
+    rapport = ReconciliationStockService.reconcilier(db_session, reparer=True)
+    assert rapport["produits_verifies"] == 1
+    assert rapport["ecarts"] == [] and rapport["repares"] == 0
+    assert db_session.query(Stock).filter_by(id_produit=id_produit).one().quantite_disponible == 15
+
+
+def test_endpoint_reconciliation_admin(client, db_session, admin_headers):
+    _produit(db_session, "Maïs", 6, quantite_stock=7)
+
+    res = client.post("/stocks/reconciliation?complet=true&reparer=true", headers=admin_headers)
+    assert res.status_code == 200
+    assert res.json()["repares"] == 1
+
+    res = client.get("/stocks/reconciliation", headers=admin_headers)
+    assert res.status_code == 200
+    assert [h["mode"] for h in res.json()] == ["COMPLET"]
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from models.model import (
+    Utilisateur, Client, Produit, Stock, Lot, Commande, LigneCommande, MouvementStock, SnapshotStock
+)
+from services.stock_ledger_service import StockLedgerService
+
+
+def _types(db_session):
+    return [(m.type_mouvement, m.quantite) for m in db_session.query(MouvementStock).order_by(MouvementStock.id_mouvement)]
+
+
+def test_journal_et_projection_via_api(client, db_session, admin_headers):
+    produit = Produit(nom_produit="Tomate", prix_unitaire=Decimal("10.00"))
+    db_session.add(produit)
+    db_session.commit()
+    id_produit = produit.id_produit
+
+    res_stock = client.post("/stocks/", json={"id_produit": id_produit, "quantite_disponible": 0, "seuil_minimal": 0},
+                            headers=admin_headers)
+    id_stock = res_stock.json()["id_stock"]
+    now = datetime.now()
+    res_lot = client.post("/lots/", headers=admin_headers, json={
+        "numero_lot": "LOT-1", "date_fabrication": (now - timedelta(days=1)).isoformat(),
+        "date_expiration": (now + timedelta(days=100)).isoformat(), "quantite_initiale": 10,
+        "quantite_restante": 10, "id_produit": id_produit, "id_stock": id_stock
+    })
+    assert res_lot.status_code == 201
+    id_lot = res_lot.json()["id_lot"]
+    assert client.put(f"/lots/{id_lot}", headers=admin_headers, json={"quantite_restante": 7}).status_code == 200
+
+    # Validation FEFO d'une commande de 2 unités
+    user = Utilisateur(nom="K", prenom="A", email="c@stock.com", mot_de_passe="x", role="CLIENT")
+    db_session.add(user)
+    db_session.flush()
+    cli = Client(id_utilisateur=user.id_utilisateur)
+    db_session.add(cli)
+    db_session.flush()
+    cmd = Commande(id_client=cli.id_client, statut="EN_ATTENTE", montant_total=Decimal("20.00"))
+    db_session.add(cmd)
+    db_session.flush()
+    db_session.add(LigneCommande(id_commande=cmd.id_commande, id_produit=id_produit, quantite=2,
+                                 prix_unitaire=Decimal("10.00"), montant_ligne=Decimal("20.00")))
+    db_session.commit()
+    assert client.post(f"/commandes/{cmd.id_commande}/valider", headers=admin_headers).status_code == 200
+
+    assert _types(db_session) == [("RECEPTION", 10), ("AJUSTEMENT", -3), ("DEDUCTION_FEFO", -2)]
+    db_session.expire_all()
+    assert db_session.get(Stock, id_stock).quantite_disponible == 5
+
+    res = client.get(f"/stocks/mouvements?id_produit={id_produit}&type_mouvement=DEDUCTION_FEFO", headers=admin_headers)
+    assert [(m["quantite"], m["id_commande"]) for m in res.json()] == [(-2, cmd.id_commande)]
+    assert client.get("/stocks/mouvements?type_mouvement=VOL", headers=admin_headers).status_code == 400
+
+
+def test_niveau_a_date_snapshot_plus_rejeu(db_session, requetes_sql):
+    produit = Produit(nom_produit="Mangue", prix_unitaire=Decimal("4.50"))
+    db_session.add(produit)
+    db_session.flush()
+    db_session.add(Stock(id_produit=produit.id_produit, quantite_disponible=0, seuil_minimal=0))
+    debut = datetime(2026, 1, 1)
+    historique = [(1, 100), (3, -20), (5, -5), (8, 40), (12, -30)]
+    for jour, quantite in historique:
+        db_session.add(MouvementStock(type_mouvement="AJUSTEMENT", quantite=quantite, id_produit=produit.id_produit,
+                                      date_mouvement=debut + timedelta(days=jour)))
+    db_session.commit()
+
+    # Snapshot au jour 6 (mouvements des jours 1, 3 et 5)
+    assert StockLedgerService.creer_snapshots(db_session, now=debut + timedelta(days=6)) == 1
+    assert db_session.query(SnapshotStock).one().quantite == 75
+    assert StockLedgerService.creer_snapshots(db_session, now=debut + timedelta(days=6)) == 0
+    id_produit = produit.id_produit
+
+    with requetes_sql() as requetes:
+        for jour in [0, 2, 4, 6, 9, 20]:
+            date = debut + timedelta(days=jour)
+            attendu = sum(q for j, q in historique if j <= jour)
+            assert StockLedgerService.niveau_a_date(db_session, id_produit, date) == attendu
+    assert len(requetes) == 2 * 6
+
+
+def test_radiation_lots_perimes(db_session):
+    produit = Produit(nom_produit="Igname", prix_unitaire=Decimal("3.00"))
+    db_session.add(produit)
+    db_session.flush()
+    stock = Stock(id_produit=produit.id_produit, quantite_disponible=12, seuil_minimal=0)
+    db_session.add(stock)
+    db_session.flush()
+    now = datetime.now()
+    for numero, quantite, jours in [("P1", 4, -2), ("P2", 8, 30)]:
+        db_session.add(Lot(numero_lot=numero, date_fabrication=now - timedelta(days=60),
+                           date_expiration=now + timedelta(days=jours), quantite_initiale=quantite,
+                           quantite_restante=quantite, id_produit=produit.id_produit, id_stock=stock.id_stock))
+    db_session.commit()
+
+    mouvements = StockLedgerService.radier_lots_expires(db_session)
+    db_session.commit()
+    assert [(m["type_mouvement"], m["quantite"]) for m in mouvements] == [("PEREMPTION", -4)]
+    assert db_session.query(Lot).filter_by(numero_lot="P1").one().quantite_restante == 0
+    assert db_session.get(Stock, stock.id_stock).quantite_disponible == 8
+    assert StockLedgerService.radier_lots_expires(db_session) == []